@@ -0,0 +1,267 @@
+"""
+In-Memory Animation Writer
+-------------------------
+Renders matplotlib frames straight from the Agg canvas buffer into a
+streaming encoder, without writing intermediate PNGs to disk.
+
+- GIF: frames are quantized against one global palette built from a sample
+  of frames, so colours stay stable between frames and the file stays small.
+  Quantized frames are held as 1-byte palette indices until the file is
+  written.
+- MP4 / WebM: frames are piped to ffmpeg through imageio as they arrive.
+
+Frames can be rendered in parallel worker processes; each worker returns
+an RGB array and the parent process encodes them in order.
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import logging
+import os
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+VIDEO_CODECS = {
+    '.mp4': 'libx264',
+    '.webm': 'libvpx-vp9'
+}
+
+
+def figure_to_array(fig, dpi: Optional[float] = None) -> np.ndarray:
+    """Draw a figure on its Agg canvas and return the RGB pixels (no disk round trip)."""
+    return _draw(fig, dpi)[0]
+
+
+def _draw(fig, dpi: Optional[float] = None,
+          pad_inches: Optional[float] = None) -> Tuple[np.ndarray, Optional[Tuple[int, int, int, int]]]:
+    """RGB pixels and, with ``pad_inches``, the padded tight box (row0, row1, col0, col1)."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.pyplot as plt
+
+    if dpi is not None:
+        fig.set_dpi(dpi)
+    canvas = fig.canvas if isinstance(fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(fig)
+    canvas.draw()
+    rgb = np.asarray(canvas.buffer_rgba())[..., :3].copy()
+
+    box = None
+    if pad_inches is not None:
+        # Same box savefig(bbox_inches='tight') uses, in display pixels (origin bottom left)
+        bbox = fig.get_tightbbox(canvas.get_renderer()).padded(pad_inches)
+        height, width = rgb.shape[:2]
+        x0, y0, x1, y1 = (np.array(bbox.extents) * fig.dpi).round().astype(int)
+        box = (max(0, height - y1), min(height, height - y0), max(0, x0), min(width, x1))
+    plt.close(fig)
+    return rgb, box
+
+
+class AnimationWriter:
+    """Streaming GIF/MP4/WebM writer fed with RGB frame arrays."""
+
+    def __init__(self, path: Union[str, Path], fps: float = 10,
+                 durations: Optional[Sequence[float]] = None,
+                 loop: int = 0, palette_sample: int = 8, colors: int = 256):
+        """Initialize the writer.
+
+        ``durations`` (seconds per frame) overrides ``fps`` for GIFs.
+        ``palette_sample`` frames are pooled to build the global GIF palette.
+        """
+        self.path = Path(path)
+        self.suffix = self.path.suffix.lower()
+        if self.suffix not in ('.gif',) + tuple(VIDEO_CODECS):
+            raise ValueError(f"Unsupported animation format: {self.suffix}")
+
+        self.fps = fps
+        self.durations = list(durations) if durations is not None else None
+        self.loop = loop
+        self.palette_sample = palette_sample
+        self.colors = colors
+
+        self._pending: List[np.ndarray] = []     # RGB frames awaiting the palette
+        self._indexed: List[Image.Image] = []    # Palette-indexed GIF frames
+        self._palette: Optional[Image.Image] = None
+        self._video = None
+        self._shape: Optional[tuple] = None
+        self.n_frames = 0
+
+    def __enter__(self) -> 'AnimationWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._video is not None:
+            self._video.close()
+
+    # ------------------------------------------------------------------
+    # GIF
+    # ------------------------------------------------------------------
+    def _build_palette(self) -> None:
+        # Stack sampled frames vertically so one quantization sees them all
+        sample = np.concatenate(self._pending[:self.palette_sample], axis=0)
+        mosaic = Image.fromarray(sample).quantize(colors=self.colors, method=Image.Quantize.MEDIANCUT)
+        self._palette = mosaic
+        for frame in self._pending:
+            self._indexed.append(self._quantize(frame))
+        self._pending = []
+
+    def _quantize(self, frame: np.ndarray) -> Image.Image:
+        return Image.fromarray(frame).quantize(palette=self._palette, dither=Image.Dither.NONE)
+
+    # ------------------------------------------------------------------
+    # Video
+    # ------------------------------------------------------------------
+    def _open_video(self, frame: np.ndarray):
+        import imageio.v2 as imageio
+
+        height, width = frame.shape[:2]
+        return imageio.get_writer(
+            self.path,
+            fps=self.fps,
+            codec=VIDEO_CODECS[self.suffix],
+            quality=8,
+            macro_block_size=16 if (height % 16 == 0 and width % 16 == 0) else 1
+        )
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def append(self, frame: np.ndarray) -> None:
+        """Add one RGB (H, W, 3) uint8 frame."""
+        frame = np.ascontiguousarray(frame[..., :3], dtype=np.uint8)
+        if self._shape is not None and frame.shape != self._shape:
+            raise ValueError(f"Frame shape {frame.shape} differs from first frame {self._shape}")
+        self._shape = frame.shape
+        self.n_frames += 1
+
+        if self.suffix == '.gif':
+            if self._palette is None:
+                self._pending.append(frame)
+                if len(self._pending) >= self.palette_sample:
+                    self._build_palette()
+            else:
+                self._indexed.append(self._quantize(frame))
+        else:
+            if self._video is None:
+                self._video = self._open_video(frame)
+            self._video.append_data(frame)
+
+    def append_figure(self, fig, dpi: Optional[float] = None) -> None:
+        """Render a matplotlib figure from its canvas buffer and add it."""
+        self.append(figure_to_array(fig, dpi=dpi))
+
+    def close(self) -> Path:
+        """Finish encoding and return the output path."""
+        if self.suffix == '.gif':
+            if self._pending:
+                self._build_palette()
+            if not self._indexed:
+                raise ValueError("No frames were added")
+            if self.durations is not None:
+                durations = [int(d * 1000) for d in self.durations]
+            else:
+                durations = int(1000 / self.fps)
+            self._indexed[0].save(
+                self.path,
+                save_all=True,
+                append_images=self._indexed[1:],
+                duration=durations,
+                loop=self.loop,
+                optimize=False,
+                disposal=1
+            )
+            self._indexed = []
+        elif self._video is not None:
+            self._video.close()
+            self._video = None
+
+        logger.info(f"Wrote {self.n_frames} frames to {self.path}")
+        return self.path
+
+
+def _render_frame(args):
+    frame_fn, index, dpi, pad_inches = args
+    return _draw(frame_fn(index), dpi=dpi, pad_inches=pad_inches)
+
+
+def render_animation(frame_fn: Callable[[int], object], frames: Sequence[int],
+                     path: Union[str, Path], processes: Optional[int] = None,
+                     dpi: Optional[float] = None, tight: bool = False,
+                     pad_inches: float = 0.1, **writer_kwargs) -> Path:
+    """Render ``frame_fn(i)`` -> Figure for each frame and stream the frames into ``path``.
+
+    ``frame_fn`` must be picklable (a module-level function or a
+    ``functools.partial`` of one) when ``processes`` is not 1. Frames are
+    rendered in worker processes and encoded in order by the parent.
+
+    ``tight=True`` crops every frame to the union of the frames' tight
+    bounding boxes (as ``savefig(bbox_inches='tight')``, but within the
+    figure), so all frames keep one size. The frames are then held until
+    the last one is rendered.
+    """
+    frames = list(frames)
+    processes = processes or min(len(frames), os.cpu_count() or 1)
+    jobs = [(frame_fn, i, dpi, pad_inches if tight else None) for i in frames]
+
+    with AnimationWriter(path, **writer_kwargs) as writer:
+        if processes <= 1:
+            _write_frames(writer, map(_render_frame, jobs), tight)
+        else:
+            with Pool(processes, initializer=_init_worker) as pool:
+                _write_frames(writer, pool.imap(_render_frame, jobs), tight)
+    return Path(path)
+
+
+def _write_frames(writer: AnimationWriter, rendered, tight: bool) -> None:
+    if not tight:
+        for rgb, _ in rendered:
+            writer.append(rgb)
+        return
+    rendered = list(rendered)
+    boxes = np.array([box for _, box in rendered])
+    row0, col0 = boxes[:, 0].min(), boxes[:, 2].min()
+    row1, col1 = boxes[:, 1].max(), boxes[:, 3].max()
+    for rgb, _ in rendered:
+        writer.append(rgb[row0:row1, col0:col1])
+
+
+def _init_worker() -> None:
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def main():
+    """Example: a sweeping sine animation written as GIF and MP4."""
+    from functools import partial
+
+    for path in ('animation_example.gif', 'animation_example.mp4'):
+        render_animation(partial(_example_frame, n_frames=30), range(30), path, fps=15)
+
+
+def _example_frame(i: int, n_frames: int):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(6.4, 4.8), dpi=100)
+    x = np.linspace(0, 2 * np.pi, 200)
+    ax.plot(x, np.sin(x + 2 * np.pi * i / n_frames), color='#990F3D')
+    ax.set_ylim(-1.1, 1.1)
+    return fig
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Figure Build Runner
+------------------
+Incremental, parallel rebuild of the publication figure scripts.
+
+Each figure script is a build target. Its inputs are the script itself, any
+local modules it imports and the data files it references; its outputs are
+the paths passed to ``savefig``. Declarative specs in figure_specs/ are
+targets too; their outputs are the variant outputs listed in the spec. Input hashes are kept in a manifest, so
+up-to-date targets are skipped and only stale ones are rendered, in a
+process pool with the Agg backend.
+
+Usage:
+    python build_figures.py                 # default publication targets
+    python build_figures.py --discover      # every offline script and spec writing to paper_figures_color/
+    python build_figures.py --force -j 8 figure_specs/seasonal_comparison.json
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent
+MANIFEST_FILE = ROOT / 'data_cache' / 'figure_build.json'
+SPEC_DIR = ROOT / 'figure_specs'
+SPEC_SUFFIXES = {'.json', '.yaml', '.yml'}
+
+DATA_SUFFIXES = {'.csv', '.xlsx', '.xls', '.pkl', '.json', '.nc', '.npz', '.npy', '.tif', '.yaml', '.yml'}
+
+# Modules that need Earth Engine access are not rebuilt offline by discovery
+NETWORK_MODULES = {'ee', 'geemap'}
+
+
+@dataclass
+class BuildConfig:
+    """Configuration for the figure build."""
+    targets: List[str] = field(default_factory=lambda: [
+        'figure_specs/seasonal_comparison.json',
+        'paper_style_visualizations_color.py',
+        'seasonal_transitions_viz_v2.py'
+    ])
+    output_dir: str = field(default='paper_figures_color')
+    jobs: int = field(default_factory=lambda: os.cpu_count() or 1)
+    manifest_file: Path = field(default=MANIFEST_FILE)
+
+
+@dataclass
+class FigureTarget:
+    """A figure script together with its inputs and outputs."""
+    script: Path
+    inputs: List[Path]
+    outputs: List[Path]
+    needs_network: bool = False
+
+
+def _string_value(node: ast.AST) -> Optional[str]:
+    """Resolve a string literal or an os.path.join of string literals."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return None
+    if isinstance(node, ast.Call) and getattr(node.func, 'attr', None) == 'join':
+        parts = [_string_value(arg) for arg in node.args]
+        if parts and all(p is not None for p in parts):
+            return os.path.join(*parts)
+    return None
+
+
+def analyze_spec(spec_file: Path) -> FigureTarget:
+    """Inputs and outputs of a declarative figure spec."""
+    from figure_spec import load_spec, spec_inputs, spec_outputs
+
+    spec = load_spec(spec_file)
+    inputs = [spec_file, ROOT / 'figure_spec.py', ROOT / 'plot_style.py']
+    inputs += [p for p in spec_inputs(spec, ROOT) if p.is_file()]
+    return FigureTarget(
+        script=spec_file,
+        inputs=sorted(set(inputs)),
+        outputs=sorted(set(spec_outputs(spec, ROOT)))
+    )
+
+
+def analyze_script(script: Path) -> FigureTarget:
+    """Find savefig outputs, local imports and data files referenced by a script."""
+    if script.suffix.lower() in SPEC_SUFFIXES:
+        return analyze_spec(script)
+    tree = ast.parse(script.read_text(encoding='utf-8'), filename=str(script))
+    outputs, inputs, imports = [], [script], set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and getattr(node.func, 'attr', None) == 'savefig' and node.args:
+            path = _string_value(node.args[0])
+            if path is not None:
+                outputs.append(ROOT / path)
+        elif isinstance(node, ast.Import):
+            imports.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            imports.add(node.module.split('.')[0])
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            candidate = ROOT / node.value
+            if Path(node.value).suffix.lower() in DATA_SUFFIXES and candidate.is_file():
+                inputs.append(candidate)
+
+    for module in sorted(imports):
+        local = ROOT / f'{module}.py'
+        if local.is_file() and local != script:
+            inputs.append(local)
+
+    return FigureTarget(
+        script=script,
+        inputs=sorted(set(inputs)),
+        outputs=sorted(set(outputs)),
+        needs_network=bool(imports & NETWORK_MODULES)
+    )
+
+
+def _version_key(script: Path) -> Tuple[str, int]:
+    match = re.match(r'(.*?)(?:_v(\d+))?$', script.stem)
+    return match.group(1), int(match.group(2) or 1)
+
+
+def discover_targets(output_dir: str) -> List[FigureTarget]:
+    """All offline scripts writing into ``output_dir``; the latest _vN wins shared outputs."""
+    owners: Dict[Path, FigureTarget] = {}
+    specs = sorted(p for p in SPEC_DIR.glob('*') if p.suffix.lower() in SPEC_SUFFIXES)
+    for script in sorted(ROOT.glob('*.py')) + specs:
+        if script.name == Path(__file__).name:
+            continue
+        try:
+            target = analyze_script(script)
+        except (SyntaxError, ValueError) as e:
+            logger.warning(f"Skipping {script.name}: {e}")
+            continue
+        if target.needs_network:
+            continue
+        for output in target.outputs:
+            if output.parent.name != output_dir:
+                continue
+            current = owners.get(output)
+            if current is None or _version_key(script)[1] > _version_key(current.script)[1]:
+                owners[output] = target
+
+    unique = {t.script: t for t in owners.values()}
+    return [unique[s] for s in sorted(unique)]
+
+
+class BuildManifest:
+    """Remembers input hashes per target, with an (mtime, size) fast path."""
+
+    def __init__(self, path: Path):
+        """Load the manifest from disk if it exists."""
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self.targets: Dict[str, str] = {}
+        if path.exists():
+            data = json.loads(path.read_text())
+            self.files = data.get('files', {})
+            self.targets = data.get('targets', {})
+
+    def file_hash(self, path: Path) -> str:
+        stat = path.stat()
+        key = str(path.relative_to(ROOT))
+        cached = self.files.get(key)
+        if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+            return cached['sha1']
+        digest = hashlib.sha1(path.read_bytes()).hexdigest()
+        self.files[key] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': digest}
+        return digest
+
+    def target_hash(self, target: FigureTarget) -> str:
+        digest = hashlib.sha1()
+        for path in target.inputs:
+            digest.update(str(path.relative_to(ROOT)).encode())
+            digest.update(self.file_hash(path).encode())
+        return digest.hexdigest()
+
+    def is_stale(self, target: FigureTarget) -> bool:
+        key = str(target.script.relative_to(ROOT))
+        if self.targets.get(key) != self.target_hash(target):
+            return True
+        return not all(output.exists() for output in target.outputs)
+
+    def record(self, target: FigureTarget) -> None:
+        self.targets[str(target.script.relative_to(ROOT))] = self.target_hash(target)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({'files': self.files, 'targets': self.targets}, indent=1))
+
+
+def _render(script: str) -> Tuple[str, Optional[str], float]:
+    """Run one figure script in a worker process with the Agg backend."""
+    import runpy
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    os.chdir(ROOT)
+    try:
+        if Path(script).suffix.lower() in SPEC_SUFFIXES:
+            from figure_spec import render_spec
+            render_spec(script)
+        else:
+            runpy.run_path(script, run_name='__main__')
+        return script, None, time.perf_counter() - start
+    except BaseException as e:  # Scripts may call sys.exit or raise anything
+        return script, f'{type(e).__name__}: {e}', time.perf_counter() - start
+    finally:
+        plt.close('all')
+
+
+def build(targets: List[FigureTarget], config: BuildConfig, force: bool = False,
+          dry_run: bool = False) -> Dict[str, List[str]]:
+    """Render stale targets in parallel and update the manifest."""
+    manifest = BuildManifest(config.manifest_file)
+    stale = [t for t in targets if force or manifest.is_stale(t)]
+    result = {'built': [], 'skipped': [t.script.name for t in targets if t not in stale], 'failed': []}
+
+    if not stale:
+        logger.info(f"All {len(targets)} figure targets are up to date")
+        manifest.save()
+        return result
+
+    logger.info(f"{len(stale)} of {len(targets)} targets are stale")
+    if dry_run:
+        for target in stale:
+            logger.info(f"Would build {target.script.name} -> {[str(o.relative_to(ROOT)) for o in target.outputs]}")
+        return result
+
+    for target in stale:
+        for output in target.outputs:
+            output.parent.mkdir(parents=True, exist_ok=True)
+
+    by_script = {str(t.script): t for t in stale}
+    with ProcessPoolExecutor(max_workers=min(config.jobs, len(stale))) as pool:
+        futures = [pool.submit(_render, script) for script in by_script]
+        for future in as_completed(futures):
+            script, error, elapsed = future.result()
+            name = Path(script).name
+            if error is None:
+                manifest.record(by_script[script])
+                result['built'].append(name)
+                logger.info(f"Built {name} in {elapsed:.1f}s")
+            else:
+                result['failed'].append(name)
+                logger.error(f"Failed {name}: {error}")
+
+    manifest.save()
+    return result
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description='Incrementally rebuild publication figures.')
+    parser.add_argument('targets', nargs='*', help='Figure scripts to build (default: publication set)')
+    parser.add_argument('--discover', action='store_true', help='Build every offline script writing to the output folder')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if up to date')
+    parser.add_argument('--dry-run', action='store_true', help='List stale targets without building')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Worker processes')
+    args = parser.parse_args()
+
+    config = BuildConfig()
+    if args.jobs:
+        config.jobs = args.jobs
+
+    start = time.perf_counter()
+    if args.discover:
+        targets = discover_targets(config.output_dir)
+    else:
+        targets = [analyze_script(ROOT / name) for name in (args.targets or config.targets)]
+
+    result = build(targets, config, force=args.force, dry_run=args.dry_run)
+    logger.info(
+        f"Done in {time.perf_counter() - start:.2f}s: {len(result['built'])} built, "
+        f"{len(result['skipped'])} up to date, {len(result['failed'])} failed"
+    )
+    if result['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
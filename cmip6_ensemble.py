@@ -0,0 +1,395 @@
+"""
+CMIP6 Ensemble Store
+-------------------
+Dense float32 ensemble cube for NASA GDDP-CMIP6 daily projections, keyed by
+(model, scenario, variable), with vectorized ensemble statistics along the
+model axis.
+
+Each member is fetched once and cached on disk, so new models or scenarios
+can be added without re-fetching the members already held. A cached member
+is re-fetched when it does not cover the store's sites or years.
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import ee
+import numpy as np
+import pandas as pd
+
+from data_retrieval import CACHE_DIR
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+CMIP6_COLLECTION = 'NASA/GDDP-CMIP6'
+CMIP6_SCALE = 27830  # Native ~0.25° grid
+
+# Years covered by each GDDP-CMIP6 experiment
+SCENARIO_YEARS = {
+    'historical': (1950, 2014),
+    'ssp126': (2015, 2100),
+    'ssp245': (2015, 2100),
+    'ssp370': (2015, 2100),
+    'ssp585': (2015, 2100)
+}
+
+# Offset and scale to convert native units (K, kg m-2 s-1) to °C and mm/day
+VARIABLE_CONVERSIONS = {
+    'tas': (-273.15, 1.0),
+    'tasmax': (-273.15, 1.0),
+    'tasmin': (-273.15, 1.0),
+    'pr': (0.0, 86400.0)
+}
+
+DEFAULT_SITES = {
+    'Rahima_Moosa_Hospital': (-26.1752, 28.0183)  # (lat, lon)
+}
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def to_epoch_days(dates) -> np.ndarray:
+    """Convert dates to int32 days since 1970-01-01."""
+    days = np.asarray(pd.to_datetime(dates).values.astype('datetime64[D]'))
+    return (days - EPOCH).astype(np.int32)
+
+
+@dataclass
+class EnsembleConfig:
+    """Configuration for the CMIP6 ensemble store."""
+    models: List[str] = field(default_factory=lambda: [
+        'ACCESS-CM2', 'MIROC6', 'MPI-ESM1-2-HR'
+    ])
+    scenarios: List[str] = field(default_factory=lambda: ['historical', 'ssp585'])
+    variables: List[str] = field(default_factory=lambda: ['tasmax'])
+    sites: Dict[str, Tuple[float, float]] = field(default_factory=lambda: dict(DEFAULT_SITES))
+    start_year: int = field(default=1980)
+    end_year: int = field(default=2060)
+    cache_dir: Path = field(default=CACHE_DIR / 'cmip6')
+
+
+class CMIP6EnsembleStore:
+    """Holds CMIP6 members as a dense (model, scenario, variable, site, day) cube."""
+
+    def __init__(self, config: EnsembleConfig):
+        """Initialize with configuration."""
+        self.config = config
+        self.config.cache_dir = Path(self.config.cache_dir)
+        self.config.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        first_day = to_epoch_days([f'{config.start_year}-01-01'])[0]
+        last_day = to_epoch_days([f'{config.end_year}-12-31'])[0]
+        self.days = np.arange(first_day, last_day + 1, dtype=np.int32)
+        self.site_names = list(config.sites)
+        self._cube: Optional[np.ndarray] = None
+
+    # ------------------------------------------------------------------
+    # Member storage
+    # ------------------------------------------------------------------
+    def _member_path(self, model: str, scenario: str, variable: str) -> Path:
+        return self.config.cache_dir / f'{model}_{scenario}_{variable}.npz'
+
+    def has_member(self, model: str, scenario: str, variable: str) -> bool:
+        """Check whether a member is cached on disk for all of the store's sites and days."""
+        path = self._member_path(model, scenario, variable)
+        if not path.exists():
+            return False
+        with np.load(path) as cached:
+            first_day = int(cached['first_day'])
+            n_days = cached['values'].shape[1]
+            sites = list(cached['sites'])
+            # Members cached before coordinates were stored are matched by name only
+            coords = [tuple(c) for c in cached['coords']] if 'coords' in cached else None
+
+        if first_day > self.days[0] or first_day + n_days - 1 < self.days[-1]:
+            return False
+        for name, location in self.config.sites.items():
+            if name not in sites:
+                return False
+            if coords is not None and not np.allclose(coords[sites.index(name)], location):
+                return False
+        return True
+
+    def _fetch_member(self, model: str, scenario: str, variable: str) -> np.ndarray:
+        """Fetch one member as a (site, day) float32 array from Earth Engine."""
+        points = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Point([lon, lat]), {'site': name})
+            for name, (lat, lon) in self.config.sites.items()
+        ])
+        site_index = {name: i for i, name in enumerate(self.site_names)}
+        values = np.full((len(self.site_names), len(self.days)), np.nan, dtype=np.float32)
+
+        first_year, last_year = SCENARIO_YEARS[scenario]
+        years = range(max(self.config.start_year, first_year),
+                      min(self.config.end_year, last_year) + 1)
+
+        for year in years:
+            collection = ee.ImageCollection(CMIP6_COLLECTION)\
+                .filter(ee.Filter.eq('model', model))\
+                .filter(ee.Filter.eq('scenario', scenario))\
+                .filterDate(f'{year}-01-01', f'{year + 1}-01-01')\
+                .select(variable)
+
+            def extract(image):
+                date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd')
+                return image.reduceRegions(
+                    collection=points,
+                    reducer=ee.Reducer.first(),
+                    scale=CMIP6_SCALE
+                ).map(lambda f: f.set('date', date))
+
+            features = collection.map(extract).flatten().getInfo()['features']
+            if not features:
+                logger.warning(f"No {model} {scenario} {variable} data for {year}")
+                continue
+
+            props = pd.DataFrame([f['properties'] for f in features]).dropna(subset=['first'])
+            day_idx = to_epoch_days(props['date']) - self.days[0]
+            site_idx = props['site'].map(site_index).to_numpy()
+            values[site_idx, day_idx] = props['first'].to_numpy(dtype=np.float32)
+            logger.info(f"Fetched {model} {scenario} {variable} for {year}")
+
+        offset, scale = VARIABLE_CONVERSIONS.get(variable, (0.0, 1.0))
+        values = (values + np.float32(offset)) * np.float32(scale)
+        return values.astype(np.float32)
+
+    def _save_member(self, model: str, scenario: str, variable: str, values: np.ndarray) -> None:
+        np.savez(
+            self._member_path(model, scenario, variable),
+            values=values,
+            first_day=self.days[0],
+            sites=np.array(self.site_names),
+            coords=np.array([self.config.sites[name] for name in self.site_names], dtype=np.float64)
+        )
+
+    def _load_member(self, model: str, scenario: str, variable: str) -> np.ndarray:
+        """Load a cached member and align it to the store's site and day axes."""
+        with np.load(self._member_path(model, scenario, variable)) as cached:
+            values = cached['values']
+            first_day = int(cached['first_day'])
+            sites = list(cached['sites'])
+
+        aligned = np.full((len(self.site_names), len(self.days)), np.nan, dtype=np.float32)
+        cached_days = np.arange(first_day, first_day + values.shape[1], dtype=np.int32)
+        overlap = np.intersect1d(cached_days, self.days, assume_unique=True)
+        src = overlap - first_day
+        dst = overlap - self.days[0]
+
+        for i, site in enumerate(self.site_names):
+            if site in sites:
+                aligned[i, dst] = values[sites.index(site), src]
+            else:
+                logger.warning(f"Site {site} missing from cached {model} {scenario} {variable}")
+        return aligned
+
+    def add_members(self, models: Optional[Sequence[str]] = None,
+                    scenarios: Optional[Sequence[str]] = None,
+                    variables: Optional[Sequence[str]] = None) -> List[Tuple[str, str, str]]:
+        """Register new models/scenarios/variables and fetch only members not yet cached.
+
+        Returns the list of (model, scenario, variable) keys that were fetched.
+        """
+        for name, new in (('models', models), ('scenarios', scenarios), ('variables', variables)):
+            axis = getattr(self.config, name)
+            for item in new or []:
+                if item not in axis:
+                    axis.append(item)
+
+        fetched = []
+        for model in self.config.models:
+            for scenario in self.config.scenarios:
+                for variable in self.config.variables:
+                    if self.has_member(model, scenario, variable):
+                        continue
+                    if self._member_path(model, scenario, variable).exists():
+                        logger.info(f"Cached {model} / {scenario} / {variable} does not cover the "
+                                    f"configured sites and years; re-fetching")
+                    else:
+                        logger.info(f"Fetching new member {model} / {scenario} / {variable}")
+                    values = self._fetch_member(model, scenario, variable)
+                    self._save_member(model, scenario, variable, values)
+                    fetched.append((model, scenario, variable))
+
+        self._cube = None
+        return fetched
+
+    # ------------------------------------------------------------------
+    # Cube access
+    # ------------------------------------------------------------------
+    @property
+    def cube(self) -> np.ndarray:
+        """Dense (model, scenario, variable, site, day) float32 array; NaN where missing."""
+        if self._cube is None:
+            shape = (len(self.config.models), len(self.config.scenarios),
+                     len(self.config.variables), len(self.site_names), len(self.days))
+            cube = np.full(shape, np.nan, dtype=np.float32)
+            for m, model in enumerate(self.config.models):
+                for s, scenario in enumerate(self.config.scenarios):
+                    for v, variable in enumerate(self.config.variables):
+                        if self._member_path(model, scenario, variable).exists():
+                            cube[m, s, v] = self._load_member(model, scenario, variable)
+            self._cube = cube
+        return self._cube
+
+    def select(self, scenario: str, variable: str,
+               start_year: Optional[int] = None, end_year: Optional[int] = None) -> np.ndarray:
+        """Return a (model, site, day) view for one scenario and variable."""
+        s = self.config.scenarios.index(scenario)
+        v = self.config.variables.index(variable)
+        lo, hi = self._day_bounds(start_year, end_year)
+        return self.cube[:, s, v, :, lo:hi]
+
+    def _day_bounds(self, start_year: Optional[int], end_year: Optional[int]) -> Tuple[int, int]:
+        lo, hi = 0, len(self.days)
+        if start_year is not None:
+            lo = int(np.searchsorted(self.days, to_epoch_days([f'{start_year}-01-01'])[0]))
+        if end_year is not None:
+            hi = int(np.searchsorted(self.days, to_epoch_days([f'{end_year}-12-31'])[0], side='right'))
+        return lo, hi
+
+    # ------------------------------------------------------------------
+    # Ensemble statistics (all along the model axis)
+    # ------------------------------------------------------------------
+    def ensemble_mean(self, scenario: str, variable: str, **period) -> np.ndarray:
+        """Ensemble mean as a (site, day) array."""
+        return np.nanmean(self.select(scenario, variable, **period), axis=0)
+
+    def ensemble_spread(self, scenario: str, variable: str, **period) -> np.ndarray:
+        """Ensemble standard deviation as a (site, day) array."""
+        return np.nanstd(self.select(scenario, variable, **period), axis=0, ddof=1)
+
+    def ensemble_percentiles(self, scenario: str, variable: str,
+                             q: Sequence[float] = (10, 50, 90), **period) -> np.ndarray:
+        """Ensemble percentiles as a (percentile, site, day) array."""
+        return np.nanpercentile(self.select(scenario, variable, **period), q, axis=0)
+
+    def weighted_mean(self, scenario: str, variable: str,
+                      weights: Dict[str, float], **period) -> np.ndarray:
+        """Weighted ensemble mean; models missing from ``weights`` get zero weight."""
+        data = self.select(scenario, variable, **period)
+        w = np.array([weights.get(m, 0.0) for m in self.config.models], dtype=np.float32)
+        w_valid = np.where(np.isnan(data), 0.0, w[:, None, None])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (np.nan_to_num(data) * w_valid).sum(axis=0) / w_valid.sum(axis=0)
+
+    def ensemble_statistics(self, scenario: str, variable: str,
+                            q: Sequence[float] = (10, 50, 90),
+                            weights: Optional[Dict[str, float]] = None,
+                            **period) -> Dict[str, np.ndarray]:
+        """Compute mean, spread, percentiles and (optionally) weighted mean in one pass."""
+        data = self.select(scenario, variable, **period)
+        stats = {
+            'mean': np.nanmean(data, axis=0),
+            'spread': np.nanstd(data, axis=0, ddof=1),
+            'percentiles': np.nanpercentile(data, q, axis=0)
+        }
+        if weights is not None:
+            stats['weighted_mean'] = self.weighted_mean(scenario, variable, weights, **period)
+        return stats
+
+    def skill_weights(self, observed: pd.DataFrame, variable: str,
+                      start_year: int = 1981, end_year: int = 2010) -> Dict[str, float]:
+        """Derive model weights from day-of-year climatology RMSE against observations.
+
+        ``observed`` must hold 'date' and 'temperature_celsius' columns (plus
+        'site' when the store holds more than one site). Weights are inverse
+        mean-squared error, normalised to sum to one.
+        """
+        lo, hi = self._day_bounds(start_year, end_year)
+        model_data = self.select('historical', variable)[..., lo:hi]
+        doy = pd.to_datetime(self.days[lo:hi], unit='D').dayofyear.to_numpy() - 1
+
+        # (model, site, 366) climatology via one bincount per flattened row
+        flat = model_data.reshape(-1, model_data.shape[-1])
+        valid = ~np.isnan(flat)
+        row = np.repeat(np.arange(flat.shape[0]), flat.shape[1]).reshape(flat.shape)
+        keys = (row * 366 + doy[None, :])[valid]
+        sums = np.bincount(keys, weights=flat[valid], minlength=flat.shape[0] * 366)
+        counts = np.bincount(keys, minlength=flat.shape[0] * 366)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            model_clim = (sums / counts).reshape(model_data.shape[0], model_data.shape[1], 366)
+
+        obs = observed.copy()
+        obs['date'] = pd.to_datetime(obs['date'])
+        obs = obs[(obs['date'].dt.year >= start_year) & (obs['date'].dt.year <= end_year)]
+        if 'site' not in obs.columns:
+            obs['site'] = self.site_names[0]
+        obs_clim = obs.groupby(['site', obs['date'].dt.dayofyear])['temperature_celsius'].mean()
+        obs_clim = obs_clim.unstack().reindex(index=self.site_names, columns=range(1, 367)).to_numpy()
+
+        mse = np.nanmean((model_clim - obs_clim[None]) ** 2, axis=(1, 2))
+        inv = np.where(np.isfinite(mse) & (mse > 0), 1.0 / mse, 0.0)
+        if inv.sum() == 0:
+            raise ValueError("No overlapping model/observation climatology to derive weights")
+        inv = inv / inv.sum()
+        return dict(zip(self.config.models, inv.tolist()))
+
+    def to_frame(self, scenario: str, variable: str,
+                 q: Sequence[float] = (10, 50, 90), **period) -> pd.DataFrame:
+        """Long-form frame of ensemble statistics for plotting."""
+        lo, hi = self._day_bounds(period.get('start_year'), period.get('end_year'))
+        stats = self.ensemble_statistics(scenario, variable, q=q, **period)
+        dates = pd.to_datetime(self.days[lo:hi], unit='D')
+
+        frames = []
+        for i, site in enumerate(self.site_names):
+            frame = pd.DataFrame({
+                'site': site,
+                'date': dates,
+                'mean': stats['mean'][i],
+                'spread': stats['spread'][i]
+            })
+            for j, pct in enumerate(q):
+                frame[f'p{pct:g}'] = stats['percentiles'][j, i]
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    def summary(self) -> Dict[str, object]:
+        """Describe which members are cached."""
+        return {
+            'models': list(self.config.models),
+            'scenarios': list(self.config.scenarios),
+            'variables': list(self.config.variables),
+            'sites': list(self.site_names),
+            'days': int(len(self.days)),
+            'cached_members': [
+                (m, s, v)
+                for m in self.config.models
+                for s in self.config.scenarios
+                for v in self.config.variables
+                if self.has_member(m, s, v)
+            ]
+        }
+
+
+def main():
+    """Example usage of the ensemble store."""
+    ee.Initialize()
+
+    store = CMIP6EnsembleStore(EnsembleConfig())
+    store.add_members()
+
+    # New scenarios are fetched without touching the members already cached
+    fetched = store.add_members(scenarios=['ssp126', 'ssp245', 'ssp370'])
+    logger.info(f"Fetched {len(fetched)} new members")
+
+    stats = store.ensemble_statistics('ssp585', 'tasmax', start_year=2045, end_year=2055)
+    logger.info(f"Ensemble mean Tmax 2045-2055: {np.nanmean(stats['mean']):.1f}°C")
+    logger.info(f"Mean ensemble spread: {np.nanmean(stats['spread']):.2f}°C")
+    logger.info(json.dumps(store.summary(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Compact Daily Series Container
+-----------------------------
+Lightweight typed container for one site's daily series: an int32 epoch-day
+index with float32 (or float16) value arrays. Calendar fields are derived
+from the day index on first use and cached, date-range slicing returns views
+rather than copies, and conversion to pandas re-uses the value buffers.
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import logging
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+DateLike = Union[str, pd.Timestamp, np.datetime64]
+
+
+def to_epoch_day(date: DateLike) -> int:
+    """Convert a single date to days since 1970-01-01."""
+    return int((np.datetime64(pd.Timestamp(date).date(), 'D') - EPOCH).astype(np.int64))
+
+
+class DailySeries:
+    """Daily values for one site on an int32 epoch-day index."""
+
+    __slots__ = ('site', 'days', 'values', '_calendar', '_index')
+
+    def __init__(self, days: np.ndarray, values: Dict[str, np.ndarray],
+                 site: Optional[str] = None):
+        """Initialize from sorted epoch days and equally long value arrays."""
+        days = np.asarray(days, dtype=np.int32)
+        if days.size > 1 and np.any(np.diff(days) <= 0):
+            raise ValueError("Days must be strictly increasing")
+        for name, array in values.items():
+            if len(array) != len(days):
+                raise ValueError(f"Column '{name}' has {len(array)} values for {len(days)} days")
+
+        self.site = site
+        self.days = days
+        self.values = values
+        self._calendar: Dict[str, np.ndarray] = {}
+        self._index: Optional[pd.DatetimeIndex] = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: Optional[Iterable[str]] = None,
+                   site: Optional[str] = None, dtype: str = 'float32') -> 'DailySeries':
+        """Build from a frame with a 'date' column (or DatetimeIndex) and value columns."""
+        frame = df.reset_index() if 'date' not in df.columns else df
+        frame = frame.sort_values('date')
+        if columns is None:
+            columns = [c for c in frame.columns
+                       if c not in ('date', 'site') and pd.api.types.is_numeric_dtype(frame[c])]
+
+        dates = pd.to_datetime(frame['date']).values.astype('datetime64[D]')
+        days = (dates - EPOCH).astype(np.int32)
+        values = {c: frame[c].to_numpy(dtype=dtype) for c in columns}
+        return cls(days, values, site=site)
+
+    @classmethod
+    def from_sites(cls, df: pd.DataFrame, columns: Optional[Iterable[str]] = None,
+                   dtype: str = 'float32') -> Dict[str, 'DailySeries']:
+        """Split a long multi-site frame into one series per site."""
+        return {
+            site: cls.from_frame(group, columns=columns, site=site, dtype=dtype)
+            for site, group in df.groupby('site', sort=True)
+        }
+
+    # ------------------------------------------------------------------
+    # Basic protocol
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.values[column]
+
+    def __repr__(self) -> str:
+        if len(self) == 0:
+            return f"DailySeries(site={self.site!r}, empty)"
+        start, end = self.days[[0, -1]].astype('datetime64[D]')
+        return (f"DailySeries(site={self.site!r}, {start} to {end}, "
+                f"columns={list(self.values)}, {self.nbytes / 1024:.0f} KiB)")
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index and value arrays (excluding cached fields)."""
+        return self.days.nbytes + sum(a.nbytes for a in self.values.values())
+
+    # ------------------------------------------------------------------
+    # Lazily derived calendar fields
+    # ------------------------------------------------------------------
+    def _field(self, name: str) -> np.ndarray:
+        cached = self._calendar.get(name)
+        if cached is not None:
+            return cached
+
+        dates = self.days.astype('datetime64[D]')
+        if name == 'year':
+            result = (dates.astype('datetime64[Y]').astype(np.int64) + 1970).astype(np.int16)
+        elif name == 'month':
+            result = (dates.astype('datetime64[M]').astype(np.int64) % 12 + 1).astype(np.int8)
+        elif name == 'dayofyear':
+            result = ((dates - dates.astype('datetime64[Y]')).astype(np.int64) + 1).astype(np.int16)
+        else:
+            raise KeyError(name)
+        self._calendar[name] = result
+        return result
+
+    @property
+    def year(self) -> np.ndarray:
+        return self._field('year')
+
+    @property
+    def month(self) -> np.ndarray:
+        return self._field('month')
+
+    @property
+    def dayofyear(self) -> np.ndarray:
+        return self._field('dayofyear')
+
+    def season_year(self, first_month: int = 9) -> np.ndarray:
+        """Year in which the season starting at ``first_month`` began."""
+        return np.where(self.month < first_month, self.year - 1, self.year).astype(np.int16)
+
+    # ------------------------------------------------------------------
+    # Selection
+    # ------------------------------------------------------------------
+    def slice(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> 'DailySeries':
+        """Inclusive date-range slice; index, values and cached fields are views."""
+        lo = 0 if start is None else int(np.searchsorted(self.days, to_epoch_day(start)))
+        hi = len(self.days) if end is None else int(np.searchsorted(self.days, to_epoch_day(end), side='right'))
+
+        out = DailySeries.__new__(DailySeries)
+        out.site = self.site
+        out.days = self.days[lo:hi]
+        out.values = {name: array[lo:hi] for name, array in self.values.items()}
+        out._calendar = {name: array[lo:hi] for name, array in self._calendar.items()}
+        out._index = None if self._index is None else self._index[lo:hi]
+        return out
+
+    def years(self, start_year: int, end_year: int) -> 'DailySeries':
+        """Slice whole calendar years ``start_year``..``end_year``."""
+        return self.slice(f'{start_year}-01-01', f'{end_year}-12-31')
+
+    def month_mask(self, months: Iterable[int]) -> np.ndarray:
+        """Boolean mask for the given months (e.g. [9, 10, 11, 12, 1, 2])."""
+        lookup = np.zeros(13, dtype=bool)
+        lookup[list(months)] = True
+        return lookup[self.month]
+
+    def astype(self, dtype: str) -> 'DailySeries':
+        """Copy with value arrays cast to ``dtype`` (e.g. 'float16' for archival)."""
+        return DailySeries(self.days, {k: v.astype(dtype) for k, v in self.values.items()}, site=self.site)
+
+    # ------------------------------------------------------------------
+    # Conversion
+    # ------------------------------------------------------------------
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        """DatetimeIndex for plotting; built once and cached."""
+        if self._index is None:
+            self._index = pd.DatetimeIndex(self.days.astype('datetime64[D]').astype('datetime64[s]'),
+                                           name='date')
+        return self._index
+
+    def to_pandas(self, calendar: bool = False) -> pd.DataFrame:
+        """DataFrame view indexed by date; value columns share memory with this series.
+
+        With ``calendar=True`` the cached month/dayofyear/year fields are
+        attached as columns too.
+        """
+        columns = dict(self.values)
+        if calendar:
+            columns.update({'year': self.year, 'month': self.month, 'dayofyear': self.dayofyear})
+        return pd.DataFrame(columns, index=self.dates, copy=False)
+
+
+def main():
+    """Example usage of the daily series container."""
+    df = pd.read_csv('data/era5/era5_1980_2024.csv', parse_dates=['date'])
+    series = DailySeries.from_frame(df, columns=['temperature_celsius'], site='Rahima_Moosa_Hospital')
+
+    frame_bytes = df.memory_usage(deep=True).sum()
+    print(series)
+    print(f"DataFrame: {frame_bytes / 1024:.0f} KiB, DailySeries: {series.nbytes / 1024:.0f} KiB")
+
+    current = series.years(2015, 2024)
+    warm = current.month_mask([9, 10, 11, 12, 1, 2])
+    print(f"2015-2024 warm-season mean Tmax: {current['temperature_celsius'][warm].mean():.1f}°C")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Daily Series Coverage Module
+---------------------------
+Gap detection, completeness reporting and vectorized gap filling for daily
+temperature series. Works on long frames holding one or many sites
+('site', 'date', value column) in a single pass.
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import logging
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Southern Hemisphere seasons, keyed by month
+SEASONS = {
+    12: 'Summer', 1: 'Summer', 2: 'Summer',
+    3: 'Autumn', 4: 'Autumn', 5: 'Autumn',
+    6: 'Winter', 7: 'Winter', 8: 'Winter',
+    9: 'Spring', 10: 'Spring', 11: 'Spring'
+}
+
+DEFAULT_SITE = 'Rahima_Moosa_Hospital'
+
+
+def _epoch_days(dates: pd.Series) -> np.ndarray:
+    return pd.to_datetime(dates).values.astype('datetime64[D]').astype(np.int64)
+
+
+def _with_site(df: pd.DataFrame) -> pd.DataFrame:
+    if 'site' in df.columns:
+        return df
+    return df.assign(site=DEFAULT_SITE)
+
+
+def _calendar(data: pd.DataFrame, start: Optional[str], end: Optional[str]) -> pd.DataFrame:
+    """Complete daily (site, date) calendar spanning each site's range."""
+    bounds = data.groupby('site')['date'].agg(['min', 'max'])
+    if start is not None:
+        bounds['min'] = pd.Timestamp(start)
+    if end is not None:
+        bounds['max'] = pd.Timestamp(end)
+    lengths = (bounds['max'] - bounds['min']).dt.days.to_numpy() + 1
+    first = bounds['min'].values.astype('datetime64[D]').astype(np.int64)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return pd.DataFrame({
+        'site': np.repeat(bounds.index.to_numpy(), lengths),
+        'date': pd.to_datetime(np.repeat(first, lengths) + offsets, unit='D')
+    })
+
+
+def find_gaps(df: pd.DataFrame, value_col: str = 'temperature_celsius',
+              start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+    """Find runs of missing days per site.
+
+    A day is missing when it has no row or its value is NaN. With ``start``
+    and ``end`` given, missing days at either edge of the range are
+    reported too. Returns one row per gap: site, gap_start, gap_end, n_days.
+    """
+    data = _with_site(df)[['site', 'date', value_col]].dropna(subset=[value_col])
+    data = data.assign(day=_epoch_days(data['date'])).sort_values(['site', 'day'])
+    data = data.drop_duplicates(['site', 'day'])
+
+    site_codes, sites = pd.factorize(data['site'])
+    days = data['day'].to_numpy()
+
+    # Sentinels at the requested edges so leading/trailing gaps show up in the diff
+    if start is not None or end is not None:
+        lo = _epoch_days(pd.Series([start]))[0] - 1 if start is not None else None
+        hi = _epoch_days(pd.Series([end]))[0] + 1 if end is not None else None
+        extra_codes, extra_days = [], []
+        for code in range(len(sites)):
+            if lo is not None:
+                extra_codes.append(code)
+                extra_days.append(lo)
+            if hi is not None:
+                extra_codes.append(code)
+                extra_days.append(hi)
+        site_codes = np.r_[site_codes, extra_codes]
+        days = np.r_[days, extra_days]
+        order = np.lexsort((days, site_codes))
+        site_codes, days = site_codes[order], days[order]
+
+    step = np.diff(days)
+    same_site = np.diff(site_codes) == 0
+    is_gap = same_site & (step > 1)
+    idx = np.nonzero(is_gap)[0]
+
+    gaps = pd.DataFrame({
+        'site': np.asarray(sites)[site_codes[idx]],
+        'gap_start': pd.to_datetime(days[idx] + 1, unit='D'),
+        'gap_end': pd.to_datetime(days[idx + 1] - 1, unit='D'),
+        'n_days': (step[idx] - 1).astype(int)
+    })
+    return gaps.reset_index(drop=True)
+
+
+def coverage_report(df: pd.DataFrame, value_col: str = 'temperature_celsius',
+                    start: Optional[str] = None, end: Optional[str] = None,
+                    by: str = 'year') -> pd.DataFrame:
+    """Completeness per site and year (``by='year'``) or per site, year and season (``by='season'``).
+
+    Expected days come from the full calendar between ``start`` and ``end``
+    (default: each site's first and last date). Seasons are attributed to
+    the calendar year of each day.
+    """
+    data = _with_site(df)[['site', 'date', value_col]].copy()
+    data['date'] = pd.to_datetime(data['date']).dt.normalize()
+    data = data.drop_duplicates(['site', 'date'])
+
+    calendar = _calendar(data, start, end).merge(data, on=['site', 'date'], how='left')
+    calendar['present'] = calendar[value_col].notna()
+
+    keys = ['site', calendar['date'].dt.year.rename('year')]
+    if by == 'season':
+        keys.append(calendar['date'].dt.month.map(SEASONS).rename('season'))
+    elif by != 'year':
+        raise ValueError(f"Unknown grouping: {by}")
+
+    report = calendar.groupby(keys)['present'].agg(expected_days='size', observed_days='sum')
+    report['missing_days'] = report['expected_days'] - report['observed_days']
+    report['completeness'] = report['observed_days'] / report['expected_days']
+    return report.reset_index()
+
+
+def fill_gaps(df: pd.DataFrame, value_col: str = 'temperature_celsius',
+              max_gap: int = 3, method: str = 'interpolate',
+              start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+    """Reindex each site to a complete daily calendar and fill gaps of up to ``max_gap`` days.
+
+    ``method='interpolate'`` fills linearly between the neighbouring days;
+    ``method='climatology'`` fills with the site's day-of-year mean shifted
+    by the linearly interpolated anomaly, which keeps the seasonal cycle
+    intact across longer gaps. Longer gaps stay NaN. A boolean 'filled'
+    column marks the filled days.
+    """
+    if method not in ('interpolate', 'climatology'):
+        raise ValueError(f"Unknown fill method: {method}")
+
+    data = _with_site(df).copy()
+    data['date'] = pd.to_datetime(data['date']).dt.normalize()
+    data = data.drop_duplicates(['site', 'date']).sort_values(['site', 'date'])
+
+    full = _calendar(data, start, end).merge(data, on=['site', 'date'], how='left')
+
+    missing = full[value_col].isna().to_numpy()
+    site_codes = pd.factorize(full['site'])[0]
+
+    # Length of the missing run each day belongs to, via one cumsum over run starts
+    new_site = np.r_[True, np.diff(site_codes) != 0]
+    last_of_site = np.r_[new_site[1:], True]
+    run_start = missing & (new_site | ~np.r_[False, missing[:-1]])
+    run_id = np.cumsum(run_start) - 1
+    run_len = np.zeros(len(full), dtype=np.int64)
+    fillable = np.zeros(len(full), dtype=bool)
+    if missing.any():
+        n_runs = int(run_start.sum())
+        lengths = np.bincount(run_id[missing], minlength=n_runs)
+        # Runs touching either end of a site's record have no bracketing values
+        edge_runs = np.zeros(n_runs, dtype=bool)
+        edge_runs[run_id[missing & (new_site | last_of_site)]] = True
+        run_len[missing] = lengths[run_id[missing]]
+        fillable[missing] = ~edge_runs[run_id[missing]]
+        fillable &= run_len <= max_gap
+
+    # Interior runs are bracketed by the same site, so one interpolation over
+    # the stacked column never bridges two sites for the days we keep
+    values = full[value_col].astype(float)
+    if method == 'climatology':
+        doy = full['date'].dt.dayofyear
+        clim = values.groupby([full['site'], doy]).transform('mean')
+        filled = clim + (values - clim).interpolate()
+    else:
+        filled = values.interpolate()
+
+    full[value_col] = np.where(fillable, filled, values)
+    full['filled'] = fillable & full[value_col].notna().to_numpy()
+
+    n_filled = int(full['filled'].sum())
+    n_left = int(full[value_col].isna().sum())
+    logger.info(f"Filled {n_filled} missing days ({method}); {n_left} days remain missing")
+
+    if 'site' not in df.columns:
+        full = full.drop(columns='site')
+    return full
+
+
+def summarize_gaps(gaps: pd.DataFrame) -> List[str]:
+    """Human-readable gap lines for logging."""
+    return [
+        f"{row.site}: {row.gap_start:%Y-%m-%d} to {row.gap_end:%Y-%m-%d} ({row.n_days} days)"
+        for row in gaps.itertuples()
+    ]
+
+
+def main():
+    """Example usage of the coverage tools."""
+    data = pd.read_csv('data/era5/era5_1980_2024.csv', parse_dates=['date'])
+
+    gaps = find_gaps(data, start='1980-01-01', end='2024-12-31')
+    print(f"Found {len(gaps)} gaps")
+    for line in summarize_gaps(gaps.head(10)):
+        print(f"  {line}")
+
+    report = coverage_report(data, start='1980-01-01', end='2024-12-31', by='season')
+    print(report[report['completeness'] < 1].to_string(index=False))
+
+    filled = fill_gaps(data, max_gap=3, method='climatology')
+    print(f"Filled days: {int(filled['filled'].sum())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ from typing import Dict, List, Tuple, Optional
 import requests
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Union
+from data_coverage import fill_gaps, find_gaps, summarize_gaps
 
 # Set up logging
 logging.basicConfig(
@@ -52,6 +53,7 @@ class DataConfig:
         'standard': 2,          # Standard definition
         'saws': 3               # SAWS definition
     })
+    max_gap_days: int = field(default=3)  # Longest gap filled before validation
 
 class ERA5DataRetriever:
     """Retrieves ERA5 temperature data from local files."""
@@ -272,6 +274,13 @@ class TemperatureDataRetriever:
             self.config.end_year
         )
         
+        # Fill short gaps on the full daily calendar before any month filtering
+        df = fill_gaps(df, max_gap=self.config.max_gap_days, method='climatology')
+        
+        # Detect the remaining gaps on the full calendar too, so the Mar-Aug
+        # off-season removed below is not mistaken for missing data
+        gaps = find_gaps(df, start=df['date'].min(), end=df['date'].max())
+        
         # Filter for spring and summer months (Sep-Feb)
         # Handle wrapping of summer months (Dec-Feb)
         summer_months = df['date'].dt.month.isin([12, 1, 2])
@@ -279,17 +288,33 @@ class TemperatureDataRetriever:
         df = df[summer_months | spring_months].copy()
         
         # Validate data
-        self.validate_data(df)
+        self.validate_data(df, gaps)
         
         return df
     
-    def validate_data(self, df: pd.DataFrame):
-        """Validate data quality."""
+    def validate_data(self, df: pd.DataFrame, gaps: Optional[pd.DataFrame] = None):
+        """Validate data quality.
+        
+        ``gaps`` are the gaps found on the full daily calendar (before month
+        filtering); only those holding missing days of ``df`` are reported.
+        """
         if df.empty:
             raise ValueError("No data retrieved")
         
-        if df['temperature_celsius'].isna().any():
-            raise ValueError("Missing temperature values in data")
+        missing = df['temperature_celsius'].isna()
+        if missing.any():
+            if gaps is None:
+                gaps = find_gaps(df, start=df['date'].min(), end=df['date'].max())
+            missing_days = np.sort(df.loc[missing, 'date'].values)
+            first = np.searchsorted(missing_days, gaps['gap_start'].values)
+            last = np.searchsorted(missing_days, gaps['gap_end'].values, side='right')
+            gaps = gaps[last > first]
+            for line in summarize_gaps(gaps.head(10)):
+                logger.error(f"Unfilled gap: {line}")
+            raise ValueError(
+                f"Missing temperature values in data: {len(gaps)} gaps longer than "
+                f"{self.config.max_gap_days} days"
+            )
         
         # Check for unrealistic values (Johannesburg rarely exceeds these)
         if (df['temperature_celsius'] > 40).any() or (df['temperature_celsius'] < 0).any():
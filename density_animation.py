@@ -0,0 +1,286 @@
+"""
+Artist-Reuse Density Animation
+-----------------------------
+Animates temperature density curves by building the figure once and then
+only updating line, fill and text artist data between frames, instead of
+rebuilding and restyling a new figure for every frame.
+
+All density curves are precomputed up front on a shared temperature grid.
+With blitting enabled the static background (axes, grid, titles, legend)
+is rasterised once and each frame only redraws the animated artists.
+
+Two modes are provided:
+- progressive: periods are revealed one after another (temperature_analysis.gif)
+- evolution: one curve morphs through a sequence of periods (temperature_evolution.gif)
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from animation_writer import AnimationWriter
+from kde_engine import KDEGrid, batch_kde
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DensityPeriod:
+    """One period's temperatures and styling."""
+    label: str
+    values: np.ndarray
+    color: str
+
+
+@dataclass
+class DensityAnimationConfig:
+    """Layout and styling for the density animation."""
+    title: str = field(default='Maximum Temperature Analysis for Johannesburg')
+    subtitle: str = field(default='')
+    location: str = field(default='Location: Rahima Moosa Mother and Child Hospital (-26.1752°S, 28.0183°E)')
+    figsize: Tuple[float, float] = field(default=(12, 8))
+    dpi: int = field(default=100)
+    grid_points: int = field(default=400)
+    temp_range: Optional[Tuple[float, float]] = field(default=None)
+    fill_alpha: float = field(default=0.3)
+
+
+class DensityAnimator:
+    """Builds one figure and updates its artists frame by frame."""
+
+    def __init__(self, periods: Sequence[DensityPeriod],
+                 config: Optional[DensityAnimationConfig] = None):
+        """Initialize with periods and precompute every density."""
+        self.periods = list(periods)
+        self.config = config or DensityAnimationConfig()
+
+        all_values = np.concatenate([np.asarray(p.values, dtype=float) for p in self.periods])
+        lo, hi = self.config.temp_range or (np.floor(all_values.min()) - 2, np.ceil(all_values.max()) + 2)
+        self.grid, self.densities = batch_kde(
+            [p.values for p in self.periods],
+            grid=KDEGrid(float(lo), float(hi), self.config.grid_points)
+        )
+        self.means = np.array([np.mean(p.values) for p in self.periods])
+
+        self.fig = None
+        self.ax = None
+        self._lines = []
+        self._fills = []
+        self._texts = []
+        self._mean_text = None
+        self._background = None
+
+    # ------------------------------------------------------------------
+    # Figure construction (once)
+    # ------------------------------------------------------------------
+    def build(self, blit: bool = True, legend: bool = True):
+        """Create the figure, static styling and (hidden) animated artists.
+
+        With ``legend=False`` no period legend is drawn; the evolution mode
+        relies on its animated period label instead, since a legend listing
+        dozens of rolling windows would cover the curve.
+        """
+        import matplotlib.patches as patches
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        cfg = self.config
+        # Drawn on its own Agg canvas, outside pyplot, so the caller's backend and figures are untouched
+        fig = Figure(figsize=cfg.figsize, dpi=cfg.dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        fig.text(0.5, 0.98, cfg.title, fontsize=14, fontweight='bold', ha='center')
+        if cfg.subtitle:
+            fig.text(0.5, 0.935, cfg.subtitle, fontsize=12, ha='center')
+        fig.text(0.5, 0.89, cfg.location, fontsize=10, ha='center', style='italic')
+
+        ax.set_xlim(0, self.densities.max() * 1.3)
+        ax.set_ylim(self.grid[0], self.grid[-1])
+        ax.set_ylabel('Maximum Temperature (°C)')
+        ax.set_xlabel('Frequency')
+        ax.set_xticks([])
+        ax.grid(True, axis='y', alpha=0.3, linestyle='--')
+
+        if legend:
+            handles = [patches.Patch(color=p.color) for p in reversed(self.periods)]
+            ax.legend(handles, [p.label for p in reversed(self.periods)], loc='upper left')
+
+        x_text = ax.get_xlim()[1] * 0.85
+        for period in self.periods:
+            line, = ax.plot([], [], color=period.color, linewidth=1.5, visible=False)
+            fill = ax.fill_betweenx(self.grid, 0, 0, color=period.color,
+                                    alpha=cfg.fill_alpha, visible=False)
+            text = ax.text(x_text, self.grid[0], '', color=period.color, ha='left',
+                           va='center', fontweight='bold', visible=False)
+            self._lines.append(line)
+            self._fills.append(fill)
+            self._texts.append(text)
+        self._mean_text = ax.text(0.98, 0.02, '', transform=ax.transAxes, ha='right',
+                                  va='bottom', fontsize=11, fontweight='bold', visible=False)
+
+        self.fig, self.ax = fig, ax
+        if blit:
+            for artist in self._animated_artists():
+                artist.set_animated(True)
+            fig.canvas.draw()
+            self._background = fig.canvas.copy_from_bbox(fig.bbox)
+        return fig
+
+    def _animated_artists(self) -> List:
+        return [*self._fills, *self._lines, *self._texts, self._mean_text]
+
+    # ------------------------------------------------------------------
+    # Artist updates
+    # ------------------------------------------------------------------
+    def _set_curve(self, i: int, density: np.ndarray, color: Optional[str] = None) -> None:
+        self._lines[i].set_data(density, self.grid)
+        verts = np.column_stack([
+            np.r_[density, np.zeros(1)],
+            np.r_[self.grid, self.grid[-1]]
+        ])
+        verts = np.vstack([[0.0, self.grid[0]], verts])
+        self._fills[i].set_verts([verts])
+        if color is not None:
+            self._lines[i].set_color(color)
+            self._fills[i].set_color(color)
+        self._lines[i].set_visible(True)
+        self._fills[i].set_visible(True)
+
+    def _hide(self, i: int) -> None:
+        self._lines[i].set_visible(False)
+        self._fills[i].set_visible(False)
+        self._texts[i].set_visible(False)
+
+    def show_progressive(self, n_visible: int) -> None:
+        """Show the first ``n_visible`` periods with change annotations between them."""
+        for i in range(len(self.periods)):
+            if i >= n_visible:
+                self._hide(i)
+                continue
+            self._set_curve(i, self.densities[i])
+            if i > 0:
+                change = self.means[i] - self.means[i - 1]
+                self._texts[i].set_text(f'{change:+.1f}°C')
+                self._texts[i].set_y((self.means[i] + self.means[i - 1]) / 2)
+                self._texts[i].set_visible(True)
+        self._mean_text.set_visible(False)
+
+    def show_evolution(self, t: float) -> None:
+        """Show one curve interpolated at position ``t`` along the period sequence."""
+        n = len(self.periods) - 1
+        t = float(np.clip(t, 0, n))
+        i = min(int(np.floor(t)), max(n - 1, 0))
+        w = t - i
+        j = min(i + 1, n)
+
+        density = (1 - w) * self.densities[i] + w * self.densities[j]
+        mean = (1 - w) * self.means[i] + w * self.means[j]
+        color = self.periods[j].color if w >= 0.5 else self.periods[i].color
+        label = self.periods[j].label if w >= 0.5 else self.periods[i].label
+
+        self._set_curve(0, density, color=color)
+        for k in range(1, len(self.periods)):
+            self._hide(k)
+        self._texts[0].set_visible(False)
+        self._mean_text.set_text(f'{label}   Mean: {mean:.1f}°C')
+        self._mean_text.set_visible(True)
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+    def grab(self) -> np.ndarray:
+        """Render the current state and return RGB pixels."""
+        canvas = self.fig.canvas
+        if self._background is not None:
+            canvas.restore_region(self._background)
+            for artist in self._animated_artists():
+                if artist.get_visible():
+                    self.ax.draw_artist(artist)
+            # Keep the axis lines on top of the fills, as in a full redraw
+            for spine in self.ax.spines.values():
+                self.ax.draw_artist(spine)
+        else:
+            canvas.draw()
+        return np.asarray(canvas.buffer_rgba())[..., :3].copy()
+
+    def render_progressive(self, path: Union[str, Path], durations: Sequence[float],
+                           blit: bool = True) -> Path:
+        """Write the progressive-reveal animation (one frame per entry in ``durations``)."""
+        if self.fig is None:
+            self.build(blit=blit)
+        with AnimationWriter(path, durations=durations) as writer:
+            for frame in range(1, len(durations) + 1):
+                self.show_progressive(min(frame, len(self.periods)))
+                writer.append(self.grab())
+        return Path(path)
+
+    def render_evolution(self, path: Union[str, Path], steps_per_period: int = 12,
+                         fps: float = 12, hold_frames: int = 12, blit: bool = True) -> Path:
+        """Write an animation morphing through all periods in order."""
+        if self.fig is None:
+            self.build(blit=blit, legend=False)
+        n = len(self.periods) - 1
+        positions = np.r_[np.linspace(0, n, n * steps_per_period + 1), np.full(hold_frames, n)]
+        with AnimationWriter(path, fps=fps) as writer:
+            for t in positions:
+                self.show_evolution(t)
+                writer.append(self.grab())
+        return Path(path)
+
+    def close(self) -> None:
+        # The figure is not registered with pyplot; dropping it frees it
+        self.fig = self.ax = None
+        self._lines, self._fills, self._texts = [], [], []
+        self._mean_text = self._background = None
+
+
+def periods_from_frame(df, windows: Dict[str, Tuple[int, int]], colors: Sequence[str],
+                       months: Sequence[int] = (9, 10, 11, 12, 1, 2),
+                       value_col: str = 'temperature_celsius') -> List[DensityPeriod]:
+    """Build DensityPeriods from a daily frame and a mapping of label -> (start_year, end_year)."""
+    import pandas as pd
+
+    dates = pd.to_datetime(df['date'])
+    in_season = dates.dt.month.isin(months)
+    periods = []
+    for (label, (start, end)), color in zip(windows.items(), colors):
+        mask = in_season & (dates.dt.year >= start) & (dates.dt.year <= end)
+        periods.append(DensityPeriod(label, df.loc[mask, value_col].to_numpy(dtype=float), color))
+    return periods
+
+
+def main():
+    """Example: temperature evolution through rolling decades of ERA5 Tmax."""
+    import time
+    import pandas as pd
+    from matplotlib import colormaps
+
+    df = pd.read_csv('data/era5/era5_1980_2024.csv')
+    windows = {f'{y}-{y + 9}': (y, y + 9) for y in range(1980, 2016)}
+    cmap = colormaps['RdYlBu_r']
+    colors = [cmap(i / (len(windows) - 1)) for i in range(len(windows))]
+
+    animator = DensityAnimator(
+        periods_from_frame(df, windows, colors),
+        DensityAnimationConfig(subtitle='Rolling 10-year windows, spring & summer (Sep-Feb)')
+    )
+    start = time.perf_counter()
+    animator.render_evolution('temperature_evolution.gif', steps_per_period=4)
+    logger.info(f"Rendered in {time.perf_counter() - start:.1f}s")
+    animator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Multi-Format Figure Export
+-------------------------
+Writes PNG, SVG and PDF versions of one built figure in parallel.
+
+- The figure is built once, pickled once and saved by a persistent pool of
+  worker processes, one format per worker.
+- Artists with more points than ``raster_threshold`` (dense scatters, long
+  lines, KDE fills with many vertices) are rasterized automatically, so
+  vector outputs stay small while axes, text and annotations remain vector.
+  Vector formats are saved at ``raster_dpi``, which only sets the
+  resolution of those rasterized artists: at the PNG dpi the embedded
+  bitmaps can outweigh the vector paths they replace.
+- Embedded TrueType font subsets are memoised per (font, glyph set) in each
+  process, at the fontTools level, so repeated PDF/PS saves of figures with
+  the same text skip re-subsetting the font.
+
+Usage:
+    from figure_export import export_figure
+
+    fig = build_my_figure()
+    export_figure(fig, 'paper_figures_color/temperature_ridges')
+    # -> temperature_ridges.png, .svg, .pdf
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import atexit
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+# fontTools reports every subsetting step at INFO
+logging.getLogger('fontTools.subset').setLevel(logging.WARNING)
+
+VECTOR_FORMATS = {'svg', 'pdf', 'eps', 'ps'}
+
+
+@dataclass
+class ExportConfig:
+    """Configuration for multi-format export."""
+    formats: List[str] = field(default_factory=lambda: ['png', 'svg', 'pdf'])
+    dpi: int = field(default=300)
+    raster_dpi: int = field(default=150)           # Rasterized artists in vector formats
+    raster_threshold: int = field(default=5000)    # Points per artist before rasterizing
+    processes: Optional[int] = field(default=None)  # Default: one per format
+    savefig_kwargs: Dict = field(default_factory=lambda: {'bbox_inches': 'tight'})
+    # Type 42 keeps PDF text as (subsetted) TrueType, as journals ask for
+    rc: Dict = field(default_factory=lambda: {'pdf.fonttype': 42, 'ps.fonttype': 42})
+
+
+# ----------------------------------------------------------------------
+# Rasterization
+# ----------------------------------------------------------------------
+def count_points(artist) -> int:
+    """Number of data points or path vertices drawn by an artist."""
+    from matplotlib.collections import Collection
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import Patch
+
+    if isinstance(artist, Line2D):
+        return len(artist.get_xdata(orig=False))
+    if isinstance(artist, Collection):
+        offsets = artist.get_offsets()
+        paths = artist.get_paths()
+        vertices = sum(len(p.vertices) for p in paths)
+        return max(len(offsets) if offsets is not None else 0, vertices)
+    if isinstance(artist, Patch):
+        return len(artist.get_path().vertices)
+    return 0
+
+
+def rasterize_heavy_artists(fig, threshold: int) -> List:
+    """Mark artists above ``threshold`` points as rasterized; returns them."""
+    heavy = []
+    for ax in fig.get_axes():
+        for artist in [*ax.lines, *ax.collections, *ax.patches]:
+            if not artist.get_rasterized() and count_points(artist) > threshold:
+                artist.set_rasterized(True)
+                heavy.append(artist)
+    return heavy
+
+
+# ----------------------------------------------------------------------
+# Font subset cache
+# ----------------------------------------------------------------------
+_SUBSET_CACHE: Dict[Tuple, Tuple[bytes, Dict[int, int]]] = {}
+
+
+def _subset_key(subsetter, font) -> Optional[Tuple]:
+    """Cache key for one subsetting call, or None if the font has no file name."""
+    source = getattr(getattr(font.reader, 'file', None), 'name', None)
+    if source is None:
+        return None
+    options = subsetter.options
+    requested: Tuple[FrozenSet, ...] = (
+        frozenset(subsetter.glyph_ids_requested),
+        frozenset(subsetter.glyph_names_requested),
+        frozenset(subsetter.unicodes_requested),
+    )
+    return (str(source), options.font_number, requested, repr(sorted(vars(options).items())))
+
+
+def enable_font_subset_cache() -> bool:
+    """Memoise fontTools font subsets in this process; returns False without fontTools.
+
+    matplotlib's PDF and PS backends subset embedded TrueType fonts through
+    the public ``fontTools.subset.Subsetter``. This installs a subclass that
+    keeps each subset's bytes and glyph index map per (font, glyph set,
+    options); a repeat request restores the subset into the loaded font
+    instead of recomputing the glyph closure. Output is byte-identical.
+    """
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        return False
+    if getattr(subset.Subsetter, 'cached', False):
+        return True
+
+    class CachingSubsetter(subset.Subsetter):
+        cached = True
+
+        def subset(self, font):
+            key = _subset_key(self, font)
+            entry = _SUBSET_CACHE.get(key) if key is not None else None
+            if entry is None:
+                super().subset(font)
+                if key is not None:
+                    fh = BytesIO()
+                    font.save(fh, reorderTables=False)
+                    _SUBSET_CACHE[key] = (fh.getvalue(), dict(self.glyph_index_map))
+                return
+            data, index_map = entry
+            self.glyph_index_map = dict(index_map)
+            # Glyphs stay compiled (lazy=None), so re-saving reproduces the same bytes
+            cached_font = TTFont(BytesIO(data), lazy=None)
+            for tag in [t for t in font.keys() if t != 'GlyphOrder']:
+                del font[tag]
+            font.setGlyphOrder(cached_font.getGlyphOrder())
+            for tag in cached_font.keys():
+                if tag != 'GlyphOrder':
+                    font[tag] = cached_font[tag]
+
+    subset.Subsetter = CachingSubsetter
+    return True
+
+
+# ----------------------------------------------------------------------
+# Saving
+# ----------------------------------------------------------------------
+def _init_worker() -> None:
+    import matplotlib
+    matplotlib.use('Agg')
+    enable_font_subset_cache()
+
+
+def _save(payload: bytes, path: str, fmt: str, dpi: int, savefig_kwargs: Dict,
+          rc: Dict) -> Tuple[str, int, float]:
+    """Unpickle a figure and save it in one format (runs in a worker)."""
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    fig = pickle.loads(payload)
+    with plt.rc_context(rc):
+        fig.savefig(path, format=fmt, dpi=dpi, **savefig_kwargs)
+    plt.close(fig)
+    return path, os.path.getsize(path), time.perf_counter() - start
+
+
+def _format_dpi(fmt: str, config: ExportConfig) -> int:
+    """Output dpi for PNG; rasterized-artist dpi for vector formats."""
+    if fmt in VECTOR_FORMATS:
+        return min(config.dpi, config.raster_dpi)
+    return config.dpi
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_SIZE = 0
+
+
+def _pool(processes: int) -> ProcessPoolExecutor:
+    """Persistent worker pool, so repeated exports skip process start-up."""
+    global _POOL, _POOL_SIZE
+    if _POOL is None or _POOL_SIZE < processes:
+        if _POOL is not None:
+            _POOL.shutdown()
+        _POOL = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker)
+        _POOL_SIZE = processes
+        atexit.register(_POOL.shutdown)
+    return _POOL
+
+
+def export_figure(fig, stem: Union[str, Path], config: Optional[ExportConfig] = None,
+                  close: bool = True) -> Dict[str, Path]:
+    """Save ``fig`` as ``stem.<fmt>`` for every configured format; returns {fmt: path}."""
+    import matplotlib.pyplot as plt
+
+    config = config or ExportConfig()
+    stem = Path(stem)
+    stem.parent.mkdir(parents=True, exist_ok=True)
+
+    if any(fmt in VECTOR_FORMATS for fmt in config.formats):
+        heavy = rasterize_heavy_artists(fig, config.raster_threshold)
+        if heavy:
+            logger.info(f"Rasterized {len(heavy)} artists above {config.raster_threshold} points")
+
+    jobs = [(str(stem.with_suffix(f'.{fmt}')), fmt) for fmt in config.formats]
+    processes = config.processes or len(jobs)
+    start = time.perf_counter()
+
+    if processes <= 1 or len(jobs) == 1:
+        enable_font_subset_cache()
+        results = []
+        for path, fmt in jobs:
+            with plt.rc_context(config.rc):
+                t = time.perf_counter()
+                fig.savefig(path, format=fmt, dpi=_format_dpi(fmt, config), **config.savefig_kwargs)
+            results.append((path, os.path.getsize(path), time.perf_counter() - t))
+    else:
+        payload = pickle.dumps(fig)
+        pool = _pool(processes)
+        futures = [pool.submit(_save, payload, path, fmt, _format_dpi(fmt, config),
+                               config.savefig_kwargs, config.rc)
+                   for path, fmt in jobs]
+        results = [f.result() for f in futures]
+
+    if close:
+        plt.close(fig)
+    for path, size, elapsed in results:
+        logger.info(f"Wrote {path} ({size / 1024:.0f} KiB, {elapsed:.2f}s)")
+    logger.info(f"Exported {len(results)} formats in {time.perf_counter() - start:.2f}s")
+    return {fmt: Path(path) for (path, fmt) in jobs}
+
+
+def main():
+    """Example: a dense scatter with a KDE-style fill exported to PNG, SVG and PDF."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    days = np.arange(45 * 365)
+    temps = 24 + 5 * np.sin(2 * np.pi * days / 365.25) + rng.normal(0, 2, len(days))
+
+    fig, ax = plt.subplots(figsize=(10, 4))
+    ax.scatter(days / 365.25 + 1980, temps, s=1, color='#990F3D', alpha=0.3)
+    ax.fill_between(days / 365.25 + 1980, temps - 3, temps + 3, color='#0F5499', alpha=0.1)
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Maximum Temperature (°C)')
+    export_figure(fig, 'figures/export_example')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Declarative Figure Specifications
+--------------------------------
+Renders figures described in a JSON (or YAML) spec instead of one
+near-duplicate script per variant. A spec names its data sources once and
+lists variants; a variant can ``extends`` another and override only what
+differs (colors, spacing, data, text).
+
+All variants of a spec render in one process: data sources are loaded once,
+pyplot and the font choice are initialised once (via plot_style), and each
+variant only costs its own drawing.
+
+Spec layout (see figure_specs/seasonal_comparison.json):
+
+    {
+      "data":     {"name": {"column": [...], ...} | {"csv": "path.csv"}},
+      "variants": {
+        "base":  {"output": "...png", "layout": [1, 3], "figsize": [18, 6],
+                  "style": {...}, "panels": [{...}, ...], "suptitle": {...}},
+        "v2":    {"extends": "base", "panels": {"2": {"ylim": [-3, 4.5]}}}
+      }
+    }
+
+In an override, a list may be replaced by a dict keyed by position to
+change single elements (e.g. one panel or one note). A variant with
+``"formats": ["png", "svg", "pdf"]`` is exported in all of them next to
+``output`` via figure_export.
+
+Usage:
+    python figure_spec.py figure_specs/seasonal_comparison.json
+    python figure_spec.py figure_specs/seasonal_comparison.json --variant ft_v7
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import argparse
+import copy
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import plot_style
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAVEFIG = {'dpi': 300, 'bbox_inches': 'tight'}
+
+
+def load_spec(path: Union[str, Path]) -> Dict:
+    """Read a JSON or YAML spec file."""
+    path = Path(path)
+    text = path.read_text(encoding='utf-8')
+    if path.suffix.lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("PyYAML is required for YAML specs; use JSON or `pip install pyyaml`") from e
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def _merge(base: Any, override: Any) -> Any:
+    """Deep-merge ``override`` into ``base``; a dict of positions patches a list."""
+    if isinstance(base, dict) and isinstance(override, dict):
+        merged = dict(base)
+        for key, value in override.items():
+            merged[key] = _merge(base[key], value) if key in base else copy.deepcopy(value)
+        return merged
+    if isinstance(base, list) and isinstance(override, dict):
+        merged = list(base)
+        for index, value in override.items():
+            merged[int(index)] = _merge(merged[int(index)], value)
+        return merged
+    return copy.deepcopy(override)
+
+
+def resolve_variants(spec: Dict) -> Dict[str, Dict]:
+    """Expand ``extends`` chains into complete variant definitions."""
+    raw = spec['variants']
+    resolved: Dict[str, Dict] = {}
+
+    def resolve(name: str, chain: tuple = ()) -> Dict:
+        if name in resolved:
+            return resolved[name]
+        if name in chain:
+            raise ValueError(f"Circular 'extends' in spec: {' -> '.join(chain + (name,))}")
+        variant = dict(raw[name])
+        parent = variant.pop('extends', None)
+        if parent is not None:
+            variant = _merge(resolve(parent, chain + (name,)), variant)
+        resolved[name] = variant
+        return variant
+
+    for name in raw:
+        resolve(name)
+    return resolved
+
+
+def spec_outputs(spec: Dict, root: Path = Path('.')) -> List[Path]:
+    """Output paths of every variant, for build tooling."""
+    outputs = []
+    for variant in resolve_variants(spec).values():
+        output = root / variant['output']
+        outputs.append(output)
+        outputs.extend(output.with_suffix(f'.{fmt}') for fmt in variant.get('formats', [])
+                       if output.with_suffix(f'.{fmt}') != output)
+    return outputs
+
+
+def spec_inputs(spec: Dict, root: Path = Path('.')) -> List[Path]:
+    """Data files referenced by a spec."""
+    return [root / source['csv'] for source in spec.get('data', {}).values()
+            if isinstance(source, dict) and 'csv' in source]
+
+
+class FigureSpecRenderer:
+    """Renders the variants of one spec, sharing data and setup between them."""
+
+    def __init__(self, spec: Dict):
+        """Initialize with a loaded spec; data sources are loaded lazily and once."""
+        self.spec = spec
+        self.variants = resolve_variants(spec)
+        self._data: Dict[str, Dict[str, list]] = {}
+
+    def data(self, name: str) -> Dict[str, list]:
+        if name not in self._data:
+            source = self.spec['data'][name]
+            if 'csv' in source:
+                import pandas as pd
+                frame = pd.read_csv(source['csv'])
+                self._data[name] = {c: frame[c].tolist() for c in frame.columns}
+            else:
+                self._data[name] = source
+        return self._data[name]
+
+    # ------------------------------------------------------------------
+    # Drawing
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _color(style: Dict, name: str) -> str:
+        return style.get('palette', {}).get(name, name)
+
+    def _draw_panel(self, ax, panel: Dict, style: Dict) -> None:
+        data = self.data(panel['data'])
+        labels, values = data[panel['x']], data[panel['y']]
+        positions = panel.get('positions', list(range(len(values))))
+        colors = [self._color(style, c) for c in panel['colors']]
+
+        bars = ax.bar(positions, values, color=colors, width=panel.get('width', 0.8))
+        ax.set_xticks(positions)
+        ax.set_xticklabels(labels, **({'color': panel['xticklabel_color']}
+                                      if 'xticklabel_color' in panel else {}))
+
+        value_labels = panel.get('value_labels')
+        if value_labels:
+            offset = value_labels.get('offset', 0)
+            text_kwargs = {k: value_labels[k] for k in ('color', 'fontsize') if k in value_labels}
+            for bar in bars:
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width() / 2.,
+                        height + (offset if height >= 0 else -offset),
+                        value_labels['format'].format(height),
+                        ha='center', va='bottom' if height >= 0 else 'top', **text_kwargs)
+
+        ax.set_title(panel['title'], **style.get('title', {}))
+        ax.set_ylabel(panel['ylabel'], **style.get('ylabel', {}))
+        ax.grid(axis='y', alpha=panel.get('grid_alpha', 0.2))
+        if 'ylim' in panel:
+            ax.set_ylim(*panel['ylim'])
+        for spine in style.get('hide_spines', []):
+            ax.spines[spine].set_visible(False)
+        for note in panel.get('notes', []):
+            ax.text(note['x'], note['y'], note['text'], transform=ax.transAxes,
+                    ha=note.get('ha', 'left'), **style.get('note', {}))
+
+    def _rc(self, style: Dict) -> Dict:
+        if style.get('theme'):
+            return plot_style.theme_rc(style['theme'], style.get('rc'))
+        return dict(style.get('rc', {}))
+
+    def render(self, name: str) -> Path:
+        """Render one variant and return its output path."""
+        plt = plot_style.pyplot()
+        variant = self.variants[name]
+        style = variant.get('style', {})
+        base_style = style.get('mpl_style')
+
+        with plt.style.context([plot_style.style_name(base_style)] if base_style else []), \
+                plt.rc_context(self._rc(style)):
+            fig, axes = plt.subplots(*variant['layout'], figsize=variant['figsize'])
+            if 'facecolor' in style:
+                fig.patch.set_facecolor(style['facecolor'])
+
+            for ax, panel in zip(axes.flat, variant['panels']):
+                self._draw_panel(ax, panel, style)
+
+            suptitle = dict(variant['suptitle'])
+            fig.suptitle(suptitle.pop('text'), **suptitle)
+            fig.tight_layout(**variant.get('tight_layout', {}))
+
+            output = Path(variant['output'])
+            output.parent.mkdir(parents=True, exist_ok=True)
+            savefig = dict(DEFAULT_SAVEFIG)
+            savefig.update(variant.get('savefig', {}))
+            if 'formats' in variant:
+                from figure_export import ExportConfig, export_figure
+                dpi = savefig.pop('dpi')
+                config = ExportConfig(formats=variant['formats'], dpi=dpi, savefig_kwargs=savefig)
+                export_figure(fig, output.with_suffix(''), config)
+            else:
+                fig.savefig(output, **savefig)
+                plt.close(fig)
+        return output
+
+    def render_all(self, names: Optional[Sequence[str]] = None) -> List[Path]:
+        """Render the given variants (default: all) in this process."""
+        outputs = []
+        for name in names or list(self.variants):
+            start = time.perf_counter()
+            outputs.append(self.render(name))
+            logger.info(f"Rendered {name} -> {outputs[-1]} in {time.perf_counter() - start:.2f}s")
+        return outputs
+
+
+def render_spec(path: Union[str, Path], variants: Optional[Sequence[str]] = None) -> List[Path]:
+    """Load a spec file and render its variants."""
+    return FigureSpecRenderer(load_spec(path)).render_all(variants)
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description='Render figure variants from a declarative spec.')
+    parser.add_argument('spec', help='Spec file (.json, .yaml)')
+    parser.add_argument('--variant', action='append', help='Variant to render (repeatable; default all)')
+    parser.add_argument('--list', action='store_true', help='List variants and outputs')
+    args = parser.parse_args()
+
+    spec = load_spec(args.spec)
+    if args.list:
+        for name, variant in resolve_variants(spec).items():
+            print(f"{name}: {variant['output']}")
+        return
+
+    start = time.perf_counter()
+    outputs = FigureSpecRenderer(spec).render_all(args.variant)
+    logger.info(f"Rendered {len(outputs)} variants in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
-import seaborn as sns
 from matplotlib.dates import YearLocator
 import os
+from data_coverage import coverage_report
+from kde_engine import kdeplot
 
 # Initialize Earth Engine
 ee.Initialize()
@@ -69,9 +70,9 @@ df_recent['dayofyear'] = df_recent['date'].dt.dayofyear
 print("\nData Coverage:")
 print("Data range:", df_recent['date'].min().strftime('%Y-%m-%d'), "to", df_recent['date'].max().strftime('%Y-%m-%d'))
 print("\nDays per year:")
-for year in range(2011, 2020):
-    year_data = df_recent[df_recent['date'].dt.year == year]
-    print(f"{year}: {len(year_data)} days")
+coverage = coverage_report(df_recent, value_col='temperature', start='2011-01-01', end='2019-12-31')
+for row in coverage.itertuples():
+    print(f"{row.year}: {row.observed_days} days ({row.completeness:.1%} complete)")
 
 # Add threshold to recent data
 df_recent['threshold'] = df_recent['dayofyear'].map(threshold_90th)
@@ -115,8 +116,8 @@ plt.style.use('seaborn-v0_8')
 
 # Figure 1: Temperature Distribution Comparison
 plt.figure(figsize=(12, 6))
-sns.kdeplot(data=df_baseline, x='temperature', label='Baseline (1981-2010)', alpha=0.6)
-sns.kdeplot(data=df_recent, x='temperature', label='Recent (2011-2019)', alpha=0.6)
+kdeplot(plt.gca(), df_baseline['temperature'], label='Baseline (1981-2010)', alpha=0.6)
+kdeplot(plt.gca(), df_recent['temperature'], label='Recent (2011-2019)', alpha=0.6)
 plt.axvline(threshold_90th.mean(), color='r', linestyle='--', label='90th Percentile Threshold')
 plt.title('Temperature Distribution at Rahima Moosa Hospital')
 plt.xlabel('Maximum Daily Temperature (°C)')
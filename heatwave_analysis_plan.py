@@ -9,6 +9,7 @@ Institution: Wits Planetary Health Research
 Date: January 2025
 """
 
+import argparse
 from typing import Dict, List, Tuple, Optional
 import pandas as pd
 import numpy as np
@@ -46,35 +47,31 @@ class HeatWaveAnalyzer:
         self.config = config
         self.data_retriever = TemperatureDataRetriever(config.data_config)
     
-    def identify_heatwaves(self, data: pd.DataFrame) -> pd.DataFrame:
+    def identify_heatwaves(self, data: pd.DataFrame, threshold: Optional[float] = None,
+                           min_spell: int = 3) -> pd.DataFrame:
         """Identify heat wave days based on temperature threshold.
         
         A heat wave is defined as 3 or more consecutive days where the maximum 
         temperature exceeds the 90th percentile threshold (calculated from the 
-        historical period 1980-1989).
+        historical period 1980-1989). Pass ``threshold`` to apply a threshold
+        computed elsewhere, e.g. from a baseline period.
         """
         # Calculate 90th percentile threshold
-        threshold = np.percentile(data['temperature_celsius'], 90)
+        if threshold is None:
+            threshold = np.percentile(data['temperature_celsius'], 90)
         
         # Mark days above threshold
-        data['above_threshold'] = data['temperature_celsius'] > threshold
-        data['is_heatwave'] = False
+        above = (data['temperature_celsius'] > threshold).to_numpy()
+        data['above_threshold'] = above
         
-        # Find consecutive days (3 or more)
-        consecutive_days = []
-        current_streak = []
-        
-        for i, row in data.iterrows():
-            if row['above_threshold']:
-                current_streak.append(i)
-                if len(current_streak) >= 3:
-                    consecutive_days.extend(current_streak)
-            else:
-                current_streak = []
+        # Label runs of consecutive calendar days above the threshold
+        days = data['date'].values.astype('datetime64[D]').astype(np.int64)
+        continues = np.r_[False, above[:-1] & (np.diff(days) == 1)]
+        run_id = np.cumsum(above & ~continues)
+        run_length = np.bincount(run_id[above], minlength=len(above) + 1)
         
         # Mark heat wave days
-        if consecutive_days:
-            data.loc[consecutive_days, 'is_heatwave'] = True
+        data['is_heatwave'] = above & (run_length[run_id] >= min_spell)
         
         return data
     
@@ -112,6 +109,11 @@ class HeatWaveAnalyzer:
 
 def main():
     """Main function to run heat wave analysis."""
+    parser = argparse.ArgumentParser(description='Heat wave analysis for Rahima Moosa Hospital.')
+    parser.add_argument('--light', action='store_true',
+                        help='Write a small dashboard that loads a shared plotly.js asset')
+    args = parser.parse_args()
+
     try:
         # Initialize configuration
         data_config = DataConfig()
@@ -125,7 +127,10 @@ def main():
         historical_data, current_data = analyzer.analyze_trends()
         
         # Create visualization
-        visualizer.create_analysis_dashboard(historical_data, current_data)
+        visualizer.create_analysis_dashboard(
+            historical_data, current_data,
+            mode='light' if args.light else 'standalone'
+        )
         
         # Log results
         logging.info("Analysis completed successfully")
@@ -0,0 +1,325 @@
+"""
+Interactive Heat Wave Dashboard
+------------------------------
+Local dashboard app for exploring the heat wave analysis interactively.
+Threshold percentile, the two comparison periods and the months can be
+changed in the browser instead of editing and rerunning a script.
+
+Figures are built with HeatWaveVisualizer's dashboard builders from the
+HeatWaveAnalyzer results. Each parameter combination is computed once and
+memoized with LRU eviction, and the common views are precomputed at startup,
+so repeated and default requests are answered from memory.
+
+Usage:
+    python heatwave_dashboard.py            # http://localhost:8050
+    python heatwave_dashboard.py --port 8060 --no-browser
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import argparse
+import logging
+import mimetypes
+import time
+import webbrowser
+from dataclasses import dataclass, field
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from data_coverage import fill_gaps
+from data_retrieval import DataConfig
+from heatwave_analysis_plan import AnalysisConfig, HeatWaveAnalyzer
+from visualization import HeatWaveVisualizer
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+Period = Tuple[int, int]
+
+
+@dataclass
+class DashboardConfig:
+    """Configuration for the interactive dashboard."""
+    port: int = field(default=8050)
+    cache_size: int = field(default=256)
+    percentile: float = field(default=90.0)
+    min_spell: int = field(default=3)
+    historical: Period = field(default=(1980, 1989))
+    current: Period = field(default=(2015, 2024))
+    months: Tuple[int, ...] = field(default=(9, 10, 11, 12, 1, 2))
+    # Views computed before the server starts accepting requests
+    precompute_percentiles: List[float] = field(default_factory=lambda: [85.0, 90.0, 95.0])
+    precompute_periods: List[Tuple[Period, Period]] = field(default_factory=lambda: [
+        ((1980, 1989), (2015, 2024)),
+        ((1981, 2010), (2011, 2019)),
+        ((1981, 2010), (2015, 2024))
+    ])
+
+
+class HeatWaveDashboard:
+    """Serves memoized dashboard figures for any parameter combination."""
+
+    def __init__(self, config: Optional[DashboardConfig] = None,
+                 data: Optional[pd.DataFrame] = None):
+        """Initialize with configuration and load the daily data once."""
+        self.config = config or DashboardConfig()
+        self.analyzer = HeatWaveAnalyzer(AnalysisConfig(data_config=DataConfig()))
+        self.visualizer = HeatWaveVisualizer()
+
+        data = self._load_data() if data is None else data
+        data = data.dropna(subset=['temperature_celsius']).sort_values('date').reset_index(drop=True)
+        self.data = data
+        self._years = data['date'].dt.year.to_numpy()
+        self._months = data['date'].dt.month.to_numpy()
+
+        self._figure_json = lru_cache(maxsize=self.config.cache_size)(self._build_figure_json)
+
+    def _load_data(self) -> pd.DataFrame:
+        """Full-year daily data, so any months can be selected."""
+        data_config = self.analyzer.config.data_config
+        df = self.analyzer.data_retriever.era5_retriever.get_data_for_period(
+            data_config.start_year, data_config.end_year
+        )
+        return fill_gaps(df, max_gap=data_config.max_gap_days, method='climatology')
+
+    @property
+    def year_range(self) -> Period:
+        return int(self._years.min()), int(self._years.max())
+
+    # ------------------------------------------------------------------
+    # Callbacks
+    # ------------------------------------------------------------------
+    def _period(self, years: Period, months: Sequence[int]) -> pd.DataFrame:
+        mask = (self._years >= years[0]) & (self._years <= years[1]) & np.isin(self._months, months)
+        return self.data[mask].copy()
+
+    def _build_figure_json(self, percentile: float, historical: Period, current: Period,
+                           months: Tuple[int, ...]) -> str:
+        historical_data = self._period(historical, months)
+        current_data = self._period(current, months)
+        if historical_data.empty or current_data.empty:
+            raise ValueError("No data for the selected periods and months")
+
+        # Threshold from the historical period, applied to both periods
+        threshold = float(np.percentile(historical_data['temperature_celsius'], percentile))
+        historical_data = self.analyzer.identify_heatwaves(historical_data, threshold, self.config.min_spell)
+        current_data = self.analyzer.identify_heatwaves(current_data, threshold, self.config.min_spell)
+
+        labels = {'historical': f'{historical[0]}-{historical[1]}',
+                  'current': f'{current[0]}-{current[1]}'}
+        title = (f"Heat Wave Trends at Rahima Moosa Hospital<br>"
+                 f"{labels['historical']} vs {labels['current']}, "
+                 f"{percentile:g}th percentile threshold ({threshold:.1f}°C)")
+        fig = self.visualizer.build_dashboard_figure(
+            historical_data, current_data, labels=labels, months=list(months),
+            title=title, findings=False
+        )
+        fig.update_layout(height=900)
+        return self.visualizer._compact_figure(fig).to_json()
+
+    def figure_json(self, percentile: Optional[float] = None, historical: Optional[Period] = None,
+                    current: Optional[Period] = None, months: Optional[Sequence[int]] = None) -> str:
+        """Dashboard figure as Plotly JSON; memoized per parameter combination."""
+        cfg = self.config
+        key = (
+            round(float(cfg.percentile if percentile is None else percentile), 1),
+            tuple(int(y) for y in (historical or cfg.historical)),
+            tuple(int(y) for y in (current or cfg.current)),
+            tuple(dict.fromkeys(int(m) for m in (months or cfg.months)))
+        )
+        if not 0 < key[0] < 100:
+            raise ValueError(f"Percentile must be between 0 and 100, got {key[0]}")
+        return self._figure_json(*key)
+
+    def precompute(self) -> None:
+        """Fill the cache with the common views."""
+        start = time.perf_counter()
+        views = 0
+        for historical, current in self.config.precompute_periods:
+            for percentile in self.config.precompute_percentiles:
+                self.figure_json(percentile, historical, current)
+                views += 1
+        logger.info(f"Precomputed {views} views in {time.perf_counter() - start:.2f}s")
+
+    def cache_info(self):
+        return self._figure_json.cache_info()
+
+    # ------------------------------------------------------------------
+    # Page
+    # ------------------------------------------------------------------
+    def page(self) -> str:
+        """HTML page with the controls; figures are fetched from /api/figure."""
+        cfg = self.config
+        asset = self.visualizer._plotly_asset().relative_to(self.visualizer.output_dir).as_posix()
+        first, last = self.year_range
+        month_boxes = ''.join(
+            f'<label><input type="checkbox" name="m" value="{m}"'
+            f'{" checked" if m in cfg.months else ""}>{name}</label>'
+            for m, name in zip([9, 10, 11, 12, 1, 2, 3, 4, 5, 6, 7, 8],
+                               ['Sep', 'Oct', 'Nov', 'Dec', 'Jan', 'Feb',
+                                'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug'])
+        )
+        return PAGE_TEMPLATE.format(
+            asset=asset, percentile=cfg.percentile,
+            h0=cfg.historical[0], h1=cfg.historical[1],
+            c0=cfg.current[0], c1=cfg.current[1],
+            first=first, last=last, month_boxes=month_boxes
+        )
+
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Heat Wave Dashboard</title>
+<script src="/{asset}"></script>
+<style>
+  body {{ font-family: sans-serif; margin: 0; background: #FFF1E5; color: #333333; }}
+  form {{ display: flex; flex-wrap: wrap; gap: 18px; align-items: center; padding: 12px 20px;
+          border-bottom: 1px solid #CCC1B7; }}
+  input[type=number] {{ width: 5em; }}
+  #status {{ margin-left: auto; color: #666666; font-size: 12px; }}
+</style>
+</head>
+<body>
+<form id="controls">
+  <label>Percentile <input type="number" name="p" value="{percentile:g}" min="50" max="99.9" step="0.5"></label>
+  <label>Historical <input type="number" name="h0" value="{h0}" min="{first}" max="{last}">
+    - <input type="number" name="h1" value="{h1}" min="{first}" max="{last}"></label>
+  <label>Current <input type="number" name="c0" value="{c0}" min="{first}" max="{last}">
+    - <input type="number" name="c1" value="{c1}" min="{first}" max="{last}"></label>
+  <span>{month_boxes}</span>
+  <span id="status"></span>
+</form>
+<div id="dashboard"></div>
+<script>
+const form = document.getElementById('controls');
+const status = document.getElementById('status');
+let pending = null;
+
+function query() {{
+  const f = new FormData(form);
+  const months = f.getAll('m').join(',');
+  return `p=${{f.get('p')}}&h=${{f.get('h0')}}-${{f.get('h1')}}&c=${{f.get('c0')}}-${{f.get('c1')}}&m=${{months}}`;
+}}
+
+async function update() {{
+  const q = query();
+  pending = q;
+  const start = performance.now();
+  const response = await fetch('/api/figure?' + q);
+  if (pending !== q) return;  // A newer request superseded this one
+  if (!response.ok) {{ status.textContent = await response.text(); return; }}
+  const fig = await response.json();
+  Plotly.react('dashboard', fig.data, fig.layout, {{responsive: true}});
+  status.textContent = `${{Math.round(performance.now() - start)}} ms (server ${{response.headers.get('X-Compute-Ms')}} ms)`;
+}}
+
+form.addEventListener('change', update);
+update();
+</script>
+</body>
+</html>
+"""
+
+
+def _parse_period(value: str) -> Period:
+    start, end = value.split('-')
+    return int(start), int(end)
+
+
+def make_handler(dashboard: HeatWaveDashboard):
+    """Request handler bound to one dashboard instance."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/':
+                self._send(200, dashboard.page().encode('utf-8'), 'text/html; charset=utf-8')
+            elif url.path == '/api/figure':
+                self._figure(parse_qs(url.query))
+            elif url.path.startswith('/assets/'):
+                self._asset(url.path)
+            else:
+                self._send(404, b'Not found', 'text/plain')
+
+        def _figure(self, params):
+            start = time.perf_counter()
+            try:
+                body = dashboard.figure_json(
+                    percentile=float(params['p'][0]) if 'p' in params else None,
+                    historical=_parse_period(params['h'][0]) if 'h' in params else None,
+                    current=_parse_period(params['c'][0]) if 'c' in params else None,
+                    months=[int(m) for m in params['m'][0].split(',') if m] if 'm' in params else None
+                )
+            except (ValueError, KeyError) as e:
+                self._send(400, str(e).encode('utf-8'), 'text/plain')
+                return
+            elapsed = (time.perf_counter() - start) * 1000
+            self._send(200, body.encode('utf-8'), 'application/json',
+                       {'X-Compute-Ms': f'{elapsed:.1f}', 'Cache-Control': 'no-cache'})
+
+        def _asset(self, path: str):
+            assets = (dashboard.visualizer.output_dir / 'assets').resolve()
+            asset = (dashboard.visualizer.output_dir / path.lstrip('/')).resolve()
+            if assets not in asset.parents or not asset.is_file():
+                self._send(404, b'Not found', 'text/plain')
+                return
+            content_type = mimetypes.guess_type(asset.name)[0] or 'application/octet-stream'
+            self._send(200, asset.read_bytes(), content_type,
+                       {'Cache-Control': 'public, max-age=31536000, immutable'})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description='Interactive heat wave dashboard.')
+    parser.add_argument('--port', type=int, default=None, help='Port to serve on (default 8050)')
+    parser.add_argument('--no-browser', action='store_true', help='Do not open a browser window')
+    args = parser.parse_args()
+
+    config = DashboardConfig()
+    if args.port:
+        config.port = args.port
+
+    dashboard = HeatWaveDashboard(config)
+    dashboard.precompute()
+
+    with ThreadingHTTPServer(('', config.port), make_handler(dashboard)) as httpd:
+        url = f'http://localhost:{config.port}/'
+        print(f"\nHeat wave dashboard is available at {url}")
+        print("Press Ctrl+C to stop the server")
+        if not args.no_browser:
+            webbrowser.open(url)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            logger.info(f"Stopping dashboard ({dashboard.cache_info()})")
+
+
+if __name__ == "__main__":
+    main()
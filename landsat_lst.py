@@ -0,0 +1,305 @@
+"""
+Landsat Land Surface Temperature Pipeline
+----------------------------------------
+Server-side (Earth Engine) construction of Landsat Collection 2 LST and NDVI
+composites, shared by the LST maps, animations and the local raster cache.
+
+``fused_composite_image`` reduces the collection once with a combined
+mean/p90/count/stdDev reducer over both LST and NDVI; the raster cache
+downloads that multi-band image instead of one reduction per statistic.
+``period_stack_image`` does the same for many periods in one graph, mapping
+over a server-side list of periods and returning one band per period and
+statistic.
+
+Every collection passes a quality stage first (``apply_quality``): scenes
+are dropped on their CLOUD_COVER metadata before any pixel work, the rest
+are clipped to the AOI and masked with the QA_PIXEL cloud and shadow flags.
+``quality_report`` counts the scenes and AOI pixels this removes.
+
+Earth Engine is initialised on first use rather than at import, so modules
+that only read the local cache (lst_cache) never need credentials.
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import argparse
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import ee
+import requests
+
+from lst_cache import (FUSED_BANDS, FUSED_STATISTICS, MAX_CLOUD_COVER, NODATA, CompositeKey,
+                       fused_band_names, stack_band_names)
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Collection 2 Level-2 products per sensor
+SENSORS = {
+    'L5': {'collection': 'LANDSAT/LT05/C02/T1_L2', 'thermal': 'ST_B6', 'red': 'SR_B3', 'nir': 'SR_B4'},
+    'L7': {'collection': 'LANDSAT/LE07/C02/T1_L2', 'thermal': 'ST_B6', 'red': 'SR_B3', 'nir': 'SR_B4'},
+    'L8': {'collection': 'LANDSAT/LC08/C02/T1_L2', 'thermal': 'ST_B10', 'red': 'SR_B4', 'nir': 'SR_B5'},
+    'L9': {'collection': 'LANDSAT/LC09/C02/T1_L2', 'thermal': 'ST_B10', 'red': 'SR_B4', 'nir': 'SR_B5'}
+}
+
+# Collection 2 scale factors
+ST_MULT = 0.00341802
+ST_ADD = 149.0
+SR_MULT = 0.0000275
+SR_ADD = -0.2
+
+# QA_PIXEL bits that make a pixel unusable (Collection 2; cirrus is only set
+# by Landsat 8/9)
+QA_MASK_BITS = {'fill': 0, 'dilated_cloud': 1, 'cirrus': 2, 'cloud': 3, 'cloud_shadow': 4}
+QA_MASK = sum(1 << bit for bit in QA_MASK_BITS.values())
+
+_initialized = False
+
+
+def initialize() -> None:
+    """Initialise Earth Engine once per process."""
+    global _initialized
+    if _initialized:
+        return
+    try:
+        ee.Initialize()
+    except Exception:
+        logger.error("Error initializing Earth Engine. Run 'earthengine authenticate' first.")
+        raise
+    _initialized = True
+
+
+def aoi_geometry(key: CompositeKey) -> ee.Geometry:
+    """Buffered point of the key's area of interest."""
+    return ee.Geometry.Point([key.aoi.lon, key.aoi.lat]).buffer(key.aoi.buffer_m)
+
+
+def raw_collection(key: CompositeKey, sensor: Optional[str] = None, years: bool = True) -> ee.ImageCollection:
+    """Unfiltered scenes of a sensor (default the key's) over the AOI and months, and the key's years."""
+    initialize()
+    collection = ee.ImageCollection(SENSORS[sensor or key.sensor]['collection']) \
+        .filterBounds(aoi_geometry(key)) \
+        .filter(ee.Filter.calendarRange(key.months[0], key.months[-1], 'month'))
+    if years:
+        collection = collection.filter(ee.Filter.calendarRange(key.start_year, key.end_year, 'year'))
+    return collection
+
+
+def cloud_filter(collection: ee.ImageCollection, key: CompositeKey) -> ee.ImageCollection:
+    """Drop scenes on CLOUD_COVER metadata alone, so they never reach pixel work."""
+    if key.max_cloud_cover is None:
+        return collection
+    return collection.filter(ee.Filter.lt('CLOUD_COVER', key.max_cloud_cover))
+
+
+def clear_mask(image: ee.Image) -> ee.Image:
+    """1 where QA_PIXEL flags no fill, cloud, dilated cloud, cirrus or cloud shadow."""
+    return image.select('QA_PIXEL').bitwiseAnd(QA_MASK).eq(0)
+
+
+def apply_quality(collection: ee.ImageCollection, key: CompositeKey) -> ee.ImageCollection:
+    """Quality stage: metadata cloud filter, then early AOI clip and QA_PIXEL masking."""
+    geometry = aoi_geometry(key)
+
+    def prepare(image):
+        image = image.clip(geometry)
+        if key.max_cloud_cover is None:
+            return image
+        return image.updateMask(clear_mask(image))
+
+    return cloud_filter(collection, key).map(prepare)
+
+
+def landsat_collection(key: CompositeKey) -> ee.ImageCollection:
+    """Quality-filtered scenes of the key's sensor over its AOI, years and months."""
+    return apply_quality(raw_collection(key), key)
+
+
+def add_lst_ndvi(image: ee.Image, sensor: str) -> ee.Image:
+    """LST (°C) and NDVI bands from one Collection 2 scene."""
+    bands = SENSORS[sensor]
+    lst = image.select(bands['thermal']).multiply(ST_MULT).add(ST_ADD).subtract(273.15).rename('LST')
+    reflectance = image.select([bands['nir'], bands['red']]).multiply(SR_MULT).add(SR_ADD)
+    ndvi = reflectance.normalizedDifference([bands['nir'], bands['red']]).rename('NDVI')
+    return lst.addBands(ndvi).copyProperties(image, ['system:time_start'])
+
+
+def reducer_for(name: str) -> ee.Reducer:
+    """Earth Engine reducer for a key's reducer name ('mean', 'median', 'p90', ...)."""
+    if name.startswith('p') and name[1:].isdigit():
+        return ee.Reducer.percentile([int(name[1:])])
+    reducers = {
+        'mean': ee.Reducer.mean(),
+        'median': ee.Reducer.median(),
+        'count': ee.Reducer.count(),
+        'stdDev': ee.Reducer.stdDev()
+    }
+    if name not in reducers:
+        raise ValueError(f"Unknown reducer: {name}")
+    return reducers[name]
+
+
+def composite_image(key: CompositeKey) -> ee.Image:
+    """Single-band composite described by ``key``, clipped to its AOI."""
+    processed = landsat_collection(key).map(lambda img: add_lst_ndvi(img, key.sensor))
+    return processed.select(key.band) \
+        .reduce(reducer_for(key.reducer)) \
+        .rename(key.band) \
+        .clip(aoi_geometry(key))
+
+
+def fused_reducer(statistics: Sequence[str] = FUSED_STATISTICS) -> ee.Reducer:
+    """One reducer computing every statistic over shared inputs, so a single pass suffices."""
+    reducer = reducer_for(statistics[0])
+    for name in statistics[1:]:
+        reducer = reducer.combine(reducer2=reducer_for(name), sharedInputs=True)
+    return reducer
+
+
+def fused_composite_image(key: CompositeKey) -> ee.Image:
+    """LST and NDVI mean, p90, count and stdDev of the key's period from one reduction.
+
+    Bands are '<band>_<statistic>' (Earth Engine's names for combined reducer
+    outputs), selected into ``fused_band_names()`` order.
+    """
+    processed = landsat_collection(key).map(lambda img: add_lst_ndvi(img, key.sensor))
+    return processed.select(list(FUSED_BANDS)) \
+        .reduce(fused_reducer()) \
+        .select(fused_band_names()) \
+        .clip(aoi_geometry(key))
+
+
+def season_collection(key: CompositeKey, sensor: str) -> ee.ImageCollection:
+    """Quality-filtered LST/NDVI scenes of one sensor over the key's AOI and months (all years), tagged 'sensor'."""
+    return apply_quality(raw_collection(key, sensor, years=False), key) \
+        .map(lambda img: add_lst_ndvi(img, sensor).set('sensor', sensor))
+
+
+def period_stack_image(keys: Sequence[CompositeKey]) -> ee.Image:
+    """Fused composites of several periods as one image, built in a single graph.
+
+    The periods travel as a server-side ``ee.List`` and are mapped over, so
+    adding a period adds no client-side pipeline. ``keys`` must share months,
+    AOI and scale; bands follow ``stack_band_names(keys)``.
+    """
+    base = keys[0]
+    sensors = sorted({key.sensor for key in keys})
+    scenes = season_collection(base, sensors[0])
+    for sensor in sensors[1:]:
+        scenes = scenes.merge(season_collection(base, sensor))
+
+    names = fused_band_names()
+    # Periods without scenes still contribute their (masked) bands
+    empty = ee.Image.constant([0] * len(names)).rename(names).toFloat().updateMask(0)
+    periods = ee.List([{'start': key.start_year, 'end': key.end_year, 'sensor': key.sensor} for key in keys])
+
+    def composite(period):
+        period = ee.Dictionary(period)
+        selected = scenes \
+            .filter(ee.Filter.eq('sensor', period.get('sensor'))) \
+            .filter(ee.Filter.calendarRange(period.get('start'), period.get('end'), 'year'))
+        reduced = selected.select(list(FUSED_BANDS)).reduce(fused_reducer()).select(names).toFloat()
+        return ee.Algorithms.If(selected.size().gt(0), reduced, empty)
+
+    return ee.ImageCollection.fromImages(periods.map(composite)) \
+        .toBands() \
+        .rename(stack_band_names(keys)) \
+        .clip(aoi_geometry(base))
+
+
+def scene_list(key: CompositeKey) -> List[Dict]:
+    """Quality-filtered scenes of the key's sensor and period as {'scene', 'time'}, oldest first."""
+    scenes = landsat_collection(key).sort('system:time_start')
+    info = ee.Dictionary({
+        'scene': scenes.aggregate_array('system:index'),
+        'time': scenes.aggregate_array('system:time_start')
+    }).getInfo()
+    return [{'scene': scene, 'time': time} for scene, time in zip(info['scene'], info['time'])]
+
+
+def scene_stack_image(key: CompositeKey, scenes: Sequence[str], bands: Sequence[str] = ('LST',)) -> ee.Image:
+    """Per-scene bands of the listed scenes as one image, bands '<scene>_<band>' in time order."""
+    collection = landsat_collection(key) \
+        .filter(ee.Filter.inList('system:index', list(scenes))) \
+        .sort('system:time_start') \
+        .map(lambda img: add_lst_ndvi(img, key.sensor).select(list(bands)))
+    return collection.toBands().rename([f"{scene}_{band}" for scene in scenes for band in bands])
+
+
+def download_geotiff(image: ee.Image, key: CompositeKey, crs: str) -> bytes:
+    """Download ``image`` over the key's AOI as GeoTIFF bytes (masked pixels = NODATA)."""
+    params: Dict = {
+        'region': aoi_geometry(key).bounds(),
+        'scale': key.scale,
+        'crs': crs,
+        'format': 'GEO_TIFF'
+    }
+    url = image.toFloat().unmask(NODATA).getDownloadURL(params)
+    response = requests.get(url, timeout=300)
+    response.raise_for_status()
+    return response.content
+
+
+def quality_report(keys: Sequence[CompositeKey], pixels: bool = False) -> List[Dict]:
+    """Scenes (and, with ``pixels``, valid AOI thermal pixels) removed by the quality stage.
+
+    One report per key, fetched in a single getInfo. Pixel counts reduce
+    every scene over the AOI, so they are only computed on request.
+    """
+    reports = []
+    for key in keys:
+        raw = raw_collection(key)
+        kept = cloud_filter(raw, key)
+        report = {'scenes': raw.size(), 'scenes_kept': kept.size()}
+        if pixels:
+            geometry = aoi_geometry(key)
+            thermal = SENSORS[key.sensor]['thermal']
+
+            def count(image):
+                valid = image.select(thermal).mask().gt(0)
+                clear = valid.And(clear_mask(image)) if key.max_cloud_cover is not None else valid
+                sums = valid.rename('valid').addBands(clear.rename('clear')).reduceRegion(
+                    reducer=ee.Reducer.sum(), geometry=geometry, scale=key.scale, maxPixels=1e9)
+                return image.set(sums)
+
+            report['pixels'] = raw.map(count).aggregate_sum('valid')
+            report['pixels_kept'] = kept.map(count).aggregate_sum('clear')
+        reports.append(ee.Dictionary(report))
+
+    results = ee.List(reports).getInfo()
+    for key, result in zip(keys, results):
+        result['max_cloud_cover'] = key.max_cloud_cover
+        result['scenes_removed'] = result['scenes'] - result['scenes_kept']
+        if pixels:
+            result['pixels'] = round(result['pixels'])
+            result['pixels_kept'] = round(result['pixels_kept'])
+            result['pixels_removed'] = result['pixels'] - result['pixels_kept']
+        logger.info(f"{key.slug}: quality stage removed {result['scenes_removed']} of "
+                    f"{result['scenes']} scenes" +
+                    (f", {result['pixels_removed']} of {result['pixels']} pixels" if pixels else ''))
+    return results
+
+
+def main():
+    """Report what the quality stage removes for one period."""
+    parser = argparse.ArgumentParser(description='Report scenes and pixels removed by the Landsat quality stage.')
+    parser.add_argument('start_year', type=int)
+    parser.add_argument('end_year', type=int)
+    parser.add_argument('--max-cloud-cover', type=int, default=MAX_CLOUD_COVER)
+    parser.add_argument('--no-pixels', action='store_true', help='Only count scenes (no pixel reduction)')
+    args = parser.parse_args()
+
+    key = CompositeKey(args.start_year, args.end_year, max_cloud_cover=args.max_cloud_cover)
+    for name, value in quality_report([key], pixels=not args.no_pixels)[0].items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
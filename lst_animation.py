@@ -1,25 +1,10 @@
-import ee
-import geemap
 import numpy as np
-from datetime import datetime
-import os
-from PIL import Image
-import io
+from PIL import Image, ImageDraw
 
-# Initialize Earth Engine
-try:
-    ee.Initialize()
-except Exception as e:
-    print("Error initializing Earth Engine. Please authenticate first.")
-    print("Run 'earthengine authenticate' in your terminal.")
-    raise e
+from lst_cache import HOSPITAL_LAT, HOSPITAL_LON, CompositeKey, LSTRasterCache
+from lst_overlay import colorize, palette_lut
 
-# Define constants
-HOSPITAL_LAT = -26.1752
-HOSPITAL_LON = 28.0183
-JOBURG_CENTER = ee.Geometry.Point([HOSPITAL_LON, HOSPITAL_LAT])
-BUFFER_DISTANCE = 5000  # 5km buffer
-JOBURG_AREA = JOBURG_CENTER.buffer(BUFFER_DISTANCE)
+FRAME_SCALE = 2  # Output pixels per 30m cached pixel
 
 # Define visualization parameters for LST with transparency
 LST_VIS_PARAMS = {
@@ -36,71 +21,34 @@ LST_VIS_PARAMS = {
     'opacity': 0.5  # Set transparency to 50%
 }
 
-def get_landsat_collection(start_year, end_year, months=[9,10,11,12,1,2]):
-    """Get Landsat collection for the specified time period."""
-    if start_year >= 2013:
-        collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2')
-        thermal_band = 'ST_B10'
-    else:
-        collection = ee.ImageCollection('LANDSAT/LT05/C02/T1_L2')
-        thermal_band = 'ST_B6'
+def create_lst_frame(start_year, end_year, cache):
+    """Render one GIF frame of mean LST for the specified period from the local raster cache."""
+    mean_lst = cache.read(CompositeKey(start_year, end_year))
+    values = mean_lst.band()
     
-    mult = 0.00341802
-    add = 149.0
+    # Colour-map over a white background (no-data stays white)
+    rgba = colorize(values, {**LST_VIS_PARAMS, 'opacity': 1.0})
+    frame = Image.new('RGB', (values.shape[1], values.shape[0]), 'white')
+    frame.paste(Image.fromarray(rgba, mode='RGBA'), mask=Image.fromarray(rgba[..., 3]))
+    frame = frame.resize((frame.width * FRAME_SCALE, frame.height * FRAME_SCALE), Image.NEAREST)
     
-    filtered = collection.filterBounds(JOBURG_AREA) \
-        .filter(ee.Filter.calendarRange(start_year, end_year, 'year')) \
-        .filter(ee.Filter.calendarRange(months[0], months[-1], 'month'))
+    # Hospital marker, located through the raster's lat/lon bounds
+    west, south, east, north = mean_lst.latlon_bounds
+    x = (HOSPITAL_LON - west) / (east - west) * frame.width
+    y = (north - HOSPITAL_LAT) / (north - south) * frame.height
+    draw = ImageDraw.Draw(frame)
+    draw.ellipse([x - 5, y - 5, x + 5, y + 5], fill='white', outline='black')
+    draw.text((x + 8, y - 6), 'Rahima Moosa Hospital', fill='black')
+    draw.text((10, 10), f'LST {start_year}-{end_year}', fill='black')
     
-    return filtered, thermal_band, mult, add
-
-def calculate_lst(image, thermal_band, mult, add):
-    """Calculate Land Surface Temperature in Celsius."""
-    lst = image.select(thermal_band).multiply(mult).add(add).subtract(273.15)
-    return image.addBands(lst.rename('LST'))
-
-def create_lst_map(start_year, end_year):
-    """Create a map showing LST for the specified period."""
-    Map = geemap.Map(center=[HOSPITAL_LAT, HOSPITAL_LON], zoom=13)
-    
-    # Add only Esri World Imagery basemap
-    Map.add_basemap('HYBRID')
-    
-    # Get data
-    collection, thermal_band, mult, add = get_landsat_collection(start_year, end_year)
-    processed = collection.map(lambda img: calculate_lst(img, thermal_band, mult, add))
-    mean_lst = processed.select('LST').mean()
-    
-    # Add LST layer with transparency
-    Map.addLayer(
-        mean_lst, 
-        LST_VIS_PARAMS,
-        f'LST ({start_year}-{end_year})'
-    )
-    
-    # Add hospital marker with label
-    hospital = ee.Geometry.Point([HOSPITAL_LON, HOSPITAL_LAT])
-    Map.addLayer(hospital, {'color': 'white'}, 'Rahima Moosa Hospital')
-    
-    # Add a text label for the hospital
-    Map.add_text(
-        text='Rahima Moosa Hospital',
-        xy=(HOSPITAL_LON, HOSPITAL_LAT),
-        font_size=12,
-        font_color='white',
-        font_family='arial',
-        anchor='left'
-    )
-    
-    # Add colorbar
-    Map.add_colorbar(
-        vis_params=LST_VIS_PARAMS,
-        label='Land Surface Temperature (°C)',
-        orientation='horizontal',
-        transparent_bg=True
-    )
+    # Horizontal colorbar along the bottom edge
+    lut = palette_lut(LST_VIS_PARAMS['palette'])
+    bar = np.repeat(lut[None, np.linspace(0, len(lut) - 1, frame.width // 2).astype(int)], 12, axis=0)
+    frame.paste(Image.fromarray(bar), (frame.width // 4, frame.height - 30))
+    draw.text((frame.width // 4, frame.height - 16), f"{LST_VIS_PARAMS['min']}°C", fill='black')
+    draw.text((3 * frame.width // 4 - 30, frame.height - 16), f"{LST_VIS_PARAMS['max']}°C", fill='black')
     
-    return Map
+    return frame
 
 def create_animation():
     """Create an animated GIF of LST changes over time."""
@@ -111,22 +59,13 @@ def create_animation():
     ]
     
     frames = []
-    print("Generating maps for each period...")
+    cache = LSTRasterCache()
+    cache.prefetch([CompositeKey(start_year, end_year) for start_year, end_year in periods])
+    print("Generating frames for each period...")
     
     for start_year, end_year in periods:
         print(f"Processing {start_year}-{end_year}...")
-        Map = create_lst_map(start_year, end_year)
-        
-        # Save map as PNG
-        temp_file = f'temp_map_{start_year}_{end_year}.png'
-        Map.save(temp_file)
-        
-        # Open the image and append to frames
-        with Image.open(temp_file) as img:
-            frames.append(img.copy())
-        
-        # Clean up temporary file
-        os.remove(temp_file)
+        frames.append(create_lst_frame(start_year, end_year, cache))
     
     # Save the animation
     output_file = 'lst_animation.gif'
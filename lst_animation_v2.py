@@ -1,22 +1,5 @@
-import ee
-import geemap
-import numpy as np
-from datetime import datetime
-
-# Initialize Earth Engine
-try:
-    ee.Initialize()
-except Exception as e:
-    print("Error initializing Earth Engine. Please authenticate first.")
-    print("Run 'earthengine authenticate' in your terminal.")
-    raise e
-
-# Define constants
-HOSPITAL_LAT = -26.1752
-HOSPITAL_LON = 28.0183
-JOBURG_CENTER = ee.Geometry.Point([HOSPITAL_LON, HOSPITAL_LAT])
-BUFFER_DISTANCE = 5000  # 5km buffer
-JOBURG_AREA = JOBURG_CENTER.buffer(BUFFER_DISTANCE)
+from lst_cache import HOSPITAL_LAT, HOSPITAL_LON, CompositeKey, LSTRasterCache
+from lst_overlay import add_hospital, add_period_animation, add_raster_overlay, base_map
 
 # Define visualization parameters for LST with transparency
 LST_VIS_PARAMS = {
@@ -33,34 +16,11 @@ LST_VIS_PARAMS = {
     'opacity': 0.5  # Set transparency to 50%
 }
 
-def get_landsat_collection(start_year, end_year, months=[9,10,11,12,1,2]):
-    """Get Landsat collection for the specified time period."""
-    if start_year >= 2013:
-        collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2')
-        thermal_band = 'ST_B10'
-    else:
-        collection = ee.ImageCollection('LANDSAT/LT05/C02/T1_L2')
-        thermal_band = 'ST_B6'
-    
-    mult = 0.00341802
-    add = 149.0
-    
-    filtered = collection.filterBounds(JOBURG_AREA) \
-        .filter(ee.Filter.calendarRange(start_year, end_year, 'year')) \
-        .filter(ee.Filter.calendarRange(months[0], months[-1], 'month'))
-    
-    return filtered, thermal_band, mult, add
-
-def calculate_lst(image, thermal_band, mult, add):
-    """Calculate Land Surface Temperature in Celsius."""
-    lst = image.select(thermal_band).multiply(mult).add(add).subtract(273.15)
-    return lst.rename('LST')
-
 def create_lst_animation():
     """Create an interactive map with time-series animation."""
     # Create a map centered on the hospital
-    Map = geemap.Map(center=[HOSPITAL_LAT, HOSPITAL_LON], zoom=13)
-    Map.add_basemap('HYBRID')
+    Map = base_map(center=(HOSPITAL_LAT, HOSPITAL_LON), zoom=13)
+    cache = LSTRasterCache()
     
     # Define time periods
     periods = [
@@ -69,48 +29,24 @@ def create_lst_animation():
         (2014, 2023, 'Recent Period')
     ]
     
-    # Create a list to store LST images
-    lst_images = []
+    # Missing periods are computed together as one batched composite
+    cache.prefetch([CompositeKey(start_year, end_year) for start_year, end_year, _ in periods])
     
-    # Process each period
+    # Add each period's mean LST from the local raster cache as one frame
     for start_year, end_year, label in periods:
         print(f"Processing {label} ({start_year}-{end_year})...")
-        
-        # Get and process Landsat data
-        collection, thermal_band, mult, add = get_landsat_collection(start_year, end_year)
-        lst = collection.map(lambda img: calculate_lst(img, thermal_band, mult, add))
-        mean_lst = lst.mean()
-        
-        # Add label and timestamp
-        labeled_lst = mean_lst.set({
-            'system:time_start': ee.Date.fromYMD(start_year, 1, 1).millis(),
-            'label': f'{start_year}-{end_year}'
-        })
-        
-        lst_images.append(labeled_lst)
-    
-    # Convert list to image collection
-    lst_collection = ee.ImageCollection.fromImages(lst_images)
+        mean_lst = cache.read(CompositeKey(start_year, end_year))
+        add_raster_overlay(Map, mean_lst, LST_VIS_PARAMS, f'{start_year}-{end_year}')
     
     # Add the time-series animation
-    Map.add_time_slider(
-        lst_collection,
-        LST_VIS_PARAMS,
-        label='Land Surface Temperature (°C)',
-        time_interval=2  # 2 seconds per frame
+    add_period_animation(
+        Map,
+        [f"{start_year}-{end_year}" for start_year, end_year, _ in periods],
+        interval_ms=2000  # 2 seconds per frame
     )
     
     # Add hospital marker with label
-    hospital = ee.Geometry.Point([HOSPITAL_LON, HOSPITAL_LAT])
-    Map.addLayer(hospital, {'color': 'white'}, 'Rahima Moosa Hospital')
-    Map.add_text(
-        'Rahima Moosa Hospital',
-        xy=(HOSPITAL_LON, HOSPITAL_LAT),
-        font_size=12,
-        font_color='white',
-        font_family='arial',
-        anchor='left'
-    )
+    add_hospital(Map, text='Rahima Moosa Hospital', font_size=12, background='transparent')
     
     return Map
 
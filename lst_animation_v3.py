@@ -1,22 +1,5 @@
-import ee
-import geemap
-import numpy as np
-from datetime import datetime
-
-# Initialize Earth Engine
-try:
-    ee.Initialize()
-except Exception as e:
-    print("Error initializing Earth Engine. Please authenticate first.")
-    print("Run 'earthengine authenticate' in your terminal.")
-    raise e
-
-# Define constants
-HOSPITAL_LAT = -26.1752
-HOSPITAL_LON = 28.0183
-JOBURG_CENTER = ee.Geometry.Point([HOSPITAL_LON, HOSPITAL_LAT])
-BUFFER_DISTANCE = 5000  # 5km buffer
-JOBURG_AREA = JOBURG_CENTER.buffer(BUFFER_DISTANCE)
+from lst_cache import HOSPITAL_LAT, HOSPITAL_LON, CompositeKey, LSTRasterCache
+from lst_overlay import add_hospital, add_legend, add_period_animation, add_raster_overlay, base_map
 
 # Define visualization parameters for LST with transparency
 LST_VIS_PARAMS = {
@@ -33,34 +16,11 @@ LST_VIS_PARAMS = {
     'opacity': 0.5  # Set transparency to 50%
 }
 
-def get_landsat_collection(start_year, end_year, months=[9,10,11,12,1,2]):
-    """Get Landsat collection for the specified time period."""
-    if start_year >= 2013:
-        collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2')
-        thermal_band = 'ST_B10'
-    else:
-        collection = ee.ImageCollection('LANDSAT/LT05/C02/T1_L2')
-        thermal_band = 'ST_B6'
-    
-    mult = 0.00341802
-    add = 149.0
-    
-    filtered = collection.filterBounds(JOBURG_AREA) \
-        .filter(ee.Filter.calendarRange(start_year, end_year, 'year')) \
-        .filter(ee.Filter.calendarRange(months[0], months[-1], 'month'))
-    
-    return filtered, thermal_band, mult, add
-
-def calculate_lst(image, thermal_band, mult, add):
-    """Calculate Land Surface Temperature in Celsius."""
-    lst = image.select(thermal_band).multiply(mult).add(add).subtract(273.15)
-    return lst.rename('LST')
-
 def create_lst_animation():
     """Create an interactive map with time-series animation."""
     # Create a map centered on the hospital
-    Map = geemap.Map(center=[HOSPITAL_LAT, HOSPITAL_LON], zoom=13)
-    Map.add_basemap('HYBRID')
+    Map = base_map(center=(HOSPITAL_LAT, HOSPITAL_LON), zoom=13)
+    cache = LSTRasterCache()
     
     # Define time periods
     periods = [
@@ -69,74 +29,28 @@ def create_lst_animation():
         (2014, 2023, 'Recent Period')
     ]
     
-    # Create a list to store LST images
-    lst_images = []
+    # Missing periods are computed together as one batched composite
+    cache.prefetch([CompositeKey(start_year, end_year) for start_year, end_year, _ in periods])
     
-    # Process each period
+    # Add each period's mean LST from the local raster cache as one frame
     for start_year, end_year, label in periods:
         print(f"Processing {label} ({start_year}-{end_year})...")
-        
-        # Get and process Landsat data
-        collection, thermal_band, mult, add = get_landsat_collection(start_year, end_year)
-        lst = collection.map(lambda img: calculate_lst(img, thermal_band, mult, add))
-        mean_lst = lst.mean()
-        
-        # Add label and timestamp
-        labeled_lst = mean_lst.set({
-            'system:time_start': ee.Date.fromYMD(start_year, 1, 1).millis(),
-            'label': f'{start_year}-{end_year}'
-        })
-        
-        lst_images.append(labeled_lst)
-    
-    # Convert list to image collection
-    lst_collection = ee.ImageCollection.fromImages(lst_images)
+        mean_lst = cache.read(CompositeKey(start_year, end_year))
+        add_raster_overlay(Map, mean_lst, LST_VIS_PARAMS, f'{start_year}-{end_year}')
     
     # Add the time-series animation
-    Map.add_time_slider(
-        lst_collection,
-        LST_VIS_PARAMS,
-        label='Land Surface Temperature (°C)',
-        time_interval=3,  # 3 seconds per frame
-        position='bottomright'
-    )
-    
-    # Add hospital marker with improved label
-    Map.add_marker(
-        location=[HOSPITAL_LAT, HOSPITAL_LON],
-        popup="Rahima Moosa Hospital",
-        icon_url="https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-2x-red.png",
-        icon_size=[25, 41]
-    )
-    
-    # Add a prominent text label for the hospital
-    Map.add_text(
-        text="Rahima Moosa Hospital",
-        xy=(HOSPITAL_LON + 0.01, HOSPITAL_LAT),  # Offset to the right
-        font_size=16,
-        font_color='white',
-        font_family='arial',
-        font_weight='bold',
-        background_color='rgba(0,0,0,0.5)',  # Semi-transparent black background
-        padding=(5, 5)  # Add padding around text
+    add_period_animation(
+        Map,
+        [f"{start_year}-{end_year}" for start_year, end_year, _ in periods],
+        interval_ms=3000  # 3 seconds per frame
     )
     
-    # Add year label in the top-left corner
-    for start_year, end_year, _ in periods:
-        Map.add_text(
-            text=f"{start_year}-{end_year}",
-            xy=(HOSPITAL_LON - 0.05, HOSPITAL_LAT + 0.05),  # Top-left position
-            font_size=24,
-            font_color='white',
-            font_family='arial',
-            font_weight='bold',
-            background_color='rgba(0,0,0,0.7)',
-            padding=(8, 8),
-            time=ee.Date.fromYMD(start_year, 1, 1).millis()
-        )
+    # Add a prominent text label for the hospital, on a semi-transparent black background
+    add_hospital(Map, text="Rahima Moosa Hospital", font_size=16, background='rgba(0,0,0,0.5)')
     
     # Add a legend
-    Map.add_legend(
+    add_legend(
+        Map,
         title="Land Surface Temperature",
         legend_dict={
             'Cold (22°C)': '#313695',
@@ -0,0 +1,395 @@
+"""
+Local Landsat LST Raster Cache
+-----------------------------
+Downloads each Landsat LST/NDVI period composite once and keeps it as a
+tiled, DEFLATE-compressed Cloud-Optimized GeoTIFF in ``data_cache/lst``.
+
+Composites are keyed by (sensor, period, months, band, reducer, AOI, scale);
+the file name is a readable slug of the key and a JSON sidecar records the
+key and download time.
+
+Mean, p90, count and stdDev of LST and NDVI are downloaded together as one
+fused multi-band composite (a single reduction over the collection, see
+``landsat_lst.fused_composite_image``); a single-statistic key such as
+``CompositeKey(2014, 2023, reducer='p90')`` is served as a band of it, so
+the maps, animations and tiles of one period share one computation.
+``prefetch`` computes the missing periods of a whole series together as a
+period stack (``landsat_lst.period_stack_image``) and splits it into the
+per-period files. Maps, animations and statistics read from here, so
+after the first download they rebuild offline in seconds. Only a cache miss
+touches Earth Engine (via landsat_lst), and ``offline=True`` turns a miss
+into an error instead.
+
+Usage:
+    from lst_cache import CompositeKey, LSTRasterCache
+
+    cache = LSTRasterCache()
+    raster = cache.read(CompositeKey(2014, 2023, months=(12, 1, 2), reducer='p90'))
+    raster.stats()
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Same location as data_retrieval.CACHE_DIR; not imported from there to keep
+# cache reads free of the Earth Engine imports
+CACHE_DIR = Path('./data_cache')
+LST_CACHE_DIR = CACHE_DIR / 'lst'
+
+# Rahima Moosa Mother and Child Hospital
+HOSPITAL_LAT = -26.1752
+HOSPITAL_LON = 28.0183
+BUFFER_DISTANCE = 5000  # 5km buffer
+
+# September-February, as used by the LST maps
+SEASON_MONTHS = (9, 10, 11, 12, 1, 2)
+
+# Scenes with more cloud (scene CLOUD_COVER metadata, %) are dropped before
+# any pixel work; see landsat_lst.apply_quality
+MAX_CLOUD_COVER = 20
+NODATA = -9999.0
+
+# Contents of a fused composite: every statistic of every band, named
+# '<band>_<statistic>' as Earth Engine names combined reducer outputs
+FUSED_REDUCER = 'fused'
+FUSED_BANDS = ('LST', 'NDVI')
+FUSED_STATISTICS = ('mean', 'p90', 'count', 'stdDev')
+
+
+def fused_band_names() -> List[str]:
+    return [f"{band}_{statistic}" for band in FUSED_BANDS for statistic in FUSED_STATISTICS]
+
+
+def stack_band_names(keys: Iterable['CompositeKey']) -> List[str]:
+    """Bands of a period stack: the fused bands of each period, prefixed '<sensor>_<start>_<end>_'."""
+    return [f"{key.sensor}_{key.start_year}_{key.end_year}_{name}"
+            for key in keys for name in fused_band_names()]
+
+
+@dataclass(frozen=True)
+class AOI:
+    """Buffered point area of interest."""
+    lon: float = HOSPITAL_LON
+    lat: float = HOSPITAL_LAT
+    buffer_m: float = BUFFER_DISTANCE
+
+    @property
+    def slug(self) -> str:
+        return f"{self.lon:.4f}_{self.lat:.4f}_{self.buffer_m:g}m"
+
+
+def sensor_for_period(start_year: int) -> str:
+    """Landsat 8 from 2013, Landsat 5 before, as in the LST scripts."""
+    return 'L8' if start_year >= 2013 else 'L5'
+
+
+@dataclass(frozen=True)
+class CompositeKey:
+    """Identity of one cached period composite."""
+    start_year: int
+    end_year: int
+    months: Tuple[int, ...] = SEASON_MONTHS
+    reducer: str = 'mean'                       # 'mean', 'median', 'count', 'stdDev', 'pNN' or 'fused'
+    band: str = 'LST'                           # 'LST' (°C), 'NDVI', or 'LST_NDVI' when fused
+    sensor: Optional[str] = None                # Default: sensor_for_period(start_year)
+    aoi: AOI = field(default_factory=AOI)
+    scale: int = 30
+    max_cloud_cover: Optional[int] = MAX_CLOUD_COVER  # None: no scene filter or QA masking
+
+    def __post_init__(self):
+        object.__setattr__(self, 'months', tuple(self.months))
+        if self.sensor is None:
+            object.__setattr__(self, 'sensor', sensor_for_period(self.start_year))
+
+    @property
+    def slug(self) -> str:
+        months = '-'.join(str(m) for m in self.months)
+        quality = f"_cc{self.max_cloud_cover}" if self.max_cloud_cover is not None else ''
+        return (f"{self.sensor}_{self.start_year}_{self.end_year}_m{months}_"
+                f"{self.band}_{self.reducer}_{self.aoi.slug}_{self.scale}m{quality}")
+
+    @property
+    def is_fused(self) -> bool:
+        return self.reducer == FUSED_REDUCER
+
+    @property
+    def fused_band(self) -> Optional[str]:
+        """Name of this statistic within the fused composite, if it is part of one."""
+        if self.band in FUSED_BANDS and self.reducer in FUSED_STATISTICS:
+            return f"{self.band}_{self.reducer}"
+        return None
+
+    def fused(self) -> 'CompositeKey':
+        """Key of the fused composite for the same period, sensor and AOI."""
+        return replace(self, reducer=FUSED_REDUCER, band='_'.join(FUSED_BANDS))
+
+
+@dataclass
+class LSTRaster:
+    """A cached composite read into memory (NaN where there is no data)."""
+    data: np.ndarray                            # (bands, rows, cols) float32
+    band_names: List[str]
+    bounds: Tuple[float, float, float, float]   # West, south, east, north in the raster CRS
+    latlon_bounds: Tuple[float, float, float, float]
+    crs: str
+    transform: Tuple[float, ...]
+
+    def band(self, name: Optional[str] = None) -> np.ndarray:
+        """One band as a 2-D array (the first band by default)."""
+        return self.data[self.band_names.index(name) if name else 0]
+
+    def stats(self, name: Optional[str] = None, percentiles: Iterable[int] = (10, 50, 90)) -> Dict[str, float]:
+        """Summary statistics of the valid pixels of one band."""
+        values = self.band(name)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return {'valid_pixels': 0}
+        stats = {
+            'valid_pixels': int(values.size),
+            'mean': float(values.mean()),
+            'std': float(values.std()),
+            'min': float(values.min()),
+            'max': float(values.max())
+        }
+        for p, value in zip(percentiles, np.percentile(values, list(percentiles))):
+            stats[f'p{p}'] = float(value)
+        return stats
+
+
+def write_cog(path: Path, data: np.ndarray, profile: Dict, names: List[str],
+              compress: str = 'DEFLATE', blocksize: int = 256) -> Path:
+    """Write a (bands, rows, cols) float32 array as a Cloud-Optimized GeoTIFF (NaN no-data).
+
+    ``profile`` supplies the grid (crs, transform, width, height).
+    """
+    import rasterio.shutil
+    from rasterio.io import MemoryFile
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp.tif')
+
+    profile = dict(profile)
+    profile.update(driver='GTiff', dtype='float32', nodata=np.nan, count=data.shape[0])
+    with MemoryFile() as staging:
+        with staging.open(**profile) as dst:
+            dst.write(data.astype(np.float32, copy=False))
+            for index, name in enumerate(names, start=1):
+                dst.set_band_description(index, name)
+        with staging.open() as staged:
+            rasterio.shutil.copy(staged, tmp, driver='COG', COMPRESS=compress,
+                                 PREDICTOR='YES', BLOCKSIZE=str(blocksize),
+                                 OVERVIEW_RESAMPLING='AVERAGE')
+    os.replace(tmp, path)
+    return path
+
+
+@dataclass
+class LSTCacheConfig:
+    """Configuration for the LST raster cache."""
+    cache_dir: Path = field(default=LST_CACHE_DIR)
+    offline: bool = field(default=False)        # Never contact Earth Engine
+    crs: str = field(default='EPSG:3857')       # Web Mercator, so map overlays align exactly
+    blocksize: int = field(default=256)
+    compress: str = field(default='DEFLATE')
+    # Periods per stacked download; 6 x 8 fused bands of the 5km AOI stays
+    # well under the Earth Engine download size limit
+    stack_periods: int = field(default=6)
+
+
+class LSTRasterCache:
+    """Period composites stored locally as Cloud-Optimized GeoTIFFs."""
+
+    def __init__(self, config: Optional[LSTCacheConfig] = None):
+        """Initialize with configuration."""
+        self.config = config or LSTCacheConfig()
+        self.config.cache_dir = Path(self.config.cache_dir)
+        self._rasters: Dict[CompositeKey, LSTRaster] = {}
+
+    def path(self, key: CompositeKey) -> Path:
+        return self.config.cache_dir / f"{key.slug}.tif"
+
+    def has(self, key: CompositeKey) -> bool:
+        return self.path(key).exists()
+
+    def fetch(self, key: CompositeKey) -> Path:
+        """Path of the cached file holding ``key``, downloading it on a miss.
+
+        Statistics that are part of the fused composite are downloaded as
+        that composite unless a single-band file of them is already cached.
+        """
+        path = self.path(key)
+        if path.exists():
+            return path
+        if key.fused_band:
+            return self.fetch(key.fused())
+        if self.config.offline:
+            raise FileNotFoundError(f"{key.slug} is not cached and the cache is offline")
+
+        from landsat_lst import composite_image, download_geotiff, fused_composite_image, quality_report
+        logger.info(f"Downloading composite {key.slug}")
+        metadata = {'quality': quality_report([key])[0]}
+        if key.is_fused:
+            data = download_geotiff(fused_composite_image(key), key, self.config.crs)
+            return self.store(key, data, band_names=fused_band_names(), metadata=metadata)
+        data = download_geotiff(composite_image(key), key, self.config.crs)
+        return self.store(key, data, metadata=metadata)
+
+    def locate(self, key: CompositeKey) -> Tuple[Path, int]:
+        """File holding ``key`` and its 1-based band index (fetched on a miss)."""
+        if self.has(key) or not key.fused_band:
+            return self.fetch(key), 1
+        return self.fetch(key.fused()), fused_band_names().index(key.fused_band) + 1
+
+    def prefetch(self, keys: Iterable[CompositeKey]) -> List[Path]:
+        """Make sure every key is cached; returns their paths.
+
+        Missing fused composites are computed together as period stacks (one
+        Earth Engine reduction and download per batch of periods) rather than
+        one pipeline per period.
+        """
+        keys = list(keys)
+        groups: Dict[Tuple, List[CompositeKey]] = {}
+        for key in keys:
+            target = key.fused() if key.fused_band and not self.has(key) else key
+            if target.is_fused and not self.has(target):
+                group = groups.setdefault((target.months, target.aoi, target.scale, target.max_cloud_cover), [])
+                if target not in group:
+                    group.append(target)
+        for group in groups.values():
+            if len(group) > 1:
+                self.fetch_stack(group)
+        return [self.locate(key)[0] for key in keys]
+
+    def fetch_stack(self, keys: List[CompositeKey]) -> List[Path]:
+        """Download fused composites of several periods (same months, AOI, scale and cloud filter) in batches."""
+        if self.config.offline:
+            raise FileNotFoundError(f"{len(keys)} period composites are not cached and the cache is offline")
+
+        from landsat_lst import download_geotiff, period_stack_image, quality_report
+        paths = []
+        size = max(1, self.config.stack_periods)
+        for i in range(0, len(keys), size):
+            batch = keys[i:i + size]
+            logger.info(f"Downloading period stack of {len(batch)} composites "
+                        f"({batch[0].start_year}-{batch[-1].end_year})")
+            reports = quality_report(batch)
+            data = download_geotiff(period_stack_image(batch), batch[0], self.config.crs)
+            paths.extend(self.store_stack(batch, data, [{'quality': report} for report in reports]))
+        return paths
+
+    def store(self, key: CompositeKey, geotiff: bytes, band_names: Optional[List[str]] = None,
+              metadata: Optional[Dict] = None) -> Path:
+        """Write GeoTIFF bytes to the cache as a COG (NODATA becomes NaN)."""
+        from rasterio.io import MemoryFile
+
+        with MemoryFile(geotiff) as source, source.open() as src:
+            data = self._masked(src)
+            names = band_names or [d or key.band for d in src.descriptions]
+            return self._write(key, data, src.profile, names, metadata)
+
+    def store_stack(self, keys: List[CompositeKey], geotiff: bytes,
+                    metadata: Optional[List[Dict]] = None) -> List[Path]:
+        """Split a downloaded period stack (``stack_band_names`` order) into fused composites.
+
+        ``metadata`` holds one sidecar entry per key.
+        """
+        from rasterio.io import MemoryFile
+
+        names = fused_band_names()
+        metadata = [{**extra, 'stack_periods': len(keys)} for extra in (metadata or [{}] * len(keys))]
+        with MemoryFile(geotiff) as source, source.open() as src:
+            if src.count != len(keys) * len(names):
+                raise ValueError(f"Expected {len(keys) * len(names)} bands in the period stack, got {src.count}")
+            data = self._masked(src)
+            return [self._write(key, data[i * len(names):(i + 1) * len(names)], src.profile, names, metadata[i])
+                    for i, key in enumerate(keys)]
+
+    @staticmethod
+    def _masked(src) -> np.ndarray:
+        data = src.read().astype(np.float32)
+        data[(data == NODATA) | (src.read_masks() == 0)] = np.nan
+        return data
+
+    def _write(self, key: CompositeKey, data: np.ndarray, profile: Dict, names: List[str],
+               metadata: Optional[Dict] = None) -> Path:
+        path = write_cog(self.path(key), data, profile, names,
+                         compress=self.config.compress, blocksize=self.config.blocksize)
+
+        sidecar = {'key': asdict(key), 'bands': names, 'created': datetime.now().isoformat(timespec='seconds')}
+        sidecar.update(metadata or {})
+        path.with_suffix('.json').write_text(json.dumps(sidecar, indent=2))
+        self._rasters.pop(key, None)
+        logger.info(f"Cached {key.slug} ({path.stat().st_size / 1024:.0f} KiB)")
+        return path
+
+    def read(self, key: CompositeKey) -> LSTRaster:
+        """Composite as an in-memory raster (fetched on a miss, memoised per process)."""
+        if key in self._rasters:
+            return self._rasters[key]
+        if not self.has(key) and key.fused_band:
+            fused = self.read(key.fused())
+            index = fused.band_names.index(key.fused_band)
+            raster = replace(fused, data=fused.data[index:index + 1], band_names=[key.band])
+            self._rasters[key] = raster
+            return raster
+
+        import rasterio
+        from rasterio.warp import transform_bounds
+
+        with rasterio.open(self.fetch(key)) as src:
+            data = src.read().astype(np.float32)
+            if src.nodata is not None and not np.isnan(src.nodata):
+                data[data == src.nodata] = np.nan
+            bounds = tuple(src.bounds)
+            raster = LSTRaster(
+                data=data,
+                band_names=[d or key.band for d in src.descriptions],
+                bounds=bounds,
+                latlon_bounds=tuple(transform_bounds(src.crs, 'EPSG:4326', *bounds)),
+                crs=src.crs.to_string(),
+                transform=tuple(src.transform)[:6]
+            )
+        self._rasters[key] = raster
+        return raster
+
+    def entries(self) -> List[Dict]:
+        """Sidecar metadata of every cached composite."""
+        return [json.loads(p.read_text()) for p in sorted(self.config.cache_dir.glob('*.json'))]
+
+
+def main():
+    """List cached composites and their statistics."""
+    cache = LSTRasterCache(LSTCacheConfig(offline=True))
+    for entry in cache.entries():
+        key = entry['key']
+        # Composites cached before the quality stage existed were unfiltered
+        key = CompositeKey(**{'max_cloud_cover': None, **key, 'aoi': AOI(**key['aoi'])})
+        stats = cache.read(key).stats()
+        print(f"{key.slug}: mean {stats.get('mean', float('nan')):.1f}, "
+              f"p90 {stats.get('p90', float('nan')):.1f} ({stats['valid_pixels']} px)")
+        if 'quality' in entry:
+            quality = entry['quality']
+            print(f"  {quality['scenes_removed']} of {quality['scenes']} scenes removed by the quality filter")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,18 @@
-import ee
-import geemap
-import numpy as np
-from datetime import datetime
+import argparse
+import json
+import time
+from pathlib import Path
 
-# Initialize Earth Engine
-try:
-    ee.Initialize()
-except Exception as e:
-    print("Error initializing Earth Engine. Please authenticate first.")
-    print("Run 'earthengine authenticate' in your terminal.")
-    raise e
+from lst_cache import HOSPITAL_LAT, HOSPITAL_LON, CompositeKey, LSTCacheConfig, LSTRasterCache
+from lst_overlay import add_hospital, add_legend, add_raster_overlay, add_tile_layer, base_map
 
-# Define constants
-HOSPITAL_LAT = -26.1752
-HOSPITAL_LON = 28.0183
-JOBURG_CENTER = ee.Geometry.Point([HOSPITAL_LON, HOSPITAL_LAT])
-BUFFER_DISTANCE = 5000  # 5km buffer
-JOBURG_AREA = JOBURG_CENTER.buffer(BUFFER_DISTANCE)
+# Periods of the lst_map_*.html pages
+LST_MAP_PERIODS = [
+    (1980, 1995), (1990, 1995), (1990, 1999), (1995, 2000), (1995, 2010), (2000, 2005),
+    (2000, 2009), (2005, 2010), (2010, 2023), (2014, 2023), (2015, 2020), (2020, 2023)
+]
+PEAK_SUMMER_MONTHS = (12, 1, 2)
+TILE_DIR = Path('tiles')  # Pyramids written by lst_tiles.py
 
 # Define visualization parameters for LST with transparency
 LST_VIS_PARAMS = {
@@ -34,71 +30,42 @@ LST_VIS_PARAMS = {
     'opacity': 0.8  # Increased opacity
 }
 
-def get_landsat_collection(start_year, end_year):
-    """Get Landsat collection for peak summer months (Dec-Feb)."""
-    if start_year >= 2013:
-        collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2')
-        thermal_band = 'ST_B10'
-    else:
-        collection = ee.ImageCollection('LANDSAT/LT05/C02/T1_L2')
-        thermal_band = 'ST_B6'
-    
-    mult = 0.00341802
-    add = 149.0
-    
-    # Filter for summer months only (December, January, February)
-    filtered = collection.filterBounds(JOBURG_AREA) \
-        .filter(ee.Filter.calendarRange(start_year, end_year, 'year')) \
-        .filter(ee.Filter.calendarRange(12, 2, 'month'))  # Peak summer months
-    
-    return filtered, thermal_band, mult, add
+def peak_summer_key(start_year, end_year):
+    """Cache key of the peak-summer (Dec-Feb) 90th percentile LST composite."""
+    return CompositeKey(start_year, end_year, months=PEAK_SUMMER_MONTHS, reducer='p90')
 
-def calculate_lst(image, thermal_band, mult, add):
-    """Calculate Land Surface Temperature in Celsius."""
-    lst = image.select(thermal_band).multiply(mult).add(add).subtract(273.15)
-    return lst.rename('LST')
-
-def create_lst_map(start_year, end_year, title):
-    """Create a map showing LST for the specified period."""
-    Map = geemap.Map(center=[HOSPITAL_LAT, HOSPITAL_LON], zoom=13)
-    Map.add_basemap('HYBRID')
-    
-    # Get data
-    collection, thermal_band, mult, add = get_landsat_collection(start_year, end_year)
-    lst = collection.map(lambda img: calculate_lst(img, thermal_band, mult, add))
-    
-    # Calculate percentile values instead of mean
-    lst_p90 = lst.reduce(ee.Reducer.percentile([90]))  # Use 90th percentile for hot days
+def create_lst_map(start_year, end_year, title, cache=None, tiles=False):
+    """Create a map showing LST for the specified period from the local raster cache.
     
-    # Add LST layer with transparency
-    Map.addLayer(
-        lst_p90, 
-        LST_VIS_PARAMS,
-        f'Peak Summer LST ({start_year}-{end_year})'
-    )
+    With tiles=True the layer is the static pyramid rendered by lst_tiles.py
+    instead of an overlay image embedded in the page.
+    """
+    cache = cache or LSTRasterCache()
+    Map = base_map(center=(HOSPITAL_LAT, HOSPITAL_LON), zoom=13)
+    layer_name = f'Peak Summer LST ({start_year}-{end_year})'
     
-    # Add a point for the hospital location
-    hospital_point = ee.Geometry.Point([HOSPITAL_LON, HOSPITAL_LAT])
-    Map.addLayer(
-        ee.FeatureCollection([ee.Feature(hospital_point)]),
-        {'color': 'red', 'pointSize': 10},
-        'Hospital Location'
-    )
+    if tiles:
+        tilejson = json.loads((TILE_DIR / f'lst_p90_{start_year}_{end_year}' / 'tilejson.json').read_text())
+        add_tile_layer(Map, tilejson, layer_name)  # Opacity is baked into the tiles
+    else:
+        # 90th percentile for hot days, downloaded once and reused from the cache
+        lst_p90 = cache.read(peak_summer_key(start_year, end_year))
+        
+        # Add LST layer with transparency
+        add_raster_overlay(Map, lst_p90, LST_VIS_PARAMS, layer_name)
     
-    # Add a prominent text label for the hospital
-    Map.add_text(
+    # Add the hospital location with a prominent text label
+    add_hospital(
+        Map,
         text=f"Rahima Moosa Hospital\nPeak Summer LST {start_year}-{end_year}",
-        xy=(HOSPITAL_LON, HOSPITAL_LAT + 0.002),  # Offset label slightly
         font_size=20,
-        font_color='white',
-        font_family='arial',
-        font_weight='bold',
-        background_color='rgba(0,0,0,0.8)',
-        padding=(8, 8)
+        background='rgba(0,0,0,0.8)',
+        offset_lat=0.002  # Offset label slightly
     )
     
     # Add a legend
-    Map.add_legend(
+    add_legend(
+        Map,
         title="Peak Summer Land Surface Temperature",
         legend_dict={
             'Cool (28°C)': '#313695',
@@ -113,24 +80,34 @@ def create_lst_map(start_year, end_year, title):
     
     return Map
 
-def create_all_maps():
+def create_all_maps(periods=LST_MAP_PERIODS, offline=False, tiles=False):
     """Create maps for different periods."""
-    periods = [
-        (1980, 1995, 'Early Period'),
-        (1995, 2010, 'Mid Period'),
-        (2010, 2023, 'Recent Period')
-    ]
+    cache = LSTRasterCache(LSTCacheConfig(offline=offline))
+    start = time.perf_counter()
     
-    for start_year, end_year, label in periods:
-        print(f"\nProcessing {label} ({start_year}-{end_year})...")
-        Map = create_lst_map(start_year, end_year, label)
+    if not offline and not tiles:
+        # Every missing period composite from one batched Earth Engine graph
+        cache.prefetch([peak_summer_key(start_year, end_year) for start_year, end_year in periods])
+    
+    for start_year, end_year in periods:
+        print(f"\nProcessing {start_year}-{end_year}...")
+        Map = create_lst_map(start_year, end_year, f'{start_year}-{end_year}', cache=cache, tiles=tiles)
         
         # Save the map
         output_file = f'lst_map_{start_year}_{end_year}.html'
         Map.save(output_file)
         print(f"Map saved to {output_file}")
+    
+    print(f"\n{len(periods)} maps created in {time.perf_counter() - start:.1f}s")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Create peak summer LST maps for Johannesburg.')
+    parser.add_argument('--offline', action='store_true',
+                        help='Only use composites already in the local raster cache')
+    parser.add_argument('--tiles', action='store_true',
+                        help='Load the static tile pyramids from lst_tiles.py instead of embedding images')
+    args = parser.parse_args()
+    
     print("=== Creating Peak Summer LST Maps for Johannesburg ===")
-    create_all_maps()
+    create_all_maps(offline=args.offline, tiles=args.tiles)
     print("\nAll maps created! Open the HTML files in your browser to view them.")
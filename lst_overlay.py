@@ -0,0 +1,191 @@
+"""
+Offline LST Map Overlays
+-----------------------
+Colour-maps cached LST/NDVI composites (lst_cache) and places them on
+folium maps as image overlays, so the LST maps and animations are rebuilt
+from local rasters without an Earth Engine session.
+
+- ``colorize`` applies an Earth Engine style ``vis_params`` ramp (min, max,
+  palette, opacity) with a 256-entry lookup table; no-data is transparent.
+- The composites are cached in Web Mercator, the projection Leaflet draws
+  image overlays in, so overlay corners align exactly with the basemap.
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import base64
+import json
+import logging
+from io import BytesIO
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from lst_cache import HOSPITAL_LAT, HOSPITAL_LON, LSTRaster
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Tile source geemap uses for its 'HYBRID' basemap
+HYBRID_TILES = 'https://mt1.google.com/vt/lyrs=y&x={x}&y={y}&z={z}'
+HYBRID_ATTRIBUTION = 'Google'
+
+LUT_SIZE = 256
+
+
+def _hex_to_rgb(color: str) -> Sequence[int]:
+    named = {'blue': '#0000ff', 'yellow': '#ffff00', 'red': '#ff0000', 'green': '#008000',
+             'white': '#ffffff', 'black': '#000000'}
+    color = named.get(color, color).lstrip('#')
+    return [int(color[i:i + 2], 16) for i in (0, 2, 4)]
+
+
+def palette_lut(palette: Sequence[str], size: int = LUT_SIZE) -> np.ndarray:
+    """(size, 3) uint8 colour ramp linearly interpolated through ``palette``."""
+    stops = np.array([_hex_to_rgb(c) for c in palette], dtype=np.float64)
+    positions = np.linspace(0, 1, len(stops))
+    ramp = np.linspace(0, 1, size)
+    return np.stack([np.interp(ramp, positions, stops[:, i]) for i in range(3)], axis=1) \
+        .round().astype(np.uint8)
+
+
+def colorize(values: np.ndarray, vis_params: Dict, lut: Optional[np.ndarray] = None) -> np.ndarray:
+    """RGBA uint8 image of ``values`` under EE-style ``vis_params``; NaN is transparent."""
+    lut = palette_lut(vis_params['palette']) if lut is None else lut
+    lo, hi = vis_params['min'], vis_params['max']
+    valid = np.isfinite(values)
+
+    scaled = (np.where(valid, values, lo) - lo) * ((len(lut) - 1) / (hi - lo))
+    index = np.clip(scaled, 0, len(lut) - 1).astype(np.intp)
+
+    rgba = np.empty(values.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = lut[index]
+    rgba[..., 3] = np.where(valid, round(255 * vis_params.get('opacity', 1.0)), 0)
+    return rgba
+
+
+def png_bytes(rgba: np.ndarray) -> bytes:
+    """Encode an RGBA array as PNG."""
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.fromarray(rgba, mode='RGBA').save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def png_data_uri(rgba: np.ndarray) -> str:
+    return 'data:image/png;base64,' + base64.b64encode(png_bytes(rgba)).decode('ascii')
+
+
+def base_map(center=(HOSPITAL_LAT, HOSPITAL_LON), zoom: int = 13):
+    """folium map with the hybrid satellite basemap the geemap scripts used."""
+    import folium
+
+    m = folium.Map(location=list(center), zoom_start=zoom, tiles=None)
+    folium.TileLayer(HYBRID_TILES, attr=HYBRID_ATTRIBUTION, name='Hybrid').add_to(m)
+    return m
+
+
+def add_raster_overlay(m, raster: LSTRaster, vis_params: Dict, name: str,
+                       band: Optional[str] = None, show: bool = True):
+    """Add one band of a cached raster as a colour-mapped image overlay."""
+    import folium
+
+    west, south, east, north = raster.latlon_bounds
+    overlay = folium.raster_layers.ImageOverlay(
+        image=png_data_uri(colorize(raster.band(band), vis_params)),
+        bounds=[[south, west], [north, east]],
+        name=name,
+        show=show
+    )
+    overlay.add_to(m)
+    return overlay
+
+
+def add_hospital(m, text: str = 'Rahima Moosa Hospital', font_size: int = 16,
+                 background: str = 'rgba(0,0,0,0.7)', offset_lat: float = 0.0):
+    """Hospital point plus a text label, as the geemap ``add_text`` calls drew it."""
+    import folium
+
+    folium.CircleMarker([HOSPITAL_LAT, HOSPITAL_LON], radius=6, color='red', fill=True,
+                        fill_opacity=1.0, tooltip='Rahima Moosa Hospital').add_to(m)
+    html = (f'<div style="font: bold {font_size}px Arial; color: white; background: {background}; '
+            f'padding: 5px; white-space: pre; display: inline-block">{text}</div>')
+    folium.Marker([HOSPITAL_LAT + offset_lat, HOSPITAL_LON],
+                  icon=folium.DivIcon(html=html, icon_size=(0, 0))).add_to(m)
+
+
+def add_legend(m, title: str, legend_dict: Dict[str, str], position: str = 'bottomright'):
+    """Fixed legend box listing colour swatches."""
+    import folium
+
+    vertical, horizontal = ('bottom' if 'bottom' in position else 'top'), \
+        ('right' if 'right' in position else 'left')
+    rows = ''.join(
+        f'<div><span style="display:inline-block;width:14px;height:14px;background:{color};'
+        f'margin-right:6px;vertical-align:middle"></span>{label}</div>'
+        for label, color in legend_dict.items()
+    )
+    html = (f'<div style="position:fixed;{vertical}:20px;{horizontal}:20px;z-index:9999;'
+            f'background:white;padding:8px 10px;border-radius:4px;font:12px Arial;'
+            f'box-shadow:0 1px 4px rgba(0,0,0,0.3)"><b>{title}</b>{rows}</div>')
+    m.get_root().html.add_child(folium.Element(html))
+
+
+# Cycles the period overlays; one frame per `interval` milliseconds
+PERIOD_ANIMATION_SCRIPT = """
+<script>
+document.addEventListener('DOMContentLoaded', function () {{
+    var frames = document.getElementsByClassName('leaflet-image-layer');
+    var labels = {labels};
+    var banner = document.getElementById('period-label');
+    var current = 0;
+    function show(index) {{
+        for (var i = 0; i < frames.length; i++) {{
+            frames[i].style.visibility = i === index ? 'visible' : 'hidden';
+        }}
+        banner.textContent = labels[index];
+    }}
+    show(0);
+    setInterval(function () {{ current = (current + 1) % frames.length; show(current); }}, {interval_ms});
+}});
+</script>
+<div id="period-label" style="position:fixed;top:20px;left:60px;z-index:9999;font:bold 24px Arial;
+     color:white;background:rgba(0,0,0,0.7);padding:8px"></div>
+"""
+
+
+def add_period_animation(m, labels: Sequence[str], interval_ms: int = 3000):
+    """Show the map's image overlays one at a time with a period banner, like geemap's time slider."""
+    import folium
+
+    m.get_root().html.add_child(folium.Element(PERIOD_ANIMATION_SCRIPT.format(
+        labels=json.dumps(list(labels)), interval_ms=interval_ms
+    )))
+
+
+def add_tile_layer(m, tilejson: Dict, name: str, opacity: float = 1.0, show: bool = True):
+    """Add a pre-rendered XYZ pyramid (lst_tiles) described by its TileJSON."""
+    import folium
+
+    west, south, east, north = tilejson['bounds']
+    layer = folium.TileLayer(
+        tiles=tilejson['tiles'][0],
+        attr='Landsat LST',
+        name=name,
+        overlay=True,
+        show=show,
+        opacity=opacity,
+        min_zoom=0,
+        min_native_zoom=tilejson['minzoom'],
+        max_native_zoom=tilejson['maxzoom'],
+        bounds=[[south, west], [north, east]]
+    )
+    layer.add_to(m)
+    return layer
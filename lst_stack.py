@@ -0,0 +1,238 @@
+"""
+Per-Scene LST Raster Stack
+-------------------------
+Local (scene, row, col) stacks of quality-filtered Landsat LST (and
+optionally NDVI) over an AOI, for analyses that need every scene rather
+than period composites (UHI intensity, per-pixel regressions).
+
+Each band is one ``.npy`` file opened as a memory map, so analyses stream
+through the stack in chunks of scenes or of pixels without loading it. The
+stack is downloaded once in requests of many scenes (sized to stay under
+the Earth Engine download limit) and resumes where it stopped: a ``done``
+flag per scene records what has been written.
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from lst_cache import CACHE_DIR, MAX_CLOUD_COVER, NODATA, SEASON_MONTHS, AOI, CompositeKey
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+STACK_CACHE_DIR = CACHE_DIR / 'lst_stack'
+
+
+@dataclass(frozen=True)
+class StackKey:
+    """Identity of one scene stack."""
+    start_year: int
+    end_year: int
+    months: Tuple[int, ...] = SEASON_MONTHS
+    sensors: Tuple[str, ...] = ('L5', 'L7', 'L8', 'L9')
+    bands: Tuple[str, ...] = ('LST',)
+    aoi: AOI = field(default_factory=lambda: AOI(buffer_m=15000))  # Wide enough for rural reference rings
+    scale: int = 90                             # Thermal bands are 100-120m native
+    max_cloud_cover: Optional[int] = MAX_CLOUD_COVER
+
+    def __post_init__(self):
+        for name in ('months', 'sensors', 'bands'):
+            object.__setattr__(self, name, tuple(getattr(self, name)))
+
+    @property
+    def slug(self) -> str:
+        months = '-'.join(str(m) for m in self.months)
+        quality = f"_cc{self.max_cloud_cover}" if self.max_cloud_cover is not None else ''
+        return (f"{'-'.join(self.sensors)}_{self.start_year}_{self.end_year}_m{months}_"
+                f"{'-'.join(self.bands)}_{self.aoi.slug}_{self.scale}m{quality}")
+
+    def composite_key(self, sensor: str) -> CompositeKey:
+        """Composite key sharing this stack's period, AOI and quality settings (for landsat_lst)."""
+        return CompositeKey(self.start_year, self.end_year, months=self.months, sensor=sensor,
+                            aoi=self.aoi, scale=self.scale, max_cloud_cover=self.max_cloud_cover)
+
+
+@dataclass
+class SceneStackConfig:
+    """Configuration for scene stacks."""
+    cache_dir: Path = field(default=STACK_CACHE_DIR)
+    crs: str = field(default='EPSG:3857')
+    offline: bool = field(default=False)
+    max_request_mb: float = field(default=24.0)  # Below the 32 MB getDownloadURL limit
+
+
+class LSTSceneStack:
+    """A memory-mapped (scene, row, col) stack per band."""
+
+    def __init__(self, key: StackKey, config: Optional[SceneStackConfig] = None):
+        """Initialize with the stack key and configuration."""
+        self.key = key
+        self.config = config or SceneStackConfig()
+        self.dir = Path(self.config.cache_dir) / key.slug
+        self._meta: Optional[Dict] = None
+
+    # ------------------------------------------------------------------
+    # Metadata
+    # ------------------------------------------------------------------
+    @property
+    def meta(self) -> Dict:
+        """Scenes ({'scene', 'sensor', 'time'}) and grid (shape, transform, crs) of the stack."""
+        if self._meta is None:
+            self._meta = json.loads((self.dir / 'stack.json').read_text())
+        return self._meta
+
+    def _write_meta(self, meta: Dict) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / 'stack.json').write_text(json.dumps(meta, indent=2))
+        self._meta = meta
+
+    @property
+    def times(self) -> np.ndarray:
+        return np.array([s['time'] for s in self.meta['scenes']], dtype=np.int64).astype('datetime64[ms]')
+
+    @property
+    def sensors(self) -> np.ndarray:
+        return np.array([s['sensor'] for s in self.meta['scenes']])
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return (len(self.meta['scenes']),) + tuple(self.meta['grid']['shape'])
+
+    @property
+    def transform(self) -> Tuple[float, ...]:
+        return tuple(self.meta['grid']['transform'])
+
+    @property
+    def crs(self) -> str:
+        return self.meta['grid']['crs']
+
+    def _band_path(self, band: str) -> Path:
+        return self.dir / f'{band}.npy'
+
+    def _done_path(self) -> Path:
+        return self.dir / 'done.npy'
+
+    def is_complete(self) -> bool:
+        return self._done_path().exists() and bool(np.load(self._done_path()).all())
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+    def build(self) -> 'LSTSceneStack':
+        """Download the scenes not yet in the stack; no-op when it is complete."""
+        if self.is_complete():
+            return self
+        if self.config.offline:
+            raise FileNotFoundError(f"Scene stack {self.key.slug} is incomplete and the cache is offline")
+
+        from landsat_lst import scene_list
+
+        if not (self.dir / 'stack.json').exists():
+            scenes = []
+            for sensor in self.key.sensors:
+                scenes += [{**s, 'sensor': sensor} for s in scene_list(self.key.composite_key(sensor))]
+            scenes.sort(key=lambda s: s['time'])
+            self._write_meta({'key': asdict(self.key), 'scenes': scenes, 'grid': None})
+            logger.info(f"Listed {len(scenes)} scenes for {self.key.slug}")
+
+        scenes = self.meta['scenes']
+        done = np.load(self._done_path()) if self._done_path().exists() else np.zeros(len(scenes), dtype=bool)
+        for sensor in self.key.sensors:
+            pending = [i for i, s in enumerate(scenes) if s['sensor'] == sensor and not done[i]]
+            while pending:
+                batch = pending[:self._scenes_per_request()]
+                pending = pending[len(batch):]
+                self._download(sensor, batch)
+                done[batch] = True
+                np.save(self._done_path(), done)
+                logger.info(f"Stack {self.key.slug}: {int(done.sum())}/{len(done)} scenes")
+        return self
+
+    def _scenes_per_request(self) -> int:
+        if self.meta['grid']:
+            rows, cols = self.meta['grid']['shape']
+        else:
+            # First request: estimate the AOI box
+            rows = cols = int(2 * self.key.aoi.buffer_m * 1.15 / self.key.scale) + 1
+        per_scene = rows * cols * 4 * len(self.key.bands)
+        return max(1, int(self.config.max_request_mb * 2 ** 20 // per_scene))
+
+    def _download(self, sensor: str, indices: List[int]) -> None:
+        """Fetch one batch of scenes of a sensor and write them into the band memmaps."""
+        from rasterio.io import MemoryFile
+
+        from landsat_lst import download_geotiff, scene_stack_image
+
+        key = self.key.composite_key(sensor)
+        ids = [self.meta['scenes'][i]['scene'] for i in indices]
+        data = download_geotiff(scene_stack_image(key, ids, self.key.bands), key, self.config.crs)
+        with MemoryFile(data) as source, source.open() as src:
+            values = src.read().astype(np.float32)
+            values[(values == NODATA) | (src.read_masks() == 0)] = np.nan
+            grid = {'shape': [src.height, src.width], 'transform': list(src.transform)[:6],
+                    'crs': src.crs.to_string()}
+
+        if self.meta['grid'] is None:
+            self._write_meta({**self.meta, 'grid': grid})
+            for band in self.key.bands:
+                stack = np.lib.format.open_memmap(self._band_path(band), mode='w+', dtype=np.float32,
+                                                  shape=self.shape)
+                stack[:] = np.nan
+                stack.flush()
+                del stack
+        elif grid['shape'] != self.meta['grid']['shape']:
+            raise ValueError(f"Scene batch grid {grid['shape']} differs from the stack grid "
+                             f"{self.meta['grid']['shape']}")
+
+        # Bands arrive scene-major: <scene>_<band> for each scene in time order
+        values = values.reshape(len(indices), len(self.key.bands), *values.shape[1:])
+        for b, band in enumerate(self.key.bands):
+            stack = np.load(self._band_path(band), mmap_mode='r+')
+            stack[indices] = values[:, b]
+            stack.flush()
+            del stack
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def array(self, band: str = 'LST') -> np.ndarray:
+        """Read-only (scene, row, col) memmap of one band."""
+        return np.load(self._band_path(band), mmap_mode='r')
+
+    def scene_chunks(self, band: str = 'LST', chunk_mb: float = 64.0) -> Iterator[Tuple[slice, np.ndarray]]:
+        """(scene slice, (scenes, pixels) array) chunks along the scene axis."""
+        stack = self.array(band)
+        flat = stack.reshape(stack.shape[0], -1)
+        step = max(1, int(chunk_mb * 2 ** 20 // (flat.shape[1] * 4)))
+        for start in range(0, flat.shape[0], step):
+            window = slice(start, min(start + step, flat.shape[0]))
+            yield window, np.asarray(flat[window])
+
+    def pixel_chunks(self, band: str = 'LST', chunk_mb: float = 64.0) -> Iterator[Tuple[slice, np.ndarray]]:
+        """(pixel slice, (scenes, pixels) array) chunks along the flattened pixel axis."""
+        stack = self.array(band)
+        flat = stack.reshape(stack.shape[0], -1)
+        step = max(1, int(chunk_mb * 2 ** 20 // (max(1, flat.shape[0]) * 4)))
+        for start in range(0, flat.shape[1], step):
+            window = slice(start, min(start + step, flat.shape[1]))
+            yield window, np.asarray(flat[:, window])
+
+    def pixel_coordinates(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(x, y) of every pixel centre in the stack CRS, flattened like the chunks."""
+        a, b, c, d, e, f = self.transform
+        rows, cols = self.meta['grid']['shape']
+        col, row = np.meshgrid(np.arange(cols) + 0.5, np.arange(rows) + 0.5)
+        return (a * col + b * row + c).ravel(), (d * col + e * row + f).ravel()
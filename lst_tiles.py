@@ -0,0 +1,290 @@
+"""
+LST Tile Pyramid Generator
+-------------------------
+Turns cached LST composites (lst_cache) into static XYZ tile pyramids, so
+the LST maps load pre-rendered tiles instead of live Earth Engine map IDs
+that expire and render slowly.
+
+- Zooms 10-16 by default, 256 px PNG or WebP tiles in
+  ``tiles/<layer>/{z}/{x}/{y}.<ext>`` with a ``tilejson.json`` per layer.
+- The ``LST_VIS_PARAMS`` colour ramp is applied as a vectorized palette
+  lookup; PNG tiles are written as indexed images with a transparent
+  no-data entry.
+- Tiles are resampled from the Web Mercator COG and rendered by a process
+  pool; each worker loads the raster once. Tiles that fall outside the
+  data or are entirely no-data are not written.
+
+Usage:
+    python lst_tiles.py                      # Every lst_map_* period
+    python lst_tiles.py --period 2014 2023 --format webp
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from lst_cache import CompositeKey, LSTCacheConfig, LSTRasterCache
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TILE_DIR = Path('tiles')
+TILE_SIZE = 256
+WEB_MERCATOR_HALF = 20037508.342789244  # Half the width of the EPSG:3857 world
+IMAGE_FORMATS = ('png', 'webp')
+NODATA_INDEX = 255  # Transparent palette entry
+
+Tile = Tuple[int, int, int]
+
+
+@dataclass
+class TileConfig:
+    """Configuration for tile pyramid generation."""
+    min_zoom: int = field(default=10)
+    max_zoom: int = field(default=16)
+    image_format: str = field(default='png')    # 'png' or 'webp'
+    tile_dir: Path = field(default=TILE_DIR)
+    processes: Optional[int] = field(default=None)
+    chunk_size: int = field(default=64)         # Tiles per worker task
+    overwrite: bool = field(default=False)
+    webp_quality: int = field(default=90)
+
+
+# ----------------------------------------------------------------------
+# Tile geometry
+# ----------------------------------------------------------------------
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """EPSG:3857 (west, south, east, north) of an XYZ tile."""
+    size = 2 * WEB_MERCATOR_HALF / 2 ** z
+    west = -WEB_MERCATOR_HALF + x * size
+    north = WEB_MERCATOR_HALF - y * size
+    return west, north - size, west + size, north
+
+
+def tiles_covering(bounds: Tuple[float, float, float, float], z: int) -> Iterator[Tile]:
+    """XYZ tiles at zoom ``z`` intersecting EPSG:3857 ``bounds``."""
+    west, south, east, north = bounds
+    size = 2 * WEB_MERCATOR_HALF / 2 ** z
+    last = 2 ** z - 1
+    x0 = max(0, int((west + WEB_MERCATOR_HALF) // size))
+    x1 = min(last, int(math.ceil((east + WEB_MERCATOR_HALF) / size)) - 1)
+    y0 = max(0, int((WEB_MERCATOR_HALF - north) // size))
+    y1 = min(last, int(math.ceil((WEB_MERCATOR_HALF - south) / size)) - 1)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield z, x, y
+
+
+# ----------------------------------------------------------------------
+# Workers
+# ----------------------------------------------------------------------
+_worker: Dict = {}
+
+
+def _init_worker(raster_path: str, band_index: int, vis_params: Dict, out_dir: str,
+                 config: TileConfig) -> None:
+    """Load the raster band and colour table once per worker process."""
+    import rasterio
+
+    with rasterio.open(raster_path) as src:
+        data = src.read(band_index).astype(np.float32)
+        if src.nodata is not None and not np.isnan(src.nodata):
+            data[data == src.nodata] = np.nan
+        _worker.update(data=data, transform=src.transform, crs=src.crs)
+    _worker.update(vis=vis_params, palette=tile_palette(vis_params),
+                   out_dir=Path(out_dir), config=config)
+
+
+def tile_palette(vis_params: Dict) -> Tuple[np.ndarray, bytes]:
+    """Colour table for indexed tiles: 255 ramp colours plus a transparent no-data index.
+
+    Returns the (256, 3) RGB table and the per-index alpha (PNG tRNS) bytes.
+    """
+    from lst_overlay import palette_lut
+
+    table = np.zeros((NODATA_INDEX + 1, 3), dtype=np.uint8)
+    table[:NODATA_INDEX] = palette_lut(vis_params['palette'], size=NODATA_INDEX)
+    alpha = bytes([round(255 * vis_params.get('opacity', 1.0))] * NODATA_INDEX + [0])
+    return table, alpha
+
+
+def color_index(values: np.ndarray, vis_params: Dict) -> np.ndarray:
+    """uint8 palette index per pixel (vectorized ramp lookup); NaN maps to NODATA_INDEX."""
+    lo, hi = vis_params['min'], vis_params['max']
+    valid = np.isfinite(values)
+    scaled = (np.where(valid, values, lo) - lo) * ((NODATA_INDEX - 1) / (hi - lo))
+    index = np.clip(scaled, 0, NODATA_INDEX - 1).astype(np.uint8)
+    index[~valid] = NODATA_INDEX
+    return index
+
+
+def _render_tile(z: int, x: int, y: int) -> Optional[np.ndarray]:
+    """Resample the raster onto one tile; palette indices, or None if it holds no data."""
+    from rasterio.transform import from_bounds
+    from rasterio.warp import Resampling, reproject
+
+    tile = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    source_res = abs(_worker['transform'].a)
+    tile_res = 2 * WEB_MERCATOR_HALF / 2 ** z / TILE_SIZE
+    reproject(
+        _worker['data'], tile,
+        src_transform=_worker['transform'], src_crs=_worker['crs'], src_nodata=np.nan,
+        dst_transform=from_bounds(*tile_bounds(z, x, y), TILE_SIZE, TILE_SIZE),
+        dst_crs='EPSG:3857', dst_nodata=np.nan,
+        # Average when zoomed out past the 30m pixels, bilinear when zoomed in
+        resampling=Resampling.average if tile_res > source_res else Resampling.bilinear
+    )
+    if not np.isfinite(tile).any():
+        return None
+    return color_index(tile, _worker['vis'])
+
+
+def _render_chunk(tiles: List[Tile]) -> Tuple[int, int]:
+    """Render and write a batch of tiles; returns (written, skipped)."""
+    from PIL import Image
+
+    config: TileConfig = _worker['config']
+    ext = config.image_format
+    written = skipped = 0
+    for z, x, y in tiles:
+        path = _worker['out_dir'] / str(z) / str(x) / f'{y}.{ext}'
+        if path.exists() and not config.overwrite:
+            skipped += 1
+            continue
+        index = _render_tile(z, x, y)
+        if index is None:
+            skipped += 1
+            continue
+
+        # Indexed PNGs are a quarter of the RGBA size and much faster to encode
+        table, alpha = _worker['palette']
+        image = Image.fromarray(index, mode='P')
+        image.putpalette(table.tobytes())
+        buffer = BytesIO()
+        if ext == 'webp':
+            image.info['transparency'] = alpha
+            image.convert('RGBA').save(buffer, format='WEBP', quality=config.webp_quality)
+        else:
+            image.save(buffer, format='PNG', transparency=alpha)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(buffer.getvalue())
+        written += 1
+    return written, skipped
+
+
+# ----------------------------------------------------------------------
+# Pyramid
+# ----------------------------------------------------------------------
+class TilePyramidGenerator:
+    """Renders XYZ tile pyramids of cached LST composites."""
+
+    def __init__(self, config: Optional[TileConfig] = None, cache: Optional[LSTRasterCache] = None):
+        """Initialize with configuration."""
+        self.config = config or TileConfig()
+        self.config.tile_dir = Path(self.config.tile_dir)
+        self.cache = cache or LSTRasterCache()
+
+    def layer_dir(self, layer: str) -> Path:
+        return self.config.tile_dir / layer
+
+    def tile_url(self, layer: str) -> str:
+        return f"{self.config.tile_dir.as_posix()}/{layer}/{{z}}/{{x}}/{{y}}.{self.config.image_format}"
+
+    def generate(self, key: CompositeKey, vis_params: Dict, layer: Optional[str] = None) -> Dict:
+        """Render the pyramid of one composite; returns its TileJSON."""
+        raster_path, band_index = self.cache.locate(key)
+        return self.generate_raster(raster_path, vis_params, layer or key.slug, band_index)
+
+    def generate_raster(self, raster_path: Path, vis_params: Dict, layer: str, band_index: int = 1) -> Dict:
+        """Render the pyramid of one band of any EPSG:3857 GeoTIFF; returns its TileJSON."""
+        import rasterio
+        from rasterio.warp import transform_bounds
+
+        with rasterio.open(raster_path) as src:
+            if not src.crs.to_string().endswith('3857'):
+                raise ValueError(f"Tiles need an EPSG:3857 raster, got {src.crs}")
+            bounds = tuple(src.bounds)
+            latlon_bounds = transform_bounds(src.crs, 'EPSG:4326', *bounds)
+
+        tiles = [t for z in range(self.config.min_zoom, self.config.max_zoom + 1)
+                 for t in tiles_covering(bounds, z)]
+        chunks = [tiles[i:i + self.config.chunk_size] for i in range(0, len(tiles), self.config.chunk_size)]
+        out_dir = self.layer_dir(layer)
+        init_args = (str(raster_path), band_index, vis_params, str(out_dir), self.config)
+
+        start = time.perf_counter()
+        processes = self.config.processes or os.cpu_count() or 1
+        if processes <= 1 or len(chunks) <= 1:
+            _init_worker(*init_args)
+            results = [_render_chunk(chunk) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=init_args) as pool:
+                results = list(pool.map(_render_chunk, chunks))
+        written = sum(r[0] for r in results)
+        skipped = sum(r[1] for r in results)
+        logger.info(f"{layer}: {written} tiles written, {skipped} empty or existing skipped "
+                    f"in {time.perf_counter() - start:.1f}s")
+
+        west, south, east, north = latlon_bounds
+        tilejson = {
+            'tilejson': '2.2.0',
+            'name': layer,
+            'tiles': [self.tile_url(layer)],
+            'minzoom': self.config.min_zoom,
+            'maxzoom': self.config.max_zoom,
+            'bounds': [west, south, east, north],
+            'center': [(west + east) / 2, (south + north) / 2, self.config.min_zoom + 3],
+            'vis_params': vis_params
+        }
+        out_dir.mkdir(parents=True, exist_ok=True)
+        (out_dir / 'tilejson.json').write_text(json.dumps(tilejson, indent=2))
+        return tilejson
+
+
+def main():
+    """Render tile pyramids for the peak-summer LST map periods."""
+    from lst_maps import LST_MAP_PERIODS, LST_VIS_PARAMS, peak_summer_key
+
+    parser = argparse.ArgumentParser(description='Render XYZ tile pyramids of cached LST composites.')
+    parser.add_argument('--period', nargs=2, type=int, action='append', metavar=('START', 'END'),
+                        help='Period to render (repeatable; default every lst_map_* period)')
+    parser.add_argument('--zooms', nargs=2, type=int, default=[10, 16], metavar=('MIN', 'MAX'))
+    parser.add_argument('--format', choices=IMAGE_FORMATS, default='png')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--overwrite', action='store_true', help='Re-render existing tiles')
+    parser.add_argument('--offline', action='store_true',
+                        help='Only use composites already in the local raster cache')
+    args = parser.parse_args()
+
+    config = TileConfig(min_zoom=args.zooms[0], max_zoom=args.zooms[1], image_format=args.format,
+                        processes=args.processes, overwrite=args.overwrite)
+    generator = TilePyramidGenerator(config, LSTRasterCache(LSTCacheConfig(offline=args.offline)))
+    periods = args.period or LST_MAP_PERIODS
+    if not args.offline:
+        generator.cache.prefetch([peak_summer_key(start_year, end_year) for start_year, end_year in periods])
+    for start_year, end_year in periods:
+        generator.generate(peak_summer_key(start_year, end_year), LST_VIS_PARAMS,
+                           layer=f'lst_p90_{start_year}_{end_year}')
+
+
+if __name__ == "__main__":
+    main()
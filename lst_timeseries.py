@@ -0,0 +1,297 @@
+"""
+Per-Scene Landsat LST Time Series at Facilities
+----------------------------------------------
+Extracts the LST of every Landsat 5/7/8/9 scene over many facility points
+and buffers, and keeps the result as a local (scene x site) table.
+
+Each request reduces all scenes of a batch of years over every region in
+one ``reduceRegions`` pass. Per scene the region sums and clear-pixel
+counts are folded into two lists, so a request returns one feature per
+scene instead of one per scene and region. That keeps even multi-decade
+batches for dozens of sites under the getInfo element limit, so a full
+1984-present series costs a handful of requests.
+
+Scenes pass the same quality stage as the composites (CLOUD_COVER filter,
+QA_PIXEL cloud/shadow mask, see landsat_lst). Results are cached per year
+in ``data_cache/lst_series/<fingerprint>/``, where the fingerprint covers
+the regions, sensors, months, cloud filter and scale, so only new years or
+new site sets are fetched.
+
+Usage:
+    python lst_timeseries.py --sites facilities.csv --buffers 0 500 1000
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lst_cache import CACHE_DIR, HOSPITAL_LAT, HOSPITAL_LON, MAX_CLOUD_COVER
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SITES = {
+    'Rahima_Moosa_Hospital': (HOSPITAL_LAT, HOSPITAL_LON)  # (lat, lon)
+}
+
+# Years with Collection 2 Level-2 scenes per sensor
+SENSOR_YEARS = {
+    'L5': (1984, 2012),
+    'L7': (1999, 2024),
+    'L8': (2013, 2100),
+    'L9': (2021, 2100)
+}
+
+
+@dataclass
+class SceneSeriesConfig:
+    """Configuration for per-scene LST extraction."""
+    sites: Dict[str, Tuple[float, float]] = field(default_factory=lambda: dict(DEFAULT_SITES))
+    buffers: List[float] = field(default_factory=lambda: [0, 500])  # Metres; 0 is the pixel at the point
+    sensors: List[str] = field(default_factory=lambda: ['L5', 'L7', 'L8', 'L9'])
+    start_year: int = field(default=1984)
+    end_year: int = field(default=2024)
+    months: Optional[List[int]] = field(default=None)   # None: every month
+    max_cloud_cover: Optional[int] = field(default=MAX_CLOUD_COVER)
+    scale: int = field(default=30)
+    batch_years: int = field(default=10)                # Years per Earth Engine request
+    cache_dir: Path = field(default=CACHE_DIR / 'lst_series')
+
+
+@dataclass
+class SceneTable:
+    """LST of every scene (rows) at every region (columns)."""
+    scenes: np.ndarray          # (scene,) Earth Engine scene index
+    sensors: np.ndarray         # (scene,)
+    times: np.ndarray           # (scene,) datetime64[ms] acquisition time
+    cloud_cover: np.ndarray     # (scene,) scene CLOUD_COVER %
+    regions: List[str]
+    mean: np.ndarray            # (scene, region) float32 °C; NaN without clear pixels
+    count: np.ndarray           # (scene, region) int32 clear pixels
+
+    def __len__(self) -> int:
+        return len(self.scenes)
+
+    def frame(self, stat: str = 'mean') -> pd.DataFrame:
+        """(date, scene) x region DataFrame of 'mean' or 'count'."""
+        index = pd.MultiIndex.from_arrays(
+            [pd.to_datetime(self.times).normalize(), self.scenes], names=['date', 'scene'])
+        return pd.DataFrame(getattr(self, stat), index=index, columns=self.regions)
+
+    def daily(self) -> pd.DataFrame:
+        """Date x region LST, combining same-day scenes weighted by their clear pixels."""
+        dates = pd.to_datetime(self.times).normalize()
+        weights = self.count.astype(np.float64)
+        totals = pd.DataFrame(np.nan_to_num(self.mean) * weights, index=dates, columns=self.regions)
+        counts = pd.DataFrame(weights, index=dates, columns=self.regions)
+        totals, counts = totals.groupby(level=0).sum(), counts.groupby(level=0).sum()
+        return (totals / counts.where(counts > 0)).rename_axis('date')
+
+
+class SceneSeriesStore:
+    """Fetches and caches per-scene LST over a fixed set of facility regions."""
+
+    def __init__(self, config: Optional[SceneSeriesConfig] = None):
+        """Initialize with configuration."""
+        self.config = config or SceneSeriesConfig()
+        self.regions = [(f"{site}_{buffer:g}m", lat, lon, buffer)
+                        for site, (lat, lon) in self.config.sites.items()
+                        for buffer in self.config.buffers]
+        self.region_names = [name for name, *_ in self.regions]
+        self.cache_dir = Path(self.config.cache_dir) / self.fingerprint()
+
+    def fingerprint(self) -> str:
+        """Short hash of everything that changes the extracted values."""
+        identity = {
+            'regions': self.regions,
+            'sensors': sorted(self.config.sensors),
+            'months': self.config.months,
+            'max_cloud_cover': self.config.max_cloud_cover,
+            'scale': self.config.scale
+        }
+        return hashlib.blake2b(json.dumps(identity).encode(), digest_size=6).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Year storage
+    # ------------------------------------------------------------------
+    def _year_path(self, year: int) -> Path:
+        return self.cache_dir / f'{year}.npz'
+
+    def has_year(self, year: int) -> bool:
+        return self._year_path(year).exists()
+
+    def _save_year(self, year: int, rows: List[Dict]) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        identity = self.cache_dir / 'regions.json'
+        if not identity.exists():
+            identity.write_text(json.dumps({'regions': self.regions, 'config': asdict(self.config)},
+                                           indent=2, default=str))
+        rows = sorted(rows, key=lambda r: r['time'])
+        sums = np.array([r['sum'] for r in rows], dtype=np.float64).reshape(len(rows), len(self.regions))
+        counts = np.array([r['count'] for r in rows], dtype=np.int32).reshape(len(rows), len(self.regions))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(counts > 0, sums / counts, np.nan).astype(np.float32)
+        np.savez(
+            self._year_path(year),
+            scenes=np.array([r['scene'] for r in rows], dtype=str),
+            sensors=np.array([r['sensor'] for r in rows], dtype=str),
+            times=np.array([r['time'] for r in rows], dtype=np.int64),
+            cloud_cover=np.array([r.get('cloud_cover', np.nan) for r in rows], dtype=np.float32),
+            mean=mean,
+            count=counts
+        )
+
+    # ------------------------------------------------------------------
+    # Extraction
+    # ------------------------------------------------------------------
+    def _scenes(self, sensor: str, start_year: int, end_year: int):
+        """Quality-filtered LST scenes of one sensor over the regions, as per-scene features."""
+        import ee
+        from landsat_lst import SENSORS, add_lst_ndvi, clear_mask, initialize
+
+        initialize()
+        regions = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Point([lon, lat]).buffer(buffer) if buffer else ee.Geometry.Point([lon, lat]),
+                       {'region': name})
+            for name, lat, lon, buffer in self.regions
+        ])
+        collection = ee.ImageCollection(SENSORS[sensor]['collection']) \
+            .filterBounds(regions.geometry()) \
+            .filterDate(f'{start_year}-01-01', f'{end_year + 1}-01-01')
+        if self.config.months:
+            collection = collection.filter(
+                ee.Filter.Or(*[ee.Filter.calendarRange(m, m, 'month') for m in self.config.months]))
+        if self.config.max_cloud_cover is not None:
+            collection = collection.filter(ee.Filter.lt('CLOUD_COVER', self.config.max_cloud_cover))
+
+        # Unweighted sum and count are never null, so the per-region lists stay aligned
+        reducer = ee.Reducer.sum().unweighted().combine(ee.Reducer.count(), sharedInputs=True)
+        mask_clouds = self.config.max_cloud_cover is not None
+
+        def extract(image):
+            scene = image.updateMask(clear_mask(image)) if mask_clouds else image
+            reduced = add_lst_ndvi(scene, sensor).select('LST').reduceRegions(
+                collection=regions, reducer=reducer, scale=self.config.scale)
+            return ee.Feature(None, {
+                'scene': image.get('system:index'),
+                'time': image.get('system:time_start'),
+                'cloud_cover': image.get('CLOUD_COVER'),
+                'sensor': sensor,
+                'sum': reduced.aggregate_array('sum'),
+                'count': reduced.aggregate_array('count')
+            })
+
+        return collection.map(extract)
+
+    def _fetch_batch(self, start_year: int, end_year: int) -> Dict[int, List[Dict]]:
+        """One request for every sensor's scenes in ``start_year``-``end_year``; rows by year."""
+        import ee
+
+        batches = [self._scenes(sensor, max(start_year, SENSOR_YEARS[sensor][0]),
+                                min(end_year, SENSOR_YEARS[sensor][1]))
+                   for sensor in self.config.sensors
+                   if SENSOR_YEARS[sensor][0] <= end_year and SENSOR_YEARS[sensor][1] >= start_year]
+        rows_by_year: Dict[int, List[Dict]] = {year: [] for year in range(start_year, end_year + 1)}
+        if not batches:
+            return rows_by_year
+
+        features = batches[0]
+        for batch in batches[1:]:
+            features = features.merge(batch)
+        for feature in features.getInfo()['features']:
+            row = feature['properties']
+            year = pd.Timestamp(row['time'], unit='ms').year
+            rows_by_year.setdefault(year, []).append(row)
+        logger.info(f"Fetched {sum(len(r) for r in rows_by_year.values())} scenes for "
+                    f"{start_year}-{end_year} over {len(self.regions)} regions")
+        return rows_by_year
+
+    def fetch(self) -> List[int]:
+        """Fetch every configured year not yet cached, in batches; returns the years fetched."""
+        missing = [year for year in range(self.config.start_year, self.config.end_year + 1)
+                   if not self.has_year(year)]
+        fetched = []
+        step = max(1, self.config.batch_years)
+        for i in range(0, len(missing), step):
+            years = missing[i:i + step]
+            # Batches cover contiguous spans; cached years inside a span are not rewritten
+            rows_by_year = self._fetch_batch(years[0], years[-1])
+            for year in years:
+                self._save_year(year, rows_by_year.get(year, []))
+                fetched.append(year)
+        return fetched
+
+    def table(self, start_year: Optional[int] = None, end_year: Optional[int] = None) -> SceneTable:
+        """Cached scenes of the requested years (default all configured) as one table."""
+        start_year = start_year or self.config.start_year
+        end_year = end_year or self.config.end_year
+        parts = []
+        for year in range(start_year, end_year + 1):
+            if self.has_year(year):
+                with np.load(self._year_path(year)) as cached:
+                    parts.append({name: cached[name] for name in cached.files})
+            else:
+                logger.warning(f"Year {year} is not cached; run fetch() first")
+
+        def stack(name, dtype, shape=()):
+            arrays = [p[name] for p in parts]
+            return np.concatenate(arrays) if arrays else np.empty((0,) + shape, dtype=dtype)
+
+        regions = len(self.region_names)
+        return SceneTable(
+            scenes=stack('scenes', str),
+            sensors=stack('sensors', str),
+            times=stack('times', np.int64).astype('datetime64[ms]'),
+            cloud_cover=stack('cloud_cover', np.float32),
+            regions=list(self.region_names),
+            mean=stack('mean', np.float32, (regions,)),
+            count=stack('count', np.int32, (regions,))
+        )
+
+
+def load_sites(path: Path) -> Dict[str, Tuple[float, float]]:
+    """Sites from a CSV with name, lat and lon columns."""
+    df = pd.read_csv(path)
+    return {str(row['name']): (float(row['lat']), float(row['lon'])) for _, row in df.iterrows()}
+
+
+def main():
+    """Fetch and summarise the per-scene LST series of the facility sites."""
+    parser = argparse.ArgumentParser(description='Per-scene Landsat LST time series at facility sites.')
+    parser.add_argument('--sites', type=Path, help='CSV with name, lat, lon columns (default: the hospital)')
+    parser.add_argument('--buffers', nargs='+', type=float, default=[0, 500], help='Buffer radii in metres')
+    parser.add_argument('--years', nargs=2, type=int, default=[1984, 2024], metavar=('START', 'END'))
+    parser.add_argument('--batch-years', type=int, default=10)
+    args = parser.parse_args()
+
+    config = SceneSeriesConfig(buffers=args.buffers, start_year=args.years[0], end_year=args.years[1],
+                               batch_years=args.batch_years)
+    if args.sites:
+        config.sites = load_sites(args.sites)
+    store = SceneSeriesStore(config)
+    fetched = store.fetch()
+    logger.info(f"Fetched {len(fetched)} new years")
+
+    table = store.table()
+    daily = table.daily()
+    print(f"{len(table)} scenes, {len(daily)} dates, {len(table.regions)} regions")
+    print(daily.groupby(daily.index.year).mean().round(1).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Single-Page Multi-Map Renderer
+-----------------------------
+Writes several Leaflet maps into one HTML page that loads Leaflet and its
+CSS once, describes each map as a small JSON layer config, and creates a
+map only when its panel scrolls into view (IntersectionObserver).
+
+This replaces embedding one complete folium document per map, where every
+map carried its own copy of the Leaflet/jQuery/basemap boilerplate and all
+of them initialised on page load.
+
+- Raster layers are colour-mapped (lst_overlay) and written once as PNG
+  files beside the page, so the browser caches them and the page itself
+  stays a few kilobytes.
+- Tile pyramids from lst_tiles are referenced by their TileJSON.
+- Vector layers (circles, markers) are plain JSON entries.
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import html
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from lst_cache import LSTRaster
+from lst_overlay import HYBRID_ATTRIBUTION, HYBRID_TILES, colorize, png_bytes
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Same Leaflet release folium pins
+LEAFLET_JS = 'https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js'
+LEAFLET_CSS = 'https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css'
+
+
+@dataclass
+class MapPageConfig:
+    """Configuration for the multi-map page."""
+    leaflet_js: str = field(default=LEAFLET_JS)
+    leaflet_css: str = field(default=LEAFLET_CSS)
+    basemap_url: str = field(default=HYBRID_TILES)
+    basemap_attribution: str = field(default=HYBRID_ATTRIBUTION)
+    root_margin: str = field(default='200px')   # Start loading just before a map is visible
+    map_height: int = field(default=500)
+
+
+@dataclass
+class MapPanel:
+    """One map on the page: where it looks and the layers it draws."""
+    div_id: str
+    title: str
+    center: Sequence[float]
+    zoom: int = field(default=13)
+    layers: List[Dict] = field(default_factory=list)
+    note: str = field(default='')
+
+
+PAGE_STYLE = """
+body { margin: 0; padding: 20px; font-family: Arial, sans-serif; background-color: #f5f5f5; }
+.title { text-align: center; margin-bottom: 30px; }
+.title h1 { color: #2c3e50; margin-bottom: 10px; }
+.title p { color: #666; margin-top: 0; }
+.map-container { display: flex; justify-content: space-between; margin-bottom: 20px; flex-wrap: wrap; }
+.map-wrapper { width: 32%; min-width: 400px; margin-bottom: 20px; background: white; padding: 15px;
+               border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); box-sizing: border-box; }
+.map { width: 100%; height: HEIGHTpx; border-radius: 4px; background: #ddd; }
+h2 { text-align: center; margin: 10px 0; color: #333; font-size: 1.2em; }
+.legend { margin-top: 10px; text-align: center; font-size: 0.9em; color: #666; }
+"""
+
+# Shared by every map on the page; configs come from the JSON block
+PAGE_SCRIPT = """
+(function () {
+  var configs = JSON.parse(document.getElementById('map-configs').textContent);
+  var basemap = configs.basemap;
+
+  function makeLayer(spec) {
+    switch (spec.type) {
+      case 'image':
+        return L.imageOverlay(spec.url, spec.bounds, {opacity: spec.opacity});
+      case 'tiles':
+        return L.tileLayer(spec.url, {opacity: spec.opacity, bounds: spec.bounds,
+          minNativeZoom: spec.minNativeZoom, maxNativeZoom: spec.maxNativeZoom, attribution: spec.attribution});
+      case 'circle':
+        return L.circle(spec.center, {radius: spec.radius, color: spec.color, fill: spec.fill,
+          fillOpacity: spec.fillOpacity});
+      case 'circleMarker':
+        var marker = L.circleMarker(spec.center, {radius: spec.radius, color: spec.color, fill: spec.fill,
+          fillOpacity: spec.fillOpacity});
+        return spec.tooltip ? marker.bindTooltip(spec.tooltip) : marker;
+    }
+  }
+
+  function initMap(el) {
+    var cfg = configs.maps[el.id];
+    var map = L.map(el, {center: cfg.center, zoom: cfg.zoom});
+    L.tileLayer(basemap.url, {attribution: basemap.attribution}).addTo(map);
+    var overlays = {};
+    cfg.layers.forEach(function (spec) {
+      var layer = makeLayer(spec);
+      if (spec.show !== false) layer.addTo(map);
+      if (spec.name) overlays[spec.name] = layer;
+    });
+    if (Object.keys(overlays).length) L.control.layers(null, overlays).addTo(map);
+  }
+
+  var maps = document.querySelectorAll('.map');
+  if (!('IntersectionObserver' in window)) {
+    maps.forEach(initMap);
+    return;
+  }
+  var observer = new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+      if (!entry.isIntersecting) return;
+      observer.unobserve(entry.target);
+      initMap(entry.target);
+    });
+  }, {rootMargin: configs.rootMargin});
+  maps.forEach(function (el) { observer.observe(el); });
+})();
+"""
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+class MultiMapPage:
+    """Collects map panels and renders them into one lazily initialised page."""
+
+    def __init__(self, output: Path, config: Optional[MapPageConfig] = None):
+        """Initialize with the output page path and configuration."""
+        self.output = Path(output)
+        self.config = config or MapPageConfig()
+        self.asset_dir = self.output.with_name(self.output.stem + '_files')
+        self.panels: List[MapPanel] = []
+
+    def add_panel(self, panel: MapPanel) -> MapPanel:
+        self.panels.append(panel)
+        return panel
+
+    # ------------------------------------------------------------------
+    # Layer configs
+    # ------------------------------------------------------------------
+    def image_layer(self, raster: LSTRaster, vis_params: Dict, name: str, file_stem: str,
+                    band: Optional[str] = None, show: bool = True) -> Dict:
+        """Colour-map a cached raster band to a PNG beside the page; returns its layer config."""
+        self.asset_dir.mkdir(parents=True, exist_ok=True)
+        path = self.asset_dir / f'{_slug(file_stem)}.png'
+        path.write_bytes(png_bytes(colorize(raster.band(band), vis_params)))
+        west, south, east, north = raster.latlon_bounds
+        return {
+            'type': 'image', 'name': name, 'show': show, 'opacity': 1.0,
+            'url': path.relative_to(self.output.parent).as_posix(),
+            'bounds': [[south, west], [north, east]]
+        }
+
+    @staticmethod
+    def tile_layer(tilejson: Dict, name: str, show: bool = True) -> Dict:
+        """Layer config for a pre-rendered lst_tiles pyramid."""
+        west, south, east, north = tilejson['bounds']
+        return {
+            'type': 'tiles', 'name': name, 'show': show, 'opacity': 1.0,
+            'url': tilejson['tiles'][0], 'attribution': 'Landsat LST',
+            'minNativeZoom': tilejson['minzoom'], 'maxNativeZoom': tilejson['maxzoom'],
+            'bounds': [[south, west], [north, east]]
+        }
+
+    @staticmethod
+    def circle_layer(center: Sequence[float], radius: float, color: str = 'red',
+                     name: Optional[str] = None, fill: bool = False) -> Dict:
+        return {'type': 'circle', 'name': name, 'center': list(center), 'radius': radius,
+                'color': color, 'fill': fill, 'fillOpacity': 0.2}
+
+    @staticmethod
+    def point_layer(center: Sequence[float], tooltip: str = '', radius: int = 5,
+                    color: str = 'red') -> Dict:
+        return {'type': 'circleMarker', 'center': list(center), 'radius': radius,
+                'color': color, 'fill': True, 'fillOpacity': 1.0, 'tooltip': tooltip}
+
+    # ------------------------------------------------------------------
+    # Page
+    # ------------------------------------------------------------------
+    def configs(self) -> Dict:
+        return {
+            'basemap': {'url': self.config.basemap_url, 'attribution': self.config.basemap_attribution},
+            'rootMargin': self.config.root_margin,
+            'maps': {p.div_id: {'center': list(p.center), 'zoom': p.zoom,
+                                'layers': [{k: v for k, v in layer.items() if v is not None}
+                                           for layer in p.layers]}
+                     for p in self.panels}
+        }
+
+    def render(self, title: str, heading: Optional[str] = None, subtitle: str = '') -> Path:
+        """Write the page and return its path."""
+        panels = '\n'.join(
+            f'    <div class="map-wrapper">\n'
+            f'      <h2>{html.escape(p.title)}</h2>\n'
+            f'      <div id="{p.div_id}" class="map"></div>\n'
+            + (f'      <div class="legend">{html.escape(p.note)}</div>\n' if p.note else '')
+            + '    </div>'
+            for p in self.panels
+        )
+        # '</' cannot appear inside a script element
+        configs = json.dumps(self.configs(), separators=(',', ':')).replace('</', '<\\/')
+        style = PAGE_STYLE.replace('HEIGHT', str(self.config.map_height))
+
+        page = f"""<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <title>{html.escape(title)}</title>
+  <link rel="stylesheet" href="{self.config.leaflet_css}">
+  <style>{style}</style>
+</head>
+<body>
+  <div class="title">
+    <h1>{html.escape(heading or title)}</h1>
+    <p>{html.escape(subtitle)}</p>
+  </div>
+  <div class="map-container">
+{panels}
+  </div>
+  <script type="application/json" id="map-configs">{configs}</script>
+  <script src="{self.config.leaflet_js}" defer></script>
+  <script>
+  window.addEventListener('DOMContentLoaded', function () {{
+{PAGE_SCRIPT}
+  }});
+  </script>
+</body>
+</html>
+"""
+        self.output.write_text(page)
+        logger.info(f"Wrote {self.output} ({len(page) / 1024:.1f} KiB, {len(self.panels)} maps)")
+        return self.output
@@ -0,0 +1,304 @@
+"""
+Yearly Metrics Cube
+------------------
+Precomputed (site × season-year × metric) cube of warm-season heat metrics,
+so any period comparison (1980-1989 vs 2015-2024, 1981-2010 vs 2011-2019,
+1989 vs 2013-2019 vs 2023-2024, ...) is a slice and a reduction instead of a
+fresh extraction and analysis.
+
+A season-year is labelled by the year in which the warm season starts, so
+season-year 1989 covers September 1989 to February 1990.
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_retrieval import CACHE_DIR
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+METRICS = [
+    'mean_tmax',         # Mean daily maximum temperature (°C)
+    'max_tmax',          # Absolute maximum temperature (°C)
+    'exceedance_days',   # Days above the day-of-year percentile threshold
+    'heatwave_days',     # Days belonging to a qualifying heat wave
+    'heatwave_events',   # Number of heat waves starting in the season
+    'max_spell',         # Longest run of consecutive exceedance days
+    'n_days'             # Days of data in the season (for coverage checks)
+]
+
+# blake2b digest of each (site, season-year)'s dates and temperatures
+FINGERPRINT_DTYPE = np.dtype('S16')
+
+
+@dataclass
+class CubeConfig:
+    """Configuration for the yearly metrics cube."""
+    season_months: List[int] = field(default_factory=lambda: [9, 10, 11, 12, 1, 2])
+    baseline: Tuple[int, int] = field(default=(1981, 2010))
+    percentile: float = field(default=90.0)
+    min_spell: int = field(default=3)
+    cache_file: Path = field(default=CACHE_DIR / 'metrics_cube.npz')
+
+
+def season_year(dates: pd.Series, season_months: List[int]) -> np.ndarray:
+    """Label each date with the year its warm season starts in."""
+    months = dates.dt.month.to_numpy()
+    years = dates.dt.year.to_numpy()
+    first_month = season_months[0]
+    wraps = first_month > season_months[-1]
+    if wraps:
+        return np.where(months < first_month, years - 1, years)
+    return years
+
+
+class YearlyMetricsCube:
+    """Holds warm-season metrics as a dense (site, season-year, metric) array."""
+
+    def __init__(self, config: Optional[CubeConfig] = None):
+        """Initialize with configuration."""
+        self.config = config or CubeConfig()
+        self.config.cache_file = Path(self.config.cache_file)
+        self.sites: List[str] = []
+        self.years: np.ndarray = np.array([], dtype=np.int32)
+        self.values: np.ndarray = np.empty((0, 0, len(METRICS)), dtype=np.float32)
+        self.fingerprints: np.ndarray = np.empty((0, 0), dtype=FINGERPRINT_DTYPE)
+        self.thresholds: Dict[str, np.ndarray] = {}
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self) -> None:
+        """Write the cube to its cache file."""
+        self.config.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            self.config.cache_file,
+            sites=np.array(self.sites),
+            years=self.years,
+            values=self.values,
+            fingerprints=self.fingerprints,
+            threshold_sites=np.array(list(self.thresholds)),
+            thresholds=np.stack(list(self.thresholds.values())) if self.thresholds else np.empty((0, 366))
+        )
+
+    @classmethod
+    def load(cls, config: Optional[CubeConfig] = None) -> 'YearlyMetricsCube':
+        """Load a cube from its cache file, or return an empty cube."""
+        cube = cls(config)
+        if cube.config.cache_file.exists():
+            with np.load(cube.config.cache_file) as cached:
+                cube.sites = list(cached['sites'])
+                cube.years = cached['years']
+                cube.values = cached['values']
+                cube.fingerprints = cached['fingerprints']
+                if cube.fingerprints.dtype != FINGERPRINT_DTYPE:
+                    # Cubes saved with the old float fingerprints are recomputed on the next build
+                    cube.fingerprints = np.zeros(cube.fingerprints.shape, dtype=FINGERPRINT_DTYPE)
+                cube.thresholds = dict(zip(cached['threshold_sites'], cached['thresholds']))
+            logger.info(f"Loaded metrics cube: {len(cube.sites)} sites × {len(cube.years)} season-years")
+        return cube
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+    def _prepare(self, data: pd.DataFrame) -> pd.DataFrame:
+        df = data.copy()
+        df['date'] = pd.to_datetime(df['date'])
+        if 'temperature_celsius' not in df.columns and 'temperature' in df.columns:
+            df = df.rename(columns={'temperature': 'temperature_celsius'})
+        if 'site' not in df.columns:
+            df['site'] = 'Rahima_Moosa_Hospital'
+        df = df.dropna(subset=['temperature_celsius'])
+        df = df[df['date'].dt.month.isin(self.config.season_months)]
+        df = df.sort_values(['site', 'date']).reset_index(drop=True)
+        df['season_year'] = season_year(df['date'], self.config.season_months)
+        return df
+
+    def _compute_thresholds(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Day-of-year percentile thresholds per site from the baseline period."""
+        start, end = self.config.baseline
+        base = df[(df['date'].dt.year >= start) & (df['date'].dt.year <= end)]
+        if base.empty:
+            raise ValueError(f"No data in baseline period {start}-{end}")
+        doy = base['date'].dt.dayofyear
+        table = base.groupby(['site', doy])['temperature_celsius'].quantile(self.config.percentile / 100)
+        table = table.unstack().reindex(columns=range(1, 367))
+        # Day 366 only exists in leap years; fall back to the neighbouring day
+        table = table.ffill(axis=1).bfill(axis=1)
+        return {site: row.to_numpy(dtype=np.float32) for site, row in table.iterrows()}
+
+    def _compute_metrics(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Vectorized per-(site, season-year) metrics for a prepared frame."""
+        temps = df['temperature_celsius'].to_numpy(dtype=np.float32)
+        doy = df['date'].dt.dayofyear.to_numpy() - 1
+        site_codes, site_names = pd.factorize(df['site'])
+        table = np.stack([self.thresholds[s] for s in site_names]) if len(site_names) else np.empty((0, 366))
+        exceed = temps > table[site_codes, doy]
+
+        # A new run starts wherever the series is not a continuation of the previous day
+        days = (df['date'].values.astype('datetime64[D]').astype(np.int64))
+        group = df['site'].astype(str) + '|' + df['season_year'].astype(str)
+        group_codes = pd.factorize(group)[0]
+        contiguous = np.r_[False, (np.diff(days) == 1) & (np.diff(group_codes) == 0)]
+        starts = exceed & ~(contiguous & np.r_[False, exceed[:-1]])
+        run_id = np.cumsum(starts) - 1
+        run_len = np.bincount(run_id[exceed], minlength=int(starts.sum()))
+
+        day_run_len = np.zeros(len(df), dtype=np.int64)
+        day_run_len[exceed] = run_len[run_id[exceed]]
+        in_heatwave = day_run_len >= self.config.min_spell
+        event_start = starts & in_heatwave
+
+        frame = pd.DataFrame({
+            'site': df['site'].to_numpy(),
+            'season_year': df['season_year'].to_numpy(),
+            'temperature_celsius': temps,
+            'exceed': exceed,
+            'in_heatwave': in_heatwave,
+            'event_start': event_start,
+            'run_len': day_run_len
+        })
+        grouped = frame.groupby(['site', 'season_year'])
+        return pd.DataFrame({
+            'mean_tmax': grouped['temperature_celsius'].mean(),
+            'max_tmax': grouped['temperature_celsius'].max(),
+            'exceedance_days': grouped['exceed'].sum(),
+            'heatwave_days': grouped['in_heatwave'].sum(),
+            'heatwave_events': grouped['event_start'].sum(),
+            'max_spell': grouped['run_len'].max(),
+            'n_days': grouped['temperature_celsius'].size()
+        })[METRICS]
+
+    @staticmethod
+    def _fingerprint(df: pd.DataFrame) -> pd.Series:
+        """Exact content hash per (site, season-year) of its sorted dates and temperatures."""
+        days = df['date'].values.astype('datetime64[D]').astype(np.int64)
+        temps = df['temperature_celsius'].to_numpy(dtype=np.float64)
+        digests = {}
+        # _prepare sorts by site and date, so each group's rows are in date order
+        for key, rows in df.groupby(['site', 'season_year'], sort=True).indices.items():
+            digest = hashlib.blake2b(digest_size=FINGERPRINT_DTYPE.itemsize)
+            digest.update(days[rows].tobytes())
+            digest.update(temps[rows].tobytes())
+            digests[key] = digest.digest()
+        return pd.Series(digests, dtype=object)
+
+    def build(self, data: pd.DataFrame, incremental: bool = True) -> 'YearlyMetricsCube':
+        """(Re)build the cube from a daily frame with 'date', 'temperature_celsius' and optional 'site'.
+
+        With ``incremental=True`` only season-years whose data changed (for
+        example a newly arrived year) are recomputed. Thresholds are computed
+        from the baseline once per site and kept unless the site is new.
+        """
+        df = self._prepare(data)
+
+        new_sites = sorted(set(df['site']) - set(self.thresholds))
+        if new_sites or not incremental:
+            scope = df if not incremental else df[df['site'].isin(new_sites)]
+            self.thresholds.update(self._compute_thresholds(scope))
+
+        fingerprints = self._fingerprint(df)
+        sites = sorted(set(self.sites) | set(df['site']))
+        years = np.union1d(self.years, df['season_year'].unique()).astype(np.int32)
+
+        values = np.full((len(sites), len(years), len(METRICS)), np.nan, dtype=np.float32)
+        prints = np.zeros((len(sites), len(years)), dtype=FINGERPRINT_DTYPE)
+        if incremental and len(self.sites):
+            si = [sites.index(s) for s in self.sites]
+            yi = np.searchsorted(years, self.years)
+            values[np.ix_(si, yi)] = self.values
+            prints[np.ix_(si, yi)] = self.fingerprints
+
+        site_idx = np.array([sites.index(s) for s in fingerprints.index.get_level_values(0)])
+        year_idx = np.searchsorted(years, fingerprints.index.get_level_values(1).to_numpy())
+        current = fingerprints.to_numpy().astype(FINGERPRINT_DTYPE)
+        stale = prints[site_idx, year_idx] != current
+        if not incremental:
+            stale[:] = True
+
+        stale_keys = set(zip(fingerprints.index.get_level_values(0)[stale],
+                             fingerprints.index.get_level_values(1)[stale]))
+        if stale_keys:
+            mask = pd.Series(list(zip(df['site'], df['season_year']))).isin(stale_keys).to_numpy()
+            metrics = self._compute_metrics(df[mask].reset_index(drop=True))
+            m_site = np.array([sites.index(s) for s in metrics.index.get_level_values(0)])
+            m_year = np.searchsorted(years, metrics.index.get_level_values(1).to_numpy())
+            values[m_site, m_year] = metrics.to_numpy(dtype=np.float32)
+            prints[site_idx[stale], year_idx[stale]] = current[stale]
+
+        logger.info(f"Recomputed {len(stale_keys)} of {len(fingerprints)} site season-years")
+        self.sites, self.years, self.values, self.fingerprints = sites, years, values, prints
+        return self
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def slice(self, start_year: int, end_year: int, site: Optional[str] = None,
+              metric: Optional[str] = None) -> np.ndarray:
+        """Return the (site, year, metric) block for season-years ``start_year``..``end_year``."""
+        lo = int(np.searchsorted(self.years, start_year))
+        hi = int(np.searchsorted(self.years, end_year, side='right'))
+        block = self.values[:, lo:hi, :]
+        if site is not None:
+            block = block[self.sites.index(site)][None]
+        if metric is not None:
+            block = block[..., METRICS.index(metric)]
+        return block
+
+    def period_summary(self, start_year: int, end_year: int, reduce: str = 'mean') -> pd.DataFrame:
+        """Per-site metrics reduced over a period (per-season mean by default)."""
+        block = self.slice(start_year, end_year)
+        reducer = {'mean': np.nanmean, 'sum': np.nansum, 'max': np.nanmax}[reduce]
+        return pd.DataFrame(reducer(block, axis=1), index=self.sites, columns=METRICS)
+
+    def compare(self, periods: Dict[str, Tuple[int, int]], site: Optional[str] = None,
+                reduce: str = 'mean') -> pd.DataFrame:
+        """Compare named periods, e.g. {'Historical': (1980, 1989), 'Current': (2015, 2024)}."""
+        rows = {}
+        for label, (start, end) in periods.items():
+            summary = self.period_summary(start, end, reduce)
+            rows[label] = summary.loc[site] if site is not None else summary.mean()
+        return pd.DataFrame(rows).T
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long-form (site, season_year) frame of all metrics."""
+        index = pd.MultiIndex.from_product([self.sites, self.years], names=['site', 'season_year'])
+        return pd.DataFrame(self.values.reshape(-1, len(METRICS)), index=index, columns=METRICS)
+
+
+def main():
+    """Example usage of the metrics cube."""
+    from data_retrieval import ERA5DataRetriever
+
+    era5 = ERA5DataRetriever({'name': 'Rahima_Moosa_Hospital'}).get_data_for_period(1980, 2024)
+
+    cube = YearlyMetricsCube.load()
+    cube.build(era5)
+    cube.save()
+
+    comparison = cube.compare({
+        'Historical (1980-1989)': (1980, 1989),
+        'Current (2015-2024)': (2015, 2024),
+        'Baseline (1981-2010)': (1981, 2010),
+        'Recent (2011-2019)': (2011, 2019)
+    })
+    print(comparison.round(1))
+
+
+if __name__ == "__main__":
+    main()
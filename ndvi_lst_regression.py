@@ -0,0 +1,151 @@
+"""
+Per-Pixel NDVI-LST Regression
+----------------------------
+Fits LST ~ NDVI by ordinary least squares at every pixel across the scene
+stack (lst_stack), giving slope (°C per NDVI unit), intercept and r² maps
+of how strongly vegetation cools each part of the city.
+
+- Closed-form OLS from the running sums n, Σx, Σy, Σx², Σxy and Σy² of
+  the scenes where both bands are clear, vectorized over a (scene x pixel)
+  chunk at a time, so the stack is streamed from its memory maps.
+- Pixels with fewer than ``min_scenes`` clear pairs, or no NDVI variance,
+  are no-data.
+- The result is a 4-band (slope, intercept, r2, n) Cloud-Optimized GeoTIFF
+  in the stack's Web Mercator grid, which lst_tiles can render to XYZ tiles.
+
+Usage:
+    python ndvi_lst_regression.py            # Writes ndvi_lst_regression.tif
+    python ndvi_lst_regression.py --tiles    # ... and slope / r2 tile pyramids
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import argparse
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from lst_cache import write_cog
+from lst_stack import LSTSceneStack, StackKey
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+OUTPUT_BANDS = ['slope', 'intercept', 'r2', 'n']
+
+# Colour ramps for tiling the slope and r² bands
+SLOPE_VIS_PARAMS = {'min': -30, 'max': 0, 'palette': ['#1a9850', '#fee08b', '#d73027']}
+R2_VIS_PARAMS = {'min': 0, 'max': 0.8, 'palette': ['#f7fbff', '#6baed6', '#08306b']}
+
+
+@dataclass
+class RegressionConfig:
+    """Configuration for the per-pixel regression."""
+    min_scenes: int = field(default=10)
+    chunk_mb: float = field(default=64.0)
+    output: Path = field(default=Path('ndvi_lst_regression.tif'))
+
+
+def ols_sums(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """(6, pixels) sums n, Σx, Σy, Σx², Σxy, Σy² over the scenes where both x and y are finite."""
+    valid = np.isfinite(x) & np.isfinite(y)
+    x = np.where(valid, x, 0).astype(np.float64)
+    y = np.where(valid, y, 0).astype(np.float64)
+    return np.stack([valid.sum(axis=0), x.sum(axis=0), y.sum(axis=0),
+                     (x * x).sum(axis=0), (x * y).sum(axis=0), (y * y).sum(axis=0)])
+
+
+def ols_from_sums(sums: np.ndarray, min_n: int = 3) -> np.ndarray:
+    """(4, pixels) slope, intercept, r² and n of y ~ x from ``ols_sums``; NaN where unfit."""
+    n, sx, sy, sxx, sxy, syy = sums
+    sxx_c = n * sxx - sx * sx   # n² var(x)
+    syy_c = n * syy - sy * sy
+    sxy_c = n * sxy - sx * sy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fit = (n >= min_n) & (sxx_c > 0)
+        slope = np.where(fit, sxy_c / sxx_c, np.nan)
+        intercept = np.where(fit, (sy - slope * sx) / n, np.nan)
+        r2 = np.where(fit & (syy_c > 0), sxy_c * sxy_c / (sxx_c * syy_c), np.nan)
+    return np.stack([slope, intercept, r2, n]).astype(np.float32)
+
+
+class NDVILSTRegression:
+    """Per-pixel LST ~ NDVI least squares over a scene stack with LST and NDVI bands."""
+
+    def __init__(self, stack: LSTSceneStack, config: Optional[RegressionConfig] = None):
+        """Initialize with a built scene stack and configuration."""
+        if not {'LST', 'NDVI'} <= set(stack.key.bands):
+            raise ValueError(f"Stack {stack.key.slug} needs both LST and NDVI bands")
+        self.stack = stack
+        self.config = config or RegressionConfig()
+
+    def fit(self) -> np.ndarray:
+        """(4, rows, cols) slope, intercept, r², n."""
+        start = time.perf_counter()
+        scenes, rows, cols = self.stack.shape
+        result = np.empty((len(OUTPUT_BANDS), rows * cols), dtype=np.float32)
+        # Both bands are walked over the same pixel windows
+        chunks = zip(self.stack.pixel_chunks('NDVI', self.config.chunk_mb / 2),
+                     self.stack.pixel_chunks('LST', self.config.chunk_mb / 2))
+        for (window, ndvi), (_, lst) in chunks:
+            result[:, window] = ols_from_sums(ols_sums(ndvi, lst), self.config.min_scenes)
+        logger.info(f"Fitted {rows * cols} pixels over {scenes} scenes in {time.perf_counter() - start:.1f}s")
+        return result.reshape(len(OUTPUT_BANDS), rows, cols)
+
+    def write(self, result: Optional[np.ndarray] = None) -> Path:
+        """Write the fit as a COG in the stack grid."""
+        from rasterio.transform import Affine
+
+        result = self.fit() if result is None else result
+        _, rows, cols = result.shape
+        profile = {'crs': self.stack.crs, 'transform': Affine(*self.stack.transform),
+                   'width': cols, 'height': rows}
+        path = write_cog(self.config.output, result, profile, OUTPUT_BANDS)
+        logger.info(f"Wrote {path}")
+        return path
+
+    @staticmethod
+    def summary(result: np.ndarray) -> Dict[str, float]:
+        slope, _, r2, n = result
+        fitted = np.isfinite(slope)
+        return {
+            'fitted_pixels': int(fitted.sum()),
+            'median_slope': float(np.nanmedian(slope)) if fitted.any() else float('nan'),
+            'median_r2': float(np.nanmedian(r2)) if fitted.any() else float('nan'),
+            'median_scenes': float(np.median(n[fitted])) if fitted.any() else float('nan')
+        }
+
+
+def main():
+    """Fit the regression over the Sep-Feb scene stack and optionally tile slope and r²."""
+    parser = argparse.ArgumentParser(description='Per-pixel LST ~ NDVI regression over the Landsat scene stack.')
+    parser.add_argument('--years', nargs=2, type=int, default=[1984, 2024], metavar=('START', 'END'))
+    parser.add_argument('--tiles', action='store_true', help='Render slope and r2 tile pyramids')
+    args = parser.parse_args()
+
+    stack = LSTSceneStack(StackKey(args.years[0], args.years[1], bands=('LST', 'NDVI'))).build()
+    model = NDVILSTRegression(stack)
+    result = model.fit()
+    path = model.write(result)
+    print(model.summary(result))
+
+    if args.tiles:
+        from lst_tiles import TileConfig, TilePyramidGenerator
+
+        generator = TilePyramidGenerator(TileConfig(max_zoom=14))
+        generator.generate_raster(path, SLOPE_VIS_PARAMS, 'ndvi_lst_slope', OUTPUT_BANDS.index('slope') + 1)
+        generator.generate_raster(path, R2_VIS_PARAMS, 'ndvi_lst_r2', OUTPUT_BANDS.index('r2') + 1)
+
+
+if __name__ == "__main__":
+    main()
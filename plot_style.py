@@ -0,0 +1,234 @@
+"""
+Shared Plotting Style
+--------------------
+Lazy, headless-friendly plotting setup shared by the figure scripts.
+
+- matplotlib, seaborn and plotly are only imported when a figure is built
+  (``pyplot()``, ``seaborn()``, ``plotly()`` or entering a theme), so
+  importing this module costs almost nothing.
+- The Agg backend is forced before pyplot is first imported.
+- The font family (Arial where installed, otherwise the closest available
+  sans-serif) is resolved once and remembered in ``data_cache``, so render
+  nodes without Arial skip matplotlib's font fallback search.
+- The FT and publication themes are context managers over ``rc_context``;
+  legacy style names such as 'seaborn' are mapped to the names recent
+  matplotlib provides.
+
+Usage:
+    from plot_style import ft_theme
+
+    with ft_theme() as plt:
+        fig, ax = plt.subplots()
+        ...
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import json
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Same location as data_retrieval.CACHE_DIR; not imported from there to keep
+# this module free of the Earth Engine imports
+CACHE_DIR = Path('./data_cache')
+FONT_CACHE_FILE = CACHE_DIR / 'plot_font.json'
+
+PREFERRED_FONTS = ['Arial', 'Helvetica', 'Liberation Sans', 'Nimbus Sans', 'DejaVu Sans']
+
+# Style names removed in matplotlib 3.6 and their replacements
+LEGACY_STYLES = {
+    'seaborn': 'seaborn-v0_8',
+    'seaborn-whitegrid': 'seaborn-v0_8-whitegrid',
+    'seaborn-paper': 'seaborn-v0_8-paper',
+    'seaborn-white': 'seaborn-v0_8-white',
+    'seaborn-darkgrid': 'seaborn-v0_8-darkgrid'
+}
+
+# rcParams of the FT-style figures (figure_specs/seasonal_comparison.json)
+FT_THEME = {
+    'axes.labelcolor': '#333333',
+    'text.color': '#333333',
+    'xtick.color': '#666666',
+    'ytick.color': '#666666',
+    'grid.color': '#E6E6E6',
+    'grid.linestyle': '-',
+    'grid.alpha': 0.5,
+    'axes.facecolor': 'white',
+    'figure.facecolor': 'white',
+    'axes.grid': True
+}
+
+# rcParams of the publication figures (seasonal_analysis*)
+PUBLICATION_THEME = {
+    'font.size': 10,
+    'axes.labelsize': 11,
+    'axes.titlesize': 12,
+    'figure.titlesize': 12,
+    'figure.dpi': 300
+}
+
+THEMES = {
+    'ft': (None, FT_THEME),
+    'publication': ('seaborn', PUBLICATION_THEME)
+}
+
+_resolved_fonts: Dict[Tuple[str, ...], str] = {}
+
+
+def use_agg() -> None:
+    """Force the non-interactive Agg backend (before or after matplotlib is imported)."""
+    os.environ['MPLBACKEND'] = 'Agg'
+    if 'matplotlib' in sys.modules:
+        sys.modules['matplotlib'].use('Agg')
+
+
+def pyplot():
+    """Import pyplot on first use with the Agg backend."""
+    use_agg()
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def seaborn():
+    """Import seaborn on first use."""
+    use_agg()
+    import seaborn as sns
+    return sns
+
+
+def plotly():
+    """Import plotly.graph_objects on first use."""
+    import plotly.graph_objects as go
+    return go
+
+
+def _font_cache_key(preferred: Sequence[str]) -> str:
+    import matplotlib
+    return f"{matplotlib.__version__}|{','.join(preferred)}"
+
+
+def resolve_font(preferred: Sequence[str] = PREFERRED_FONTS) -> str:
+    """First installed family from ``preferred``; resolved once per machine.
+
+    The answer is kept in memory and in ``data_cache/plot_font.json`` keyed
+    by matplotlib version and the preference list.
+    """
+    preferred = tuple(preferred)
+    if preferred in _resolved_fonts:
+        return _resolved_fonts[preferred]
+
+    key = _font_cache_key(preferred)
+    family = None
+    if FONT_CACHE_FILE.exists():
+        try:
+            cached = json.loads(FONT_CACHE_FILE.read_text())
+            if cached.get('key') == key:
+                family = cached['family']
+        except (ValueError, KeyError):
+            pass
+
+    if family is None:
+        family = _find_installed(preferred)
+        try:
+            FONT_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            FONT_CACHE_FILE.write_text(json.dumps({'key': key, 'family': family}))
+        except OSError:
+            pass
+
+    _resolved_fonts[preferred] = family
+    return family
+
+
+def _find_installed(preferred: Sequence[str]) -> str:
+    from matplotlib import font_manager
+
+    for name in preferred:
+        try:
+            font_manager.findfont(font_manager.FontProperties(family=name),
+                                  fallback_to_default=False, rebuild_if_missing=False)
+        except ValueError:
+            continue
+        if name != preferred[0]:
+            logger.info(f"Font '{preferred[0]}' is not installed; using '{name}'")
+        return name
+    return 'DejaVu Sans'  # Bundled with matplotlib
+
+
+def style_name(name: str) -> str:
+    """Map legacy style names (e.g. 'seaborn') to ones recent matplotlib provides."""
+    import matplotlib.style
+    if name in matplotlib.style.available or name == 'default':
+        return name
+    return LEGACY_STYLES.get(name, name)
+
+
+def theme_rc(name: str, overrides: Optional[Dict] = None) -> Dict:
+    """rcParams for a named theme, including the resolved font family."""
+    if name not in THEMES:
+        raise ValueError(f"Unknown theme: {name}")
+    rc = {'font.family': resolve_font()}
+    rc.update(THEMES[name][1])
+    rc.update(overrides or {})
+    return rc
+
+
+@contextmanager
+def theme(name: str, overrides: Optional[Dict] = None) -> Iterator:
+    """Apply a named theme for the duration of the block; yields pyplot."""
+    plt = pyplot()
+    base_style = THEMES.get(name, (None, None))[0]
+    styles = [style_name(base_style)] if base_style else []
+    with plt.style.context(styles), plt.rc_context(theme_rc(name, overrides)):
+        yield plt
+
+
+def ft_theme(overrides: Optional[Dict] = None):
+    """FT theme context manager (white background, grey text and light grid)."""
+    return theme('ft', overrides)
+
+
+def publication_theme(overrides: Optional[Dict] = None):
+    """Publication theme context manager (seaborn base style, 300 dpi)."""
+    return theme('publication', overrides)
+
+
+def apply_theme(name: str, overrides: Optional[Dict] = None):
+    """Apply a named theme globally, for top-level scripts; returns pyplot."""
+    plt = pyplot()
+    base_style = THEMES.get(name, (None, None))[0]
+    if base_style:
+        plt.style.use(style_name(base_style))
+    plt.rcParams.update(theme_rc(name, overrides))
+    return plt
+
+
+def main():
+    """Report import and theme timings."""
+    import time
+
+    start = time.perf_counter()
+    with ft_theme() as plt:
+        fig, ax = plt.subplots(figsize=(4, 3))
+        ax.plot([0, 1], [0, 1])
+        fig.canvas.draw()
+        plt.close(fig)
+    print(f"Backend: {sys.modules['matplotlib'].get_backend()}, font: {resolve_font()}")
+    print(f"First themed figure: {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"seaborn imported: {'seaborn' in sys.modules}, plotly imported: {'plotly' in sys.modules}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,17 +13,15 @@ import calendar
 import sys
 import pickle
 import os
-import imageio.v2 as imageio
+from functools import partial
+from animation_writer import render_animation
+from density_animation import DensityAnimator, DensityAnimationConfig, DensityPeriod
+from kde_engine import kdeplot
+from plot_style import apply_theme
 
 # Set publication-ready style
-plt.style.use('seaborn')
+apply_theme('publication')
 sns.set_palette("husl")
-plt.rcParams['font.family'] = 'Arial'
-plt.rcParams['font.size'] = 10
-plt.rcParams['axes.labelsize'] = 11
-plt.rcParams['axes.titlesize'] = 12
-plt.rcParams['figure.titlesize'] = 12
-plt.rcParams['figure.dpi'] = 300
 
 # Initialize Earth Engine with authentication
 try:
@@ -152,6 +150,43 @@ def get_data_for_period(start_year, end_year, aoi, dataset='ERA5', scenario=None
         return final_df
     return None
 
+def get_bias_corrected_projection(start_year, end_year, scenario='ssp585'):
+    """Get quantile-delta-mapped CMIP6 Tmax as monthly maxima, comparable to the ERA5 series.
+    
+    Monthly maxima are taken per model and then pooled (one row per model and
+    month, with a 'model' column): averaging the models day by day first would
+    damp the daily extremes and bias the maxima low.
+    
+    The QDM fit uses the local ERA5 extract (data/era5/era5_1980_2024.csv),
+    which only covers Sep-Feb, so corrected Mar-Aug days are NaN and those
+    months are dropped.
+    """
+    from cmip6_ensemble import CMIP6EnsembleStore, EnsembleConfig
+    from bias_correction import correct_ensemble
+    from data_retrieval import ERA5DataRetriever
+    
+    store = CMIP6EnsembleStore(EnsembleConfig(scenarios=['historical', scenario]))
+    store.add_members()
+    
+    era5 = ERA5DataRetriever({'name': 'Rahima_Moosa_Hospital'}).get_data_for_period(1980, 2024)
+    corrected = correct_ensemble(store, era5, scenario, start_year=start_year, end_year=end_year)
+    
+    lo, hi = store._day_bounds(start_year, end_year)
+    dates = pd.to_datetime(store.days[lo:hi], unit='D')
+    n_models = corrected.shape[0]
+    daily = pd.DataFrame({
+        'model': np.repeat(store.config.models, len(dates)),
+        'year': np.tile(dates.year, n_models),
+        'month': np.tile(dates.month, n_models),
+        'temperature': corrected[:, 0, :].ravel()  # Every model at the hospital
+    })
+    
+    df = daily.groupby(['model', 'year', 'month'])['temperature'].max().dropna().reset_index()
+    print(f"\nBias-corrected CMIP6 {scenario} data summary ({n_models} models pooled):")
+    print(f"Max temperature: {df['temperature'].max():.1f}°C")
+    print(f"Temperature range: {df['temperature'].min():.1f}°C to {df['temperature'].max():.1f}°C")
+    return df
+
 def load_cached_data(cache_file):
     """Load data from cache if available."""
     if os.path.exists(cache_file):
@@ -167,7 +202,14 @@ def save_to_cache(data, cache_file):
         pickle.dump(data, f)
 
 def create_frame(historical_dfs, current_df, projection_dfs, spring_summer_months, frame_number, temp_folder):
-    """Create a single frame for the animation."""
+    """Create a single frame for the animation and save it to ``temp_folder``."""
+    render_frame(historical_dfs, current_df, projection_dfs, spring_summer_months, frame_number)
+    plt.savefig(os.path.join(temp_folder, f'frame_{frame_number}.png'), 
+                dpi=300, bbox_inches='tight')
+    plt.close()
+
+def render_frame(historical_dfs, current_df, projection_dfs, spring_summer_months, frame_number):
+    """Build a single animation frame and return the figure."""
     plt.style.use('default')
     fig, ax = plt.subplots(figsize=(12, 8))
     
@@ -207,14 +249,14 @@ def create_frame(historical_dfs, current_df, projection_dfs, spring_summer_month
     
     # Progressive plotting based on frame number
     if frame_number >= 1:
-        sns.kdeplot(y=historical_seasonal['temperature'], ax=ax, color=historical_color,
-                    label=f'Historical (1980-1989) (Mean: {historical_mean:.1f}°C)',
-                    fill=True, alpha=0.3)
+        kdeplot(ax, historical_seasonal['temperature'], vertical=True, color=historical_color,
+                label=f'Historical (1980-1989) (Mean: {historical_mean:.1f}°C)',
+                fill=True, alpha=0.3)
     
     if frame_number >= 2:
-        sns.kdeplot(y=current_seasonal['temperature'], ax=ax, color=current_color,
-                    label=f'Current (2015-2024) (Mean: {current_mean:.1f}°C)',
-                    fill=True, alpha=0.3)
+        kdeplot(ax, current_seasonal['temperature'], vertical=True, color=current_color,
+                label=f'Current (2015-2024) (Mean: {current_mean:.1f}°C)',
+                fill=True, alpha=0.3)
         # Add first temperature change annotation
         temp_change_current = current_mean - historical_mean
         x_pos = ax.get_xlim()[1] * 0.85
@@ -223,9 +265,9 @@ def create_frame(historical_dfs, current_df, projection_dfs, spring_summer_month
                 color=current_color, ha='left', va='center', fontweight='bold')
     
     if frame_number >= 3:
-        sns.kdeplot(y=projected_seasonal['temperature'], ax=ax, color=projected_color,
-                    label=f'Projected (2045-2055) (Mean: {projected_mean:.1f}°C)',
-                    fill=True, alpha=0.3)
+        kdeplot(ax, projected_seasonal['temperature'], vertical=True, color=projected_color,
+                label=f'Projected (2045-2055) (Mean: {projected_mean:.1f}°C)',
+                fill=True, alpha=0.3)
         # Add second temperature change annotation
         temp_change_projected = projected_mean - current_mean
         y_pos_projected = (current_mean + projected_mean) / 2
@@ -246,10 +288,7 @@ def create_frame(historical_dfs, current_df, projection_dfs, spring_summer_month
     labels = ['Projected', 'Current', 'Historical']
     ax.legend(handles, labels, loc='upper left')
     
-    # Save frame
-    plt.savefig(os.path.join(temp_folder, f'frame_{frame_number}.png'), 
-                dpi=300, bbox_inches='tight')
-    plt.close()
+    return fig
 
 def create_time_series_plot(historical_dfs, current_df, projection_dfs):
     """
@@ -366,41 +405,55 @@ def create_time_series_plot(historical_dfs, current_df, projection_dfs):
     plt.savefig('temperature_trends.png', dpi=300, bbox_inches='tight', pad_inches=0.2)
     plt.close()
 
-def create_animated_visualization(historical_dfs, current_df, projection_dfs):
-    """Create an animated visualization showing progressive warming."""
-    print("\nCreating animated visualization...")
+def seasonal_temperatures(dfs, months):
+    """Concatenate the temperatures for the given months from a frame or dict of frames."""
+    if isinstance(dfs, dict):
+        dfs = pd.concat(list(dfs.values()))
+    return dfs.loc[dfs['month'].isin(months), 'temperature'].to_numpy(dtype=float)
+
+def create_animated_visualization(historical_dfs, current_df, projection_dfs, mode='parallel'):
+    """Create an animated visualization showing progressive warming.
     
-    # Create temporary folder for frames
-    temp_folder = 'temp_frames'
-    os.makedirs(temp_folder, exist_ok=True)
+    mode='parallel' renders each frame as a new figure in worker processes;
+    mode='reuse' builds the figure once and only updates artist data per frame.
+    """
+    print("\nCreating animated visualization...")
     
-    # Create frames
+    # Much longer durations: 8 seconds per transition, 12 seconds for final
+    durations = [8.0, 8.0, 8.0, 12.0]
     spring_summer_months = [9, 10, 11, 12, 1, 2]
-    for frame in range(1, 5):  # 4 frames: empty, historical, current, projected
-        create_frame(historical_dfs, current_df, projection_dfs, 
-                    spring_summer_months, frame, temp_folder)
-    
-    # Create GIF
-    frames = []
-    for frame in range(1, 5):
-        frame_path = os.path.join(temp_folder, f'frame_{frame}.png')
-        frames.append(imageio.imread(frame_path))
-    
-    # Save with much longer durations for each frame
-    durations = [8.0, 8.0, 8.0, 12.0]  # Much longer durations: 8 seconds per transition, 12 seconds for final
-    imageio.mimsave('temperature_analysis.gif', frames, duration=durations, loop=0)
     
-    # Clean up temporary files
-    for frame in range(1, 5):
-        os.remove(os.path.join(temp_folder, f'frame_{frame}.png'))
-    os.rmdir(temp_folder)
+    if mode == 'reuse':
+        periods = [
+            DensityPeriod('Historical (1980-1989)',
+                          seasonal_temperatures(historical_dfs, spring_summer_months), '#4575B4'),
+            DensityPeriod('Current (2015-2024)',
+                          seasonal_temperatures(current_df, spring_summer_months), '#FF6B35'),
+            DensityPeriod('Projected (2045-2055)',
+                          seasonal_temperatures(projection_dfs, spring_summer_months), '#D73027')
+        ]
+        animator = DensityAnimator(periods, DensityAnimationConfig(
+            subtitle='Historical (1980-1989) vs Current (2015-2024) vs Projected (2045-2055)',
+            temp_range=(25, 40),
+            dpi=300
+        ))
+        animator.render_progressive('temperature_analysis.gif', durations)
+        animator.close()
+        print("Animation complete! Check 'temperature_analysis.gif' for results.")
+        return
+    
+    # Frames are rendered in worker processes and encoded from the canvas
+    # buffer, so no intermediate PNGs are written
+    frame_fn = partial(render_frame, historical_dfs, current_df, projection_dfs, spring_summer_months)
+    render_animation(frame_fn, range(1, 5), 'temperature_analysis.gif', dpi=300, tight=True,
+                     durations=durations, loop=0)
     
     print("Animation complete! Check 'temperature_analysis.gif' for results.")
 
 if __name__ == "__main__":
     print("=== Analyzing Johannesburg Temperature Data ===")
     
-    cache_file = 'temperature_data_cache.pkl'
+    cache_file = 'temperature_data_cache_qdm.pkl' if '--bias-corrected' in sys.argv else 'temperature_data_cache.pkl'
     cached_data = load_cached_data(cache_file)
     
     if cached_data is None:
@@ -416,7 +469,10 @@ if __name__ == "__main__":
         
         print("\nFetching Future Projections...")
         projection_dfs = {}
-        projection_data = get_data_for_period(2045, 2055, JOBURG_AREA, dataset='CMIP6', scenario='ssp585')
+        if '--bias-corrected' in sys.argv:
+            projection_data = get_bias_corrected_projection(2045, 2055, scenario='ssp585')
+        else:
+            projection_data = get_data_for_period(2045, 2055, JOBURG_AREA, dataset='CMIP6', scenario='ssp585')
         if projection_data is not None:
             projection_dfs['2045-2055'] = projection_data
         
@@ -433,7 +489,8 @@ if __name__ == "__main__":
         projection_dfs = cached_data['projected']
 
     # Create the animated visualization
-    create_animated_visualization(historical_dfs, current_df, projection_dfs)
+    mode = 'reuse' if '--reuse-artists' in sys.argv else 'parallel'
+    create_animated_visualization(historical_dfs, current_df, projection_dfs, mode=mode)
     
     # Create the new time series plot
     create_time_series_plot(historical_dfs, current_df, projection_dfs)
@@ -1,8 +1,11 @@
+import argparse
 import http.server
 import socketserver
 import webbrowser
 import os
 
+from static_server import StaticServer, StaticServerConfig
+
 # Configure the server
 PORT = 8004
 DIRECTORY = os.path.dirname(os.path.abspath(__file__))
@@ -11,20 +14,41 @@ class Handler(http.server.SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=DIRECTORY, **kwargs)
 
-def serve_maps():
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
-        print("\nPeak Summer LST Maps are now available at:")
-        print(f"Early Period (1980-1995): http://localhost:{PORT}/lst_map_1980_1995.html")
-        print(f"Mid Period (1995-2010): http://localhost:{PORT}/lst_map_1995_2010.html")
-        print(f"Recent Period (2010-2023): http://localhost:{PORT}/lst_map_2010_2023.html")
+def print_urls(port):
+    print("\nPeak Summer LST Maps are now available at:")
+    print(f"Early Period (1980-1995): http://localhost:{port}/lst_map_1980_1995.html")
+    print(f"Mid Period (1995-2010): http://localhost:{port}/lst_map_1995_2010.html")
+    print(f"Recent Period (2010-2023): http://localhost:{port}/lst_map_2010_2023.html")
+
+def serve_maps(port=PORT):
+    with socketserver.TCPServer(("", port), Handler) as httpd:
+        print_urls(port)
         
         # Open all maps in browser
-        webbrowser.open(f"http://localhost:{PORT}/lst_map_1980_1995.html")
-        webbrowser.open(f"http://localhost:{PORT}/lst_map_1995_2010.html")
-        webbrowser.open(f"http://localhost:{PORT}/lst_map_2010_2023.html")
+        webbrowser.open(f"http://localhost:{port}/lst_map_1980_1995.html")
+        webbrowser.open(f"http://localhost:{port}/lst_map_1995_2010.html")
+        webbrowser.open(f"http://localhost:{port}/lst_map_2010_2023.html")
         
         print("\nPress Ctrl+C to stop the server")
         httpd.serve_forever()
 
+def serve_production(port=PORT):
+    """Threaded server with precompression, ETags, range requests and /tiles/."""
+    server = StaticServer(StaticServerConfig(directory=DIRECTORY, port=port))
+    print_urls(port)
+    print(f"Site index: http://localhost:{port}/index.html")
+    print(f"Tiles: http://localhost:{port}/tiles/<layer>/{{z}}/{{x}}/{{y}}.png")
+    print("\nPress Ctrl+C to stop the server")
+    server.serve_forever()
+
 if __name__ == "__main__":
-    serve_maps()
+    parser = argparse.ArgumentParser(description='Serve the LST maps and figures.')
+    parser.add_argument('--production', action='store_true',
+                        help='Threaded server with compression, caching headers and tiles')
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+    
+    if args.production:
+        serve_production(args.port)
+    else:
+        serve_maps(args.port)
@@ -0,0 +1,56 @@
+"""Quantile delta mapping with missing projection days."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip('ee')
+pytest.importorskip('geemap')
+
+from bias_correction import QDMConfig, QuantileDeltaMapper  # noqa: E402
+
+
+def _days(start: str, end: str) -> np.ndarray:
+    dates = np.arange(np.datetime64(start), np.datetime64(end))
+    return (dates - np.datetime64('1970-01-01')).astype(np.int32)
+
+
+def test_apply_keeps_nan_projection_days(tmp_path):
+    rng = np.random.default_rng(0)
+    base_days = _days('1981-01-01', '1991-01-01')
+    proj_days = _days('2045-01-01', '2049-01-01')
+
+    obs = rng.normal(25, 4, (2, base_days.size)).astype(np.float32)
+    hist = rng.normal(23, 4, (3, 2, base_days.size)).astype(np.float32)
+    proj = rng.normal(26, 4, (3, 2, proj_days.size)).astype(np.float32)
+
+    # Noleap model without Feb 29, and a site with a run of missing days
+    leap_day = int(np.flatnonzero(proj_days == _days('2048-02-29', '2048-03-01')[0])[0])
+    proj[0, :, leap_day] = np.nan
+    proj[1, 1, 100:130] = np.nan
+
+    mapper = QuantileDeltaMapper(QDMConfig(n_quantiles=20, cache_dir=tmp_path))
+    corrected = mapper.fit(obs, base_days, hist, base_days).apply(proj, proj_days)
+
+    assert corrected.shape == proj.shape
+    np.testing.assert_array_equal(np.isnan(corrected), np.isnan(proj))
+    # Additive QDM shifts the projection by roughly obs - hist (+2 °C)
+    shift = np.nanmean(corrected) - np.nanmean(proj)
+    assert 1.0 < shift < 3.0
+
+
+def test_same_label_with_new_projection_is_not_stale(tmp_path):
+    rng = np.random.default_rng(1)
+    base_days = _days('1981-01-01', '1991-01-01')
+    proj_days = _days('2045-01-01', '2049-01-01')
+    obs = rng.normal(25, 4, (1, base_days.size)).astype(np.float32)
+    hist = rng.normal(23, 4, (2, 1, base_days.size)).astype(np.float32)
+    first = rng.normal(26, 4, (2, 1, proj_days.size)).astype(np.float32)
+    second = first + 3.0
+
+    config = QDMConfig(n_quantiles=20, cache_dir=tmp_path)
+    mapper = QuantileDeltaMapper(config).fit(obs, base_days, hist, base_days)
+    mapper.apply(first, proj_days, label='ssp585_2045_2048')
+    reused = mapper.apply(second, proj_days, label='ssp585_2045_2048')
+
+    fresh = QuantileDeltaMapper(config).fit(obs, base_days, hist, base_days).apply(second, proj_days)
+    np.testing.assert_array_equal(reused, fresh)
@@ -0,0 +1,37 @@
+"""Font subset cache in the multi-format export."""
+
+import pytest
+
+pytest.importorskip('fontTools')
+matplotlib = pytest.importorskip('matplotlib')
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+import figure_export  # noqa: E402
+
+
+def _pdf_bytes(path) -> bytes:
+    fig, ax = plt.subplots()
+    ax.plot([1, 2, 3])
+    ax.set_ylabel('Maximum Temperature (°C)')
+    with plt.rc_context({'pdf.fonttype': 42}):
+        fig.savefig(path, metadata={'CreationDate': None})
+    plt.close(fig)
+    return path.read_bytes()
+
+
+def test_cached_subsets_give_identical_pdfs(tmp_path, monkeypatch):
+    from fontTools import subset
+
+    monkeypatch.setattr(subset, 'Subsetter', subset.Subsetter)
+    monkeypatch.setattr(figure_export, '_SUBSET_CACHE', {})
+    plain = _pdf_bytes(tmp_path / 'plain.pdf')
+
+    assert figure_export.enable_font_subset_cache()
+    first = _pdf_bytes(tmp_path / 'first.pdf')
+    assert len(figure_export._SUBSET_CACHE) == 1
+    repeat = _pdf_bytes(tmp_path / 'repeat.pdf')
+
+    assert first == plain
+    assert repeat == plain
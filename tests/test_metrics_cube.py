@@ -0,0 +1,46 @@
+"""Incremental metrics cube rebuilds after data corrections."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('ee')
+pytest.importorskip('geemap')
+
+from metrics_cube import CubeConfig, YearlyMetricsCube  # noqa: E402
+
+
+def _daily(seed: int = 0) -> pd.DataFrame:
+    dates = pd.date_range('1981-01-01', '2020-12-31')
+    rng = np.random.default_rng(seed)
+    seasonal = 27 + 4 * np.cos(2 * np.pi * (dates.dayofyear.to_numpy() - 15) / 365.25)
+    return pd.DataFrame({'date': dates, 'temperature_celsius': seasonal + rng.normal(0, 2, len(dates))})
+
+
+@pytest.mark.parametrize('edit', ['sum_preserving', 'tiny'])
+def test_incremental_build_matches_full_rebuild(tmp_path, edit):
+    df = _daily()
+    corrected = df.copy()
+    day = corrected.index[corrected['date'] == '2015-01-10'][0]
+    if edit == 'sum_preserving':
+        corrected.loc[day, 'temperature_celsius'] += 12.0
+        corrected.loc[day + 1, 'temperature_celsius'] -= 12.0
+    else:
+        corrected.loc[day, 'temperature_celsius'] += 0.05
+
+    config = CubeConfig(cache_file=tmp_path / 'cube.npz')
+    incremental = YearlyMetricsCube(config).build(df).build(corrected)
+    full = YearlyMetricsCube(CubeConfig(cache_file=tmp_path / 'full.npz')).build(corrected, incremental=False)
+
+    np.testing.assert_array_equal(incremental.years, full.years)
+    np.testing.assert_array_equal(incremental.values, full.values)
+
+
+def test_unchanged_data_is_not_recomputed(tmp_path):
+    df = _daily()
+    cube = YearlyMetricsCube(CubeConfig(cache_file=tmp_path / 'cube.npz')).build(df)
+    cube.save()
+    reloaded = YearlyMetricsCube.load(cube.config)
+    reloaded.values[:] = -1  # Any recomputed season would overwrite this
+    reloaded.build(df)
+    assert (reloaded.values == -1).all()
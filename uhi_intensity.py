@@ -0,0 +1,195 @@
+"""
+Urban Heat Island Intensity
+--------------------------
+Surface UHI intensity around Rahima Moosa Hospital from the per-scene LST
+stack (lst_stack): the masked mean LST of an urban core disc minus that of
+one or more rural reference rings, per scene, per period, and as a trend.
+
+- Every region (core and all reference rings) is a row of a pixel weight
+  matrix, so one pass over the stack yields the masked means of all ring
+  definitions at once: per chunk, ``nan_to_num(lst) @ W.T`` gives the sums
+  and ``isfinite(lst) @ W.T`` the clear-pixel counts.
+- The stack is streamed from its memory map in chunks of scenes.
+- A scene contributes to a ring only when both the core and the ring have
+  at least ``min_valid_fraction`` clear pixels.
+
+Usage:
+    python uhi_intensity.py            # Builds/reads the stack, writes uhi_analysis/*.csv
+
+Author: Craig Parker
+Institution: Wits Planetary Health Research
+Date: January 2025
+"""
+
+import logging
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lst_cache import HOSPITAL_LAT, HOSPITAL_LON
+from lst_stack import LSTSceneStack, StackKey
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS = 6378137.0  # Web Mercator sphere
+
+
+@dataclass(frozen=True)
+class Ring:
+    """Rural reference annulus around the centre, in metres."""
+    name: str
+    inner_m: float
+    outer_m: float
+
+
+DEFAULT_RINGS = [
+    Ring('ring_5_7km', 5000, 7000),
+    Ring('ring_7_10km', 7000, 10000),
+    Ring('ring_10_15km', 10000, 15000)
+]
+
+
+@dataclass
+class UHIConfig:
+    """Configuration for UHI intensity."""
+    center: Tuple[float, float] = field(default=(HOSPITAL_LAT, HOSPITAL_LON))  # (lat, lon)
+    core_radius_m: float = field(default=2000)
+    rings: List[Ring] = field(default_factory=lambda: list(DEFAULT_RINGS))
+    min_valid_fraction: float = field(default=0.3)
+    periods: List[Tuple[int, int]] = field(default_factory=lambda: [
+        (1985, 1994), (1995, 2004), (2005, 2014), (2015, 2024)
+    ])
+    chunk_mb: float = field(default=64.0)
+    output_dir: Path = field(default=Path('uhi_analysis'))
+
+
+def mercator_distances(x: np.ndarray, y: np.ndarray, lat: float, lon: float) -> np.ndarray:
+    """Ground distance (m) from (lat, lon) to EPSG:3857 points, using the local scale factor."""
+    cx = EARTH_RADIUS * math.radians(lon)
+    cy = EARTH_RADIUS * math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+    return np.hypot(x - cx, y - cy) * math.cos(math.radians(lat))
+
+
+class UHIEngine:
+    """Core-minus-ring LST differences over a scene stack."""
+
+    def __init__(self, stack: LSTSceneStack, config: Optional[UHIConfig] = None):
+        """Initialize with a built scene stack and configuration."""
+        self.stack = stack
+        self.config = config or UHIConfig()
+        if not stack.crs.endswith('3857'):
+            raise ValueError(f"UHI needs an EPSG:3857 stack, got {stack.crs}")
+        self.region_names, self.weights = self.region_weights()
+
+    def region_weights(self) -> Tuple[List[str], np.ndarray]:
+        """(region names, (region, pixel) float32 membership matrix); the core is region 0."""
+        x, y = self.stack.pixel_coordinates()
+        lat, lon = self.config.center
+        distance = mercator_distances(x, y, lat, lon)
+        names = ['core'] + [ring.name for ring in self.config.rings]
+        masks = [distance <= self.config.core_radius_m] + \
+            [(distance >= ring.inner_m) & (distance < ring.outer_m) for ring in self.config.rings]
+        weights = np.stack(masks).astype(np.float32)
+        for name, row in zip(names, weights):
+            if not row.any():
+                raise ValueError(f"Region {name} has no pixels inside the stack AOI")
+        return names, weights
+
+    def region_means(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(scene, region) masked mean LST and clear-pixel fraction, in one pass over the stack."""
+        scenes = self.stack.shape[0]
+        sums = np.zeros((scenes, len(self.region_names)), dtype=np.float64)
+        counts = np.zeros_like(sums)
+        for window, chunk in self.stack.scene_chunks('LST', self.config.chunk_mb):
+            valid = np.isfinite(chunk)
+            sums[window] = np.where(valid, chunk, 0) @ self.weights.T
+            counts[window] = valid.astype(np.float32) @ self.weights.T
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        fractions = counts / self.weights.sum(axis=1)
+        return means, fractions
+
+    def scene_intensity(self) -> pd.DataFrame:
+        """Per-scene core and ring means and UHI intensity (core minus ring) for every ring."""
+        means, fractions = self.region_means()
+        ok = fractions >= self.config.min_valid_fraction
+        df = pd.DataFrame({
+            'time': self.stack.times,
+            'sensor': self.stack.sensors,
+            'core_lst': np.where(ok[:, 0], means[:, 0], np.nan),
+            'core_valid_fraction': fractions[:, 0]
+        })
+        for r, name in enumerate(self.region_names[1:], start=1):
+            usable = ok[:, 0] & ok[:, r]
+            df[f'{name}_lst'] = np.where(ok[:, r], means[:, r], np.nan)
+            df[f'uhi_{name}'] = np.where(usable, means[:, 0] - means[:, r], np.nan)
+        return df
+
+    def period_intensity(self, scenes: pd.DataFrame, periods: Optional[Sequence[Tuple[int, int]]] = None) -> pd.DataFrame:
+        """Mean, spread and scene count of each ring's UHI intensity per period."""
+        years = pd.to_datetime(scenes['time']).dt.year
+        rows = []
+        for start, end in periods or self.config.periods:
+            in_period = scenes[(years >= start) & (years <= end)]
+            for name in self.region_names[1:]:
+                values = in_period[f'uhi_{name}'].dropna()
+                rows.append({'period': f'{start}-{end}', 'ring': name, 'uhi_mean': values.mean(),
+                             'uhi_std': values.std(), 'scenes': len(values)})
+        return pd.DataFrame(rows)
+
+    def trend(self, scenes: pd.DataFrame) -> pd.DataFrame:
+        """OLS trend of each ring's per-scene UHI intensity, in °C per decade."""
+        from scipy import stats
+
+        time = pd.to_datetime(scenes['time'])
+        decimal_years = (time.dt.year + (time.dt.dayofyear - 1) / 365.25).to_numpy()
+        rows = []
+        for name in self.region_names[1:]:
+            values = scenes[f'uhi_{name}'].to_numpy()
+            valid = np.isfinite(values)
+            if valid.sum() < 3:
+                rows.append({'ring': name, 'scenes': int(valid.sum())})
+                continue
+            fit = stats.linregress(decimal_years[valid], values[valid])
+            rows.append({'ring': name, 'slope_per_decade': fit.slope * 10, 'intercept': fit.intercept,
+                         'r': fit.rvalue, 'p_value': fit.pvalue,
+                         'stderr_per_decade': fit.stderr * 10, 'scenes': int(valid.sum())})
+        return pd.DataFrame(rows)
+
+    def run(self) -> Dict[str, pd.DataFrame]:
+        """Scene series, period summary and trend; written as CSVs to the output directory."""
+        scenes = self.scene_intensity()
+        results = {
+            'scenes': scenes,
+            'periods': self.period_intensity(scenes),
+            'trend': self.trend(scenes)
+        }
+        output_dir = Path(self.config.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for name, df in results.items():
+            df.to_csv(output_dir / f'uhi_{name}.csv', index=False)
+        logger.info(f"UHI intensity of {scenes['core_lst'].notna().sum()} usable scenes "
+                    f"written to {output_dir}")
+        return results
+
+
+def main():
+    """UHI intensity of the Sep-Feb Landsat record around the hospital."""
+    stack = LSTSceneStack(StackKey(1984, 2024)).build()
+    results = UHIEngine(stack).run()
+    print(results['periods'].round(2).to_string(index=False))
+    print(results['trend'].round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
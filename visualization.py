@@ -10,15 +10,19 @@ Date: January 2025
 
 import matplotlib.pyplot as plt
 import seaborn as sns
+import plotly
 import plotly.graph_objects as go
 import plotly.express as px
+from plotly.offline import get_plotlyjs
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from scipy.stats import gaussian_kde
 from PIL import ImageColor
+import calendar
 import datetime
+import hashlib
 import logging
 import time
 import os
@@ -53,6 +57,14 @@ FT_STYLE = {
     'grid_alpha': 0.3
 }
 
+# Dashboard export modes: 'standalone' inlines plotly.js (~4 MB per file),
+# 'light' references one shared versioned plotly.js asset
+DASHBOARD_MODES = ('standalone', 'light')
+ASSET_DIR = 'assets'
+
+# Scatter traces with more points than this are drawn with WebGL in light mode
+WEBGL_POINT_THRESHOLD = 1000
+
 @dataclass
 class PlotConfig:
     """Configuration for plot styling and colors."""
@@ -88,8 +100,40 @@ class HeatWaveVisualizer:
             'current': '#55A868'      # Muted green
         }
     
-    def create_analysis_dashboard(self, historical_data: pd.DataFrame, current_data: pd.DataFrame) -> None:
-        """Create a comprehensive dashboard comparing historical and current periods."""
+    def create_analysis_dashboard(self, historical_data: pd.DataFrame, current_data: pd.DataFrame,
+                                  mode: str = 'standalone') -> Path:
+        """Create a comprehensive dashboard comparing historical and current periods.
+
+        ``mode='standalone'`` writes a self-contained, timestamped HTML file.
+        ``mode='light'`` writes ``heatwave_analysis.html`` with compact,
+        pre-aggregated trace data and a reference to a shared plotly.js asset;
+        the file is only rewritten when its content changes.
+        """
+        if mode not in DASHBOARD_MODES:
+            raise ValueError(f"Unknown dashboard mode: {mode}")
+
+        fig = self.build_dashboard_figure(historical_data, current_data)
+
+        # Save the figure
+        if mode == 'light':
+            return self._write_light_html(fig, 'heatwave_analysis')
+
+        timestamp = int(time.time())
+        output_file = f'figures/heatwave_analysis/heatwave_analysis_{timestamp}.html'
+        fig.write_html(output_file)
+        return Path(output_file)
+
+    def build_dashboard_figure(self, historical_data: pd.DataFrame, current_data: pd.DataFrame,
+                               labels: Optional[Dict[str, str]] = None,
+                               months: Optional[List[int]] = None,
+                               title: Optional[str] = None,
+                               findings: bool = True) -> go.Figure:
+        """Build the dashboard figure without writing it.
+
+        ``labels`` renames the period traces (keys 'historical' and 'current'),
+        ``months`` sets the month axis of the monthly panel and ``findings``
+        toggles the static key-findings annotation.
+        """
         # Create figure with subplots
         fig = make_subplots(
             rows=3, cols=2,
@@ -108,7 +152,7 @@ class HeatWaveVisualizer:
 
         # Add title
         fig.update_layout(
-            title_text='Spring & Summer Heat Wave Trends at Rahima Moosa Hospital<br>Comparing Historical (1980-1989) vs Current (2015-2024) Periods',
+            title_text=title or 'Spring & Summer Heat Wave Trends at Rahima Moosa Hospital<br>Comparing Historical (1980-1989) vs Current (2015-2024) Periods',
             title_x=0.5,
             height=1200,
             showlegend=True,
@@ -122,11 +166,19 @@ class HeatWaveVisualizer:
         self._add_heatwave_events(fig, historical_data, current_data, row=1, col=2)
         
         # Plot monthly heat wave days
-        self._add_monthly_heatwaves(fig, historical_data, current_data, row=2, col=1)
+        self._add_monthly_heatwaves(fig, historical_data, current_data, row=2, col=1, months=months)
         
         # Plot seasonal distribution
         self._add_seasonal_distribution(fig, historical_data, current_data, row=2, col=2)
 
+        if labels:
+            names = {'1980-1989': labels.get('historical', '1980-1989'),
+                     '2015-2024': labels.get('current', '2015-2024')}
+            fig.for_each_trace(lambda trace: trace.update(name=names.get(trace.name, trace.name)))
+
+        if not findings:
+            return fig
+
         # Add findings and sources section
         findings_text = """
         <b>Key Findings:</b><br>
@@ -157,10 +209,54 @@ class HeatWaveVisualizer:
             margin=dict(t=100, b=300)  # Increase bottom margin for findings
         )
 
-        # Save the figure
-        timestamp = int(time.time())
-        output_file = f'figures/heatwave_analysis/heatwave_analysis_{timestamp}.html'
-        fig.write_html(output_file)
+        return fig
+
+    def _plotly_asset(self) -> Path:
+        """Shared plotly.js bundle, written once per plotly version."""
+        asset = self.output_dir / ASSET_DIR / f'plotly-{plotly.__version__}.min.js'
+        if not asset.exists():
+            asset.parent.mkdir(parents=True, exist_ok=True)
+            asset.write_text(get_plotlyjs(), encoding='utf-8')
+            logger.info(f"Wrote shared plotly.js asset {asset}")
+        return asset
+
+    @staticmethod
+    def _compact_figure(fig: go.Figure, decimals: int = 4,
+                        webgl_threshold: int = WEBGL_POINT_THRESHOLD) -> go.Figure:
+        """Round numeric trace data and switch large scatter traces to WebGL."""
+        traces = []
+        for trace in fig.data:
+            data = trace.to_plotly_json()
+            for axis in ('x', 'y'):
+                values = data.get(axis)
+                if values is None:
+                    continue
+                values = np.asarray(values)
+                if values.dtype.kind == 'f':
+                    data[axis] = np.round(values, decimals)
+            if data.get('type') == 'scatter' and len(data.get('y', ())) > webgl_threshold:
+                data['type'] = 'scattergl'
+            traces.append(data)
+        return go.Figure(data=traces, layout=fig.layout)
+
+    def _write_light_html(self, fig: go.Figure, name: str) -> Path:
+        """Write a small HTML file that loads the shared plotly.js asset."""
+        asset = self._plotly_asset()
+        html = self._compact_figure(fig).to_html(
+            include_plotlyjs=asset.relative_to(self.output_dir).as_posix(),
+            full_html=True,
+            div_id=name,  # Fixed id keeps the output identical between runs
+            config={'responsive': True}
+        )
+        output_file = self.output_dir / f'{name}.html'
+        digest = hashlib.sha1(html.encode('utf-8')).hexdigest()
+        if output_file.exists() and hashlib.sha1(output_file.read_bytes()).hexdigest() == digest:
+            logger.info(f"{output_file} is up to date")
+            return output_file
+
+        output_file.write_text(html, encoding='utf-8')
+        logger.info(f"Wrote {output_file} ({len(html) / 1024:.0f} KiB)")
+        return output_file
     
     def _add_temperature_distribution(self, fig, historical_data, current_data, row, col):
         """Add temperature distribution subplot."""
@@ -196,7 +292,7 @@ class HeatWaveVisualizer:
         fig.update_xaxes(title_text='Maximum Temperature (°C)', row=row, col=col)
         fig.update_yaxes(title_text='Proportion of Days', row=row, col=col)
     
-    def _add_monthly_heatwaves(self, fig, historical_data, current_data, row, col):
+    def _add_monthly_heatwaves(self, fig, historical_data, current_data, row, col, months=None):
         """Add monthly heat wave days subplot."""
         # Calculate monthly averages for both periods
         historical_monthly = historical_data.groupby(
@@ -204,9 +300,9 @@ class HeatWaveVisualizer:
         current_monthly = current_data.groupby(
             current_data['date'].dt.month)['is_heatwave'].mean()
         
-        # Define month order (Sep-Feb)
-        month_order = [9, 10, 11, 12, 1, 2]
-        month_names = ['Sep', 'Oct', 'Nov', 'Dec', 'Jan', 'Feb']
+        # Define month order (Sep-Feb unless given)
+        month_order = list(months) if months else [9, 10, 11, 12, 1, 2]
+        month_names = [calendar.month_abbr[m] for m in month_order]
         
         # Reorder data
         historical_monthly = historical_monthly.reindex(month_order)